@@ -4,6 +4,16 @@ cursor = conn.cursor()
 try:
     cursor.execute(f"DROP table portfolios")
     cursor.execute(f"DROP table users")
+    cursor.execute(f"DROP table IF EXISTS portfolio_submissions")
+    cursor.execute(f"DROP table IF EXISTS portfolio_allocations")
+    cursor.execute(f"DROP table IF EXISTS user_goals")
+    cursor.execute(f"DROP table IF EXISTS schema_migrations")
+    cursor.execute(f"DROP table IF EXISTS assets")
+    cursor.execute(f"DROP table IF EXISTS advisory_results")
+    cursor.execute(f"DROP table IF EXISTS analytics_risk_histogram")
+    cursor.execute(f"DROP table IF EXISTS analytics_band_totals")
+    cursor.execute(f"DROP table IF EXISTS analytics_band_allocations")
+    cursor.execute(f"DROP table IF EXISTS analytics_goal_investments")
 except sqlite3.Error as e:
     print(f"An error occurred: {e}")
 # Run this code directy in VS CODE 
\ No newline at end of file
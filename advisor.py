@@ -0,0 +1,440 @@
+import numpy as np
+import datetime
+import functools
+import logging
+import os
+import threading
+from contextlib import contextmanager
+
+import persistence
+from persistence import DB_PATH
+from universe import AssetUniverse, as_universe, records_version
+
+# Advisory logic shared by the Streamlit app (main.py) and headless tools such as batch.py.
+# pandas and matplotlib are imported inside the functions that need them, so the first page
+# of the app loads without them.
+
+logger = logging.getLogger(__name__)
+
+INFLATION_RATE = 0.06  # 6% a year, used by every inflation-adjusted figure
+
+# Errors are logged by default; main.py routes them to st.error instead
+_error_handler = logger.error
+
+def set_error_handler(handler):
+    # Replace the function used to surface errors (e.g. st.error in the Streamlit app)
+    global _error_handler
+    _error_handler = handler
+
+_collected = threading.local()
+
+def report_error(message):
+    errors = getattr(_collected, "errors", None)
+    if errors is not None:
+        errors.append(message)
+    else:
+        _error_handler(message)
+
+@contextmanager
+def collect_errors():
+    # Collect errors reported by this thread into a list instead of the handler
+    # (background jobs have no Streamlit context to call st.error from)
+    previous = getattr(_collected, "errors", None)
+    _collected.errors = []
+    try:
+        yield _collected.errors
+    finally:
+        _collected.errors = previous
+
+# Database functions
+_databases_ready = set()
+
+def setup_database():
+    # Initialize SQLite database once per process; later reruns return straight away
+    if DB_PATH in _databases_ready:
+        return True
+    try:
+        persistence.ensure_schema(DB_PATH)
+        assets = default_universe()
+        persistence.sync_assets(assets, assets.version, DB_PATH)
+        _databases_ready.add(DB_PATH)
+        return True
+    except Exception as e:
+        report_error(f"Database error: {e}")
+        return False
+
+def save_user_portfolio(user_data, portfolio_data):
+    # Queue user and portfolio data for the background writer; each distinct submission is stored once.
+    # Returns the writer's Future (True once stored, raises if the write failed), or None if it could not be queued.
+    try:
+        return persistence.get_writer(DB_PATH).submit(user_data, portfolio_data)
+    except Exception as e:
+        report_error(f"Database save error: {e}")
+        return None
+
+# Load default assets
+def load_default_assets():
+    # default investment assets
+    return [
+        {"name": "Nifty 500 ETF", "type": "stock", "return": 0.10, "risk": 0.8, "price": 450.0},
+        {"name": "Total Bond ETF", "type": "bond", "return": 0.04, "risk": 0.3, "price": 80.0},
+        {"name": "Gold ETF", "type": "commodity", "return": 0.05, "risk": 0.6, "price": 180.0},
+        {"name": "Real Estate ETF", "type": "real_estate", "return": 0.08, "risk": 0.7, "price": 95.0},
+        {"name": "High-Yield Dividend ETF", "type": "stock", "return": 0.07, "risk": 0.6, "price": 55.0},
+        {"name": "Treasury Bonds", "type": "bond", "return": 0.03, "risk": 0.2, "price": 100.0},
+        {"name": "International Stocks ETF", "type": "stock", "return": 0.09, "risk": 0.8, "price": 65.0},
+        {"name": "Emerging Markets ETF", "type": "stock", "return": 0.11, "risk": 0.9, "price": 45.0},
+        {"name": "Technology Sector ETF", "type": "stock", "return": 0.12, "risk": 0.9, "price": 160.0},
+        {"name": "Corporate Bonds ETF", "type": "bond", "return": 0.05, "risk": 0.4, "price": 110.0}
+    ]
+
+def asset_universe_version(assets):
+    # Content hash of the asset universe; changes whenever any asset is added, removed or edited
+    if isinstance(assets, AssetUniverse):
+        return assets.version
+    return records_version(assets)
+
+ASSET_CATALOG = os.environ.get("ADVISOR_ASSET_CATALOG")  # optional CSV/Parquet instrument catalog
+
+@functools.lru_cache(maxsize=None)
+def default_universe():
+    # AssetUniverse for the app, built once per process and shared read-only by every session:
+    # the catalog named by ADVISOR_ASSET_CATALOG if set, otherwise the default assets
+    if ASSET_CATALOG:
+        return AssetUniverse.from_catalog(ASSET_CATALOG)
+    return AssetUniverse.from_records(load_default_assets())
+
+def portfolio_return(allocation, assets):
+    # Expected annual return of an allocation (weights . returns)
+    universe = as_universe(assets)
+    return float(universe.weights(allocation) @ universe.returns)
+
+# Portfolio allocation function
+def classify_risk(risk_score):
+    # Risk category used by the questionnaire and the allocation buckets
+    if risk_score < 0.3:
+        return "low"
+    elif risk_score < 0.7:
+        return "medium"
+    else:
+        return "high"
+
+ALLOCATION_METHODS = {
+    "buckets": "Risk buckets",
+    "optimizer": "Mean-variance optimizer",
+}
+
+def recommend_allocation(assets, risk_score, method="buckets", version=None):
+    # Recommend asset allocation based on user's risk level
+    if method == "optimizer":
+        # Imported here because optimizer builds on this module
+        import optimizer
+        return optimizer.optimal_allocation(assets, risk_score, version=version)
+    allocation = {}
+    universe = as_universe(assets)
+    
+    risk_category = classify_risk(risk_score)
+
+    # Basic asset classes
+    asset_classes = {
+        "stock": {"low": 0.30, "medium": 0.50, "high": 0.70},
+        "bond": {"low": 0.50, "medium": 0.30, "high": 0.10},
+        "commodity": {"low": 0.10, "medium": 0.10, "high": 0.10},
+        "real_estate": {"low": 0.10, "medium": 0.10, "high": 0.10}
+    }
+    
+# asset_class->This variable represents a specific type of asset
+# allocations->This varable contain dictionary of value of asset_classes
+# class_assets->Positions of that type in the universe (from its type index)
+# allocation->contain the ammount of distribution of percentage
+
+    # Set allocation for each asset class
+    for asset_class, allocations in asset_classes.items():
+        if asset_class in universe.type_index:
+            class_assets = universe.type_index[asset_class]
+            pct = allocations[risk_category]
+            
+            if len(class_assets):
+                if risk_category == "high":
+                    # Sort by return (high for high risk); stable, so ties keep catalog order
+                    class_assets = class_assets[np.argsort(-universe.returns[class_assets], kind="stable")]
+                elif risk_category == "low":
+                    # Sort by risk level (low risk first)
+                    class_assets = class_assets[np.argsort(universe.risks[class_assets], kind="stable")]
+                
+                class_allocation = pct / len(class_assets)
+                allocation.update(dict.fromkeys(universe.names[class_assets].tolist(), class_allocation))
+    
+    return allocation
+
+# Portfolio simulation function
+def _monthly_dates(start_date, periods):
+    # Same day and time each month from start_date, clamped to the month length (Jan 31 -> Feb 28)
+    first_month = np.datetime64(start_date.strftime("%Y-%m"), "M")
+    month_index = first_month + np.arange(periods + 1)
+    month_starts = month_index.astype("datetime64[D]")
+    month_lengths = (month_starts[1:] - month_starts[:-1]).astype(int)
+    day_offset = np.minimum(start_date.day - 1, month_lengths - 1)
+    time_of_day = np.timedelta64(
+        (start_date - start_date.replace(hour=0, minute=0, second=0, microsecond=0)) // datetime.timedelta(microseconds=1),
+        "us",
+    )
+    dates = month_starts[:-1] + day_offset.astype("timedelta64[D]") + time_of_day
+    month_numbers = month_index[:-1].astype(int)
+    return dates, 1970 + month_numbers // 12, month_numbers % 12 + 1
+
+def growth_factors(assets, years=5):
+    # Cumulative growth factor of every asset for every month (months x assets), independent of the allocation
+    months = np.arange(years * 12 + 1)
+    # Monthly return (annual return / 12)
+    monthly_returns = as_universe(assets).returns / 12
+    return (1 + monthly_returns) ** months[:, None]
+
+def unit_growth(allocation, assets, years=5):
+    # Value of each asset for every month per 1 unit invested (months x assets), in one array pass
+    # Share invested in each asset (0 for assets outside the allocation)
+    weights = as_universe(assets).weights(allocation)
+    return growth_factors(assets, years) * weights
+
+def projection_frame(unit_asset_values, assets, initial_investment):
+    # Build the simulation results DataFrame from unit growth paths (see unit_growth)
+    asset_values = unit_asset_values * initial_investment
+    total_value = asset_values.sum(axis=1)
+    total_value[0] = initial_investment
+    return values_frame(asset_values, assets, total_value)
+
+def values_frame(asset_values, assets, total_value=None, extra_columns=None):
+    # Simulation results DataFrame from monthly per-asset values (months x assets)
+    months = np.arange(len(asset_values))
+    
+    # Create a date range for the simulation
+    date_range, year_numbers, month_numbers = _monthly_dates(datetime.datetime.now(), len(months))
+    
+    if total_value is None:
+        total_value = asset_values.sum(axis=1)
+    
+    # Apply monthly inflation
+    monthly_inflation = INFLATION_RATE / 12
+    inflation_adjusted = total_value / (1 + monthly_inflation) ** months
+    
+    columns = {
+        'Date': date_range,
+        'Year': year_numbers,
+        'Month': month_numbers,
+        'Total_Value': total_value,
+        'Inflation_Adjusted_Value': inflation_adjusted
+    }
+    columns.update(extra_columns or {})
+    # Add columns for each asset
+    for idx, name in enumerate(as_universe(assets).names.tolist()):
+        columns[name] = asset_values[:, idx]
+    
+    import pandas as pd
+    return pd.DataFrame(columns)
+
+def simulate_growth(initial_investment, allocation, assets, years=5):
+    # Show portfolio growth over specified years
+    try:
+        return projection_frame(unit_growth(allocation, assets, years), assets, initial_investment)
+    except Exception as e:
+        report_error(f"Simulation error: {e}")
+        import pandas as pd
+        return pd.DataFrame()
+
+# Monte Carlo simulation settings
+RISK_TO_VOLATILITY = 0.25  # an asset "risk" of 1.0 means 25% annual volatility
+SAME_TYPE_CORRELATION = 0.6
+CROSS_TYPE_CORRELATION = 0.2
+MONTE_CARLO_CHUNK_BYTES = 32 * 1024 * 1024  # memory ceiling for a simulation, whatever the number of paths
+MONTE_CARLO_BINS = 2048  # log-spaced value bins per month for the percentile bands
+MONTE_CARLO_RANGE = (1e-4, 1e6)  # binned values as a multiple of the initial investment; outliers share the end bins
+
+def build_correlation_matrix(assets, same_type=SAME_TYPE_CORRELATION, cross_type=CROSS_TYPE_CORRELATION):
+    # Assets of the same type move together more than assets of different types
+    return type_correlation(as_universe(assets).types, same_type, cross_type)
+
+def type_correlation(types, same_type=SAME_TYPE_CORRELATION, cross_type=CROSS_TYPE_CORRELATION):
+    correlation = np.where(types[:, None] == types[None, :], same_type, cross_type).astype(float)
+    np.fill_diagonal(correlation, 1.0)
+    return correlation
+
+def histogram_percentiles(counts, percentiles, log_low, bin_width):
+    # Percentiles of each row of a log-spaced histogram (len(percentiles) x rows), placing the
+    # values of a bin evenly across it as np.percentile's linear method would between samples
+    rows = np.arange(len(counts))
+    cumulative = np.cumsum(counts, axis=1)
+    n = cumulative[:, -1]
+    values = []
+    for q in percentiles:
+        rank = q / 100 * (n - 1)
+        index = (cumulative <= rank[:, None]).sum(axis=1)
+        in_bin = counts[rows, index]
+        before = cumulative[rows, index] - in_bin
+        values.append(np.exp(log_low + bin_width * (index + (rank - before + 0.5) / in_bin)))
+    return np.array(values)
+
+def simulate_monte_carlo(initial_investment, allocation, assets, years=5, target_return=None,
+                         n_paths=20000, seed=None, correlation=None, max_chunk_bytes=MONTE_CARLO_CHUNK_BYTES,
+                         progress=None):
+    # Simulate many correlated monthly return paths and summarise them as percentile bands.
+    # progress, if given, is called with the fraction of paths simulated after each chunk.
+    try:
+        universe = as_universe(assets)
+        weights = universe.weights(allocation)
+        held = np.flatnonzero(weights > 0)
+        months = years * 12
+
+        if correlation is None:
+            correlation = type_correlation(universe.types[held])
+        else:
+            correlation = np.asarray(correlation, dtype=float)[np.ix_(held, held)]
+
+        amounts = initial_investment * weights[held]
+        monthly_returns = universe.returns[held] / 12
+        monthly_volatility = universe.risks[held] * RISK_TO_VOLATILITY / np.sqrt(12)
+        # Correlated shocks come from the Cholesky factor of the correlation matrix
+        shock_transform = np.linalg.cholesky(correlation).T * monthly_volatility
+
+        target_value = None
+        if target_return is not None:
+            target_value = initial_investment * (1 + target_return) ** years
+
+        # Paths are never kept: each chunk is added to a per-month histogram of log(value / initial
+        # investment) and the bands are read from it, so memory depends on months x bins, not on n_paths
+        log_low, log_high = np.log(MONTE_CARLO_RANGE)
+        bin_width = (log_high - log_low) / MONTE_CARLO_BINS
+        counts = np.zeros((months, MONTE_CARLO_BINS), dtype=np.int64)
+        month_offsets = np.arange(months) * MONTE_CARLO_BINS
+        # Per path, the draws and the correlated returns are months x assets float64 (growth reuses the
+        # returns), and totals, log values and bin indices are months long; the counts and each chunk's
+        # bincount come off the top
+        bytes_per_path = max(months * (len(held) * 8 * 2 + 8 * 3), 1)
+        chunk_budget = max_chunk_bytes - 2 * counts.nbytes
+        chunk_size = max(1, min(n_paths, chunk_budget // bytes_per_path))
+
+        rng = np.random.default_rng(seed)
+        hits = 0
+        for start in range(0, n_paths, chunk_size):
+            size = min(chunk_size, n_paths - start)
+            returns = rng.standard_normal((size, months, len(held))) @ shock_transform
+            returns += monthly_returns + 1
+            # A month can at worst wipe out an asset, never take it below zero
+            np.maximum(returns, 0, out=returns)
+            np.cumprod(returns, axis=1, out=returns)
+            totals = returns @ amounts
+            del returns
+            if target_value is not None and months:
+                hits += np.count_nonzero(totals[:, -1] >= target_value)
+            if initial_investment > 0:
+                with np.errstate(divide="ignore"):
+                    index = (np.log(totals / initial_investment) - log_low) / bin_width
+                index = np.clip(index, 0, MONTE_CARLO_BINS - 1).astype(np.intp) + month_offsets
+                counts += np.bincount(index.ravel(), minlength=counts.size).reshape(counts.shape)
+            if progress is not None:
+                progress((start + size) / n_paths)
+
+        p5, p50, p95 = np.full((3, months + 1), float(initial_investment))
+        if initial_investment > 0 and months:
+            p5[1:], p50[1:], p95[1:] = initial_investment * histogram_percentiles(counts, [5, 50, 95], log_low, bin_width)
+        date_range = _monthly_dates(datetime.datetime.now(), months + 1)[0]
+        inflation_factor = (1 + INFLATION_RATE / 12) ** np.arange(months + 1)
+        # Compact float32 bands (results.SeriesResult), indexed by column name like a DataFrame
+        from results import SeriesResult
+        bands = SeriesResult(date_range, {
+            'P5': p5,
+            'P50': p50,
+            'P95': p95,
+            'Inflation_Adjusted_P50': p50 / inflation_factor
+        })
+
+        target_probability = None
+        if target_value is not None:
+            target_probability = hits / n_paths if months else float(initial_investment >= target_value)
+
+        return {
+            "bands": bands,
+            "target_value": target_value,
+            "target_probability": target_probability,
+            "n_paths": n_paths,
+            "seed": seed
+        }
+    except Exception as e:
+        report_error(f"Monte Carlo simulation error: {e}")
+        return None
+
+# Generate recommendations function
+def generate_recommendations(user_data, portfolio_data, assets, simulation_results, rules=None):
+    # Generate personalized recommendations based on portfolio analysis
+    # (the checks are the declarative rules in rules.py; pass rules= to add or replace them)
+    try:
+        import rules as rule_engine
+        rules = rule_engine.RULES if rules is None else rules
+        columns = rule_engine.portfolio_columns(user_data, portfolio_data, assets, simulation_results)
+        matches = rule_engine.evaluate(columns, rules)
+        return rule_engine.recommendation_messages(columns, matches, rules)[0]
+    except Exception as e:
+        report_error(f"Recommendation generation error: {e}")
+        return ["Unable to generate recommendations due to an error."]
+
+# Create portfolio summary visualizations
+MAX_CHART_POINTS = 400  # longer series are downsampled before plotting
+MAX_PIE_SLICES = 12     # larger allocations show their biggest holdings plus "Other"
+
+def downsample_indices(length, max_points=MAX_CHART_POINTS):
+    # Evenly spaced row positions, always keeping the first and last point
+    if length <= max_points:
+        return np.arange(length)
+    return np.unique(np.linspace(0, length - 1, max_points).round().astype(int))
+
+def create_portfolio_visualizations(portfolio_data, simulation_results, monte_carlo=None):
+    """Create visualizations for portfolio allocation and growth"""
+    try:
+        # Object-oriented Figure: not registered with pyplot, so it is freed once unreferenced
+        # and separate sessions never share pyplot's global current figure
+        from matplotlib.figure import Figure
+        fig = Figure(figsize=(15,8))
+
+        # Plot 1: Asset Allocation Pie Chart (top-left)
+        ax1 = fig.add_subplot(1,2,1)
+        allocation = portfolio_data["allocation"]
+        labels = list(allocation.keys())
+        if len(labels) > MAX_PIE_SLICES:
+            # A wedge per holding is unreadable (and very slow) for a large catalog
+            largest = set(sorted(labels, key=allocation.get, reverse=True)[:MAX_PIE_SLICES - 1])
+            other = sum(weight for name, weight in allocation.items() if name not in largest)
+            labels = [name for name in labels if name in largest]
+            sizes = [allocation[name] * 100 for name in labels] + [other * 100]
+            labels.append("Other")
+        else:
+            sizes = [allocation[asset] * 100 for asset in labels]
+        
+        ax1.pie(sizes, labels=labels, autopct='%1.1f%%', startangle=90)
+        ax1.set_title('Asset Allocation')
+        ax1.axis('equal')
+        
+        # Plot 2: Portfolio Growth Over Time (top-right)
+        ax2 = fig.add_subplot(1,2,2)
+        # Columns are read by name, so a DataFrame, a results.SimulationResult or a SeriesResult all work
+        rows = downsample_indices(len(simulation_results))
+        dates = np.asarray(simulation_results['Date'])[rows]
+        ax2.plot(dates, np.asarray(simulation_results['Total_Value'])[rows], label='Projected Value')
+        ax2.plot(dates, np.asarray(simulation_results['Inflation_Adjusted_Value'])[rows],label='Inflation Adjusted', linestyle='--')
+        if monte_carlo is not None:
+            # Monte Carlo percentile bands around the median path
+            bands = monte_carlo["bands"]
+            rows = downsample_indices(len(bands))
+            band_dates = np.asarray(bands['Date'])[rows]
+            ax2.fill_between(band_dates, np.asarray(bands['P5'])[rows], np.asarray(bands['P95'])[rows],
+                             alpha=0.2, label='Monte Carlo P5-P95')
+            ax2.plot(band_dates, np.asarray(bands['P50'])[rows], label='Monte Carlo Median', linestyle=':')
+        ax2.set_title('Portfolio Growth Projection')
+        ax2.set_xlabel('Date')
+        ax2.set_ylabel('Value (INR)')
+        ax2.legend()
+        ax2.grid(True)
+         
+        fig.tight_layout()
+        return fig
+    except Exception as e:
+        report_error(f"Visualization error: {e}")
+        return None
@@ -0,0 +1,188 @@
+import argparse
+import datetime
+import logging
+import time
+
+import advisor
+import migrate
+import persistence
+
+# Fleet-wide advisor analytics read from the summary tables that write_portfolios keeps current.
+# Every query reads a few dozen summary rows, so the dashboard costs the same for a thousand
+# portfolios or ten million. backfill() rebuilds the summaries from the normalized tables.
+# Run this code using "python analytics.py --backfill" once for a database that already has portfolios
+
+logger = logging.getLogger(__name__)
+
+RISK_BANDS = ("low", "medium", "high")
+
+
+def backfill(db_path=None):
+    # Rebuild every summary table in one write transaction, so concurrent saves wait instead of double counting
+    db_path = db_path or advisor.DB_PATH
+    persistence.ensure_schema(db_path)
+    # The rebuild reads portfolio_allocations/user_goals, so they must be populated first (no-op once done)
+    migrate.migrate(db_path)
+
+    start = time.perf_counter()
+    with persistence.get_pool(db_path).connection() as conn:
+        conn.create_function("risk_bucket", 1, persistence.risk_bucket, deterministic=True)
+        conn.create_function("investment_bucket", 1, persistence.investment_bucket, deterministic=True)
+        band = persistence.RISK_BAND_SQL
+        with persistence.transaction(conn):
+            for table in ("analytics_risk_histogram", "analytics_band_totals",
+                          "analytics_band_allocations", "analytics_goal_investments"):
+                conn.execute(f"DELETE FROM {table}")
+            conn.execute('''
+            INSERT INTO analytics_risk_histogram (bucket, users)
+            SELECT risk_bucket(risk_score), COUNT(*) FROM users
+            WHERE risk_score IS NOT NULL
+            GROUP BY 1
+            ''')
+            conn.execute(f'''
+            INSERT INTO analytics_band_totals (band, portfolios, investment_sum)
+            SELECT {band}, COUNT(*), TOTAL(p.initial_investment)
+            FROM portfolios p
+            JOIN users u ON u.id = p.user_id
+            WHERE u.risk_score IS NOT NULL
+            GROUP BY 1
+            ''')
+            conn.execute(f'''
+            INSERT INTO analytics_band_allocations (band, asset_name, weight_sum)
+            SELECT {band}, pa.asset_name, TOTAL(pa.weight)
+            FROM portfolio_allocations pa
+            JOIN portfolios p ON p.id = pa.portfolio_id
+            JOIN users u ON u.id = p.user_id
+            WHERE u.risk_score IS NOT NULL
+            GROUP BY 1, 2
+            ''')
+            conn.execute('''
+            INSERT INTO analytics_goal_investments (goal, bucket, portfolios, investment_sum)
+            SELECT g.goal, investment_bucket(COALESCE(p.initial_investment, 0)), COUNT(*), TOTAL(p.initial_investment)
+            FROM portfolios p
+            JOIN user_goals g ON g.user_id = p.user_id
+            GROUP BY 1, 2
+            ''')
+            conn.execute('''
+            INSERT INTO schema_migrations (name, completed_at) VALUES (?, ?)
+            ON CONFLICT (name) DO UPDATE SET completed_at = excluded.completed_at
+            ''', (persistence.ANALYTICS_MIGRATION, datetime.datetime.now().isoformat(timespec="seconds")))
+    return time.perf_counter() - start
+
+
+def needs_backfill(conn):
+    # True when portfolios were saved before the summary tables existed and no backfill has run yet
+    done = conn.execute("SELECT 1 FROM schema_migrations WHERE name = ?", (persistence.ANALYTICS_MIGRATION,)).fetchone()
+    return not done and conn.execute("SELECT 1 FROM portfolios LIMIT 1").fetchone() is not None
+
+
+def risk_distribution(conn):
+    # One row per risk-score bucket (labelled by its lower edge on the 0-100 scale), including empty ones
+    counts = dict(conn.execute("SELECT bucket, users FROM analytics_risk_histogram").fetchall())
+    width = 100 / persistence.RISK_HISTOGRAM_BUCKETS
+    return [{"Risk Score": bucket * width, "Users": counts.get(bucket, 0)}
+            for bucket in range(persistence.RISK_HISTOGRAM_BUCKETS)]
+
+
+def band_allocations(conn):
+    # Average weight of each asset per risk band (assets a portfolio does not hold count as 0)
+    totals = {band: (portfolios, investment_sum) for band, portfolios, investment_sum in
+              conn.execute("SELECT band, portfolios, investment_sum FROM analytics_band_totals")}
+    rows = []
+    for band, asset_name, weight_sum in conn.execute(
+            "SELECT band, asset_name, weight_sum FROM analytics_band_allocations ORDER BY band, weight_sum DESC"):
+        portfolios = totals.get(band, (0, 0))[0]
+        if portfolios:
+            rows.append({"Risk Band": band, "Asset": asset_name, "Average Weight": weight_sum / portfolios})
+    summary = [
+        {"Risk Band": band, "Portfolios": totals[band][0], "Average Investment (INR)": totals[band][1] / totals[band][0]}
+        for band in RISK_BANDS if totals.get(band, (0, 0))[0]
+    ]
+    return summary, rows
+
+
+def histogram_median(buckets):
+    # Median estimate from (bucket, portfolios, investment_sum) rows in bucket order: the mean of the
+    # bucket holding the middle portfolio, so it is off by less than one bucket width (about 12%)
+    total = sum(b[1] for b in buckets)
+    seen = 0
+    for bucket, portfolios, investment_sum in buckets:
+        seen += portfolios
+        if portfolios and seen >= total / 2:
+            return investment_sum / portfolios
+    return None
+
+
+def goal_investments(conn):
+    # Portfolios, mean and histogram-estimated median initial investment per goal
+    per_goal = {}
+    for goal, bucket, portfolios, investment_sum in conn.execute(
+            "SELECT goal, bucket, portfolios, investment_sum FROM analytics_goal_investments ORDER BY goal, bucket"):
+        per_goal.setdefault(goal, []).append((bucket, portfolios, investment_sum))
+    rows = []
+    for goal, buckets in per_goal.items():
+        portfolios = sum(b[1] for b in buckets)
+        if not portfolios:
+            continue
+        rows.append({
+            "Goal": goal,
+            "Portfolios": portfolios,
+            "Median Investment (INR)": histogram_median(buckets),
+            "Mean Investment (INR)": sum(b[2] for b in buckets) / portfolios,
+        })
+    return rows
+
+
+def dashboard(db_path=None):
+    # Everything the Advisor Analytics tab shows, or None on error
+    db_path = db_path or advisor.DB_PATH
+    try:
+        persistence.ensure_schema(db_path)
+        with persistence.get_pool(db_path).connection() as conn:
+            band_summary, allocations = band_allocations(conn)
+            return {
+                "needs_backfill": needs_backfill(conn),
+                "risk_distribution": risk_distribution(conn),
+                "band_summary": band_summary,
+                "band_allocations": allocations,
+                "goal_investments": goal_investments(conn),
+            }
+    except Exception as e:
+        advisor.report_error(f"Analytics error: {e}")
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Print the advisor analytics summaries.")
+    parser.add_argument("--db", default=advisor.DB_PATH, help="SQLite database to read")
+    parser.add_argument("--backfill", action="store_true", help="rebuild the summary tables from the stored portfolios first")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if args.backfill:
+        print(f"Backfilled analytics tables in {backfill(args.db):.2f}s")
+    start = time.perf_counter()
+    data = dashboard(args.db)
+    elapsed = time.perf_counter() - start
+    if data is None:
+        raise SystemExit(1)
+    if data["needs_backfill"]:
+        print("Summary tables are missing portfolios saved earlier; run with --backfill")
+
+    print("Risk score distribution")
+    for row in data["risk_distribution"]:
+        print(f"  {row['Risk Score']:>5.0f}+  {row['Users']}")
+    print("Risk bands")
+    for row in data["band_summary"]:
+        print(f"  {row['Risk Band']:<7} {row['Portfolios']:>9} portfolios, average investment {row['Average Investment (INR)']:,.2f}")
+    for row in data["band_allocations"]:
+        print(f"  {row['Risk Band']:<7} {row['Asset']:<28} {row['Average Weight']:.2%}")
+    print("Initial investment by goal")
+    for row in data["goal_investments"]:
+        print(f"  {row['Goal']:<16} {row['Portfolios']:>9} portfolios, median ~{row['Median Investment (INR)']:,.0f}, "
+              f"mean {row['Mean Investment (INR)']:,.2f}")
+    print(f"Queried in {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+import argparse
+import functools
+import os
+import shutil
+import time
+
+import numpy as np
+
+import advisor
+from results import SeriesResult
+from universe import CACHE_DIR, file_version
+
+# Historical backtest: replay an allocation against daily prices instead of constant returns.
+# A price file is parsed once, forward-filled and cached as .npy files that later runs memory-map.
+# Portfolio value, rolling returns and drawdowns are computed with array operations only.
+# Run this code using "python backtest.py prices.csv --risk-score 0.5 --rebalance monthly"
+
+REBALANCE_MONTHS = {"monthly": 1, "quarterly": 3, "annual": 12}
+ROLLING_WINDOW_DAYS = 252  # one trading year
+TRADING_DAYS = 252
+HISTORY_COLUMNS = ("dates", "names", "prices", "first_valid")
+PRICE_HISTORY = os.environ.get("ADVISOR_PRICE_HISTORY")  # enables backtest mode in the app
+
+
+class PriceHistory:
+    # Daily close prices: dates (days), names (tickers) and prices (days x tickers, forward-filled).
+    # first_valid holds the first row with a real price for each ticker.
+
+    def __init__(self, dates, names, prices, first_valid, version=None):
+        self.dates = dates
+        self.names = names
+        self.prices = prices
+        self.first_valid = first_valid
+        self.version = version
+        self.name_index = {name: i for i, name in enumerate(names.tolist())}
+
+    @classmethod
+    def from_frame(cls, frame, version=None):
+        # Wide frame (a date column plus one price column per ticker) or long frame (date, name, price)
+        columns = {c.lower(): c for c in frame.columns}
+        if {"date", "name", "price"} <= set(columns):
+            frame = frame.pivot_table(index=columns["date"], columns=columns["name"], values=columns["price"], aggfunc="last")
+            frame = frame.reset_index()
+            columns = {str(c).lower(): c for c in frame.columns}
+        date_column = columns.get("date")
+        if date_column is None:
+            raise ValueError("Price history needs a 'date' column")
+        frame = frame.sort_values(date_column)
+        dates = np.asarray(frame[date_column].astype("datetime64[ns]"), dtype="datetime64[D]")
+        tickers = [c for c in frame.columns if c != date_column]
+        prices = frame[tickers].to_numpy(dtype=float)
+        prices, first_valid = forward_fill(prices)
+        return cls(dates, np.array([str(t) for t in tickers]), prices, first_valid, version)
+
+    @classmethod
+    def from_file(cls, path, cache_dir=CACHE_DIR):
+        # Load a CSV or Parquet price file, reusing the memory-mapped cache for the same file content
+        version = file_version(path)
+        directory = os.path.join(cache_dir, f"prices-{version}") if cache_dir else None
+        if directory and os.path.isdir(directory):
+            try:
+                return cls.load(directory, version)
+            except (OSError, ValueError):
+                pass
+
+        import pandas as pd
+        if path.lower().endswith((".parquet", ".pq")):
+            frame = pd.read_parquet(path)
+        else:
+            frame = pd.read_csv(path)
+        history = cls.from_frame(frame, version)
+        if directory:
+            history.save(directory)
+            return cls.load(directory, version)
+        return history
+
+    def save(self, directory):
+        tmp_dir = f"{directory}.{os.getpid()}.tmp"
+        os.makedirs(tmp_dir, exist_ok=True)
+        for column in HISTORY_COLUMNS:
+            np.save(os.path.join(tmp_dir, f"{column}.npy"), getattr(self, column))
+        try:
+            os.rename(tmp_dir, directory)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    @classmethod
+    def load(cls, directory, version=None):
+        arrays = [np.load(os.path.join(directory, f"{column}.npy"), mmap_mode="r") for column in HISTORY_COLUMNS]
+        return cls(*arrays, version=version)
+
+
+@functools.lru_cache(maxsize=None)
+def default_history():
+    # Price history named by ADVISOR_PRICE_HISTORY, loaded once per process (None if not configured)
+    if not PRICE_HISTORY:
+        return None
+    return PriceHistory.from_file(PRICE_HISTORY)
+
+
+def forward_fill(prices):
+    # Carry the last known price over gaps; rows before a ticker's first price stay NaN
+    valid = ~np.isnan(prices)
+    rows = np.where(valid, np.arange(len(prices))[:, None], 0)
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    filled = prices[rows, np.arange(prices.shape[1])]
+    first_valid = np.where(valid.any(axis=0), valid.argmax(axis=0), len(prices))
+    filled[np.arange(len(prices))[:, None] < first_valid] = np.nan
+    return filled, first_valid
+
+
+def rebalance_starts(dates, rebalance):
+    # Row positions where a new holding period starts (always includes row 0)
+    if rebalance is None:
+        return np.array([0])
+    step = REBALANCE_MONTHS[rebalance]
+    periods = dates.astype("datetime64[M]").astype(int) // step
+    return np.concatenate(([0], np.flatnonzero(np.diff(periods)) + 1))
+
+
+def portfolio_values(prices, weights, starts):
+    # Value per unit invested (days) and per-asset values (days x assets), rebalanced to weights
+    # at the close of every start row. Between rebalances each asset is buy-and-hold.
+    days = np.arange(len(prices))
+    # Each day is valued with the holdings of the last period that started before it
+    period = np.maximum(np.searchsorted(starts, days, side="left") - 1, 0)
+    relative = prices / prices[starts[period]]
+    growth = relative @ weights
+    # Growth on a start row closes the previous period; compound those into each period's capital
+    capital = np.concatenate(([1.0], np.cumprod(growth[starts[1:]])))[period]
+    return capital * growth, capital[:, None] * weights * relative
+
+
+def rolling_returns(values, window=ROLLING_WINDOW_DAYS):
+    rolled = np.full(len(values), np.nan)
+    if len(values) > window:
+        rolled[window:] = values[window:] / values[:-window] - 1
+    return rolled
+
+
+def drawdowns(values):
+    return values / np.maximum.accumulate(values) - 1
+
+
+def run_backtest(history, allocation, initial_investment, rebalance="monthly", start=None, end=None,
+                 window=ROLLING_WINDOW_DAYS):
+    # Backtest an allocation; returns {"results": SeriesResult with the simulate_growth columns, "stats", "missing"}.
+    # Assets without price history are dropped and the remaining weights renormalised.
+    try:
+        if rebalance is not None and rebalance not in REBALANCE_MONTHS:
+            raise ValueError(f"Unknown rebalance frequency {rebalance!r}")
+        missing = [name for name in allocation if name not in history.name_index]
+        held = [name for name in allocation if name in history.name_index and allocation[name] > 0]
+        if not held:
+            raise ValueError("None of the allocated assets have price history")
+        positions = np.array([history.name_index[name] for name in held])
+        weights = np.array([allocation[name] for name in held], dtype=float)
+        weights /= weights.sum()
+
+        # Start once every held asset has a price, then apply the date filters
+        first = int(history.first_valid[positions].max())
+        rows = np.arange(first, len(history.dates))
+        if start is not None:
+            rows = rows[history.dates[rows] >= np.datetime64(start, "D")]
+        if end is not None:
+            rows = rows[history.dates[rows] <= np.datetime64(end, "D")]
+        if len(rows) < 2:
+            raise ValueError("Not enough price history in the selected range")
+
+        dates = history.dates[rows]
+        prices = np.asarray(history.prices[rows[0]:rows[-1] + 1][:, positions])
+        unit_values, unit_asset_values = portfolio_values(prices, weights, rebalance_starts(dates, rebalance))
+        total_value = unit_values * initial_investment
+
+        # 6% annual inflation, compounded by calendar day
+        elapsed_days = (dates - dates[0]).astype(int)
+        inflation_adjusted = total_value / (1 + advisor.INFLATION_RATE) ** (elapsed_days / 365.25)
+
+        columns = {
+            'Total_Value': total_value,
+            'Inflation_Adjusted_Value': inflation_adjusted,
+            'Rolling_Return': rolling_returns(unit_values, window),
+            'Drawdown': drawdowns(unit_values),
+        }
+        for idx, name in enumerate(held):
+            columns[name] = unit_asset_values[:, idx] * initial_investment
+        results = SeriesResult(dates, columns)
+
+        years = max(elapsed_days[-1] / 365.25, 1e-9)
+        daily_returns = unit_values[1:] / unit_values[:-1] - 1
+        rolled = columns['Rolling_Return'][~np.isnan(columns['Rolling_Return'])]
+        stats = {
+            "start": str(dates[0]),
+            "end": str(dates[-1]),
+            "total_return": float(unit_values[-1] - 1),
+            "annualized_return": float(unit_values[-1] ** (1 / years) - 1),
+            "annualized_volatility": float(daily_returns.std() * np.sqrt(TRADING_DAYS)),
+            "max_drawdown": float(columns['Drawdown'].min()),
+            "best_rolling_return": float(rolled.max()) if len(rolled) else None,
+            "worst_rolling_return": float(rolled.min()) if len(rolled) else None,
+            "rebalance": rebalance,
+        }
+        return {"results": results, "stats": stats, "missing": missing}
+    except Exception as e:
+        advisor.report_error(f"Backtest error: {e}")
+        return None
+
+
+def synthetic_history(names, years=10, seed=0):
+    # Random-walk daily prices (business days) for benchmarks and demos
+    rng = np.random.default_rng(seed)
+    dates = np.arange(np.datetime64("2015-01-01"), np.datetime64("2015-01-01") + int(years * 365.25), dtype="datetime64[D]")
+    dates = dates[np.is_busday(dates)]
+    returns = rng.normal(0.0003, 0.01, (len(dates), len(names)))
+    prices = 100 * np.cumprod(1 + returns, axis=0)
+    return PriceHistory(dates, np.array(names), prices, np.zeros(len(names), dtype=int))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backtest a recommended allocation on daily price history.")
+    parser.add_argument("prices", help="CSV/Parquet with a date column and one price column per asset (or date,name,price rows)")
+    parser.add_argument("--risk-score", type=float, default=0.5)
+    parser.add_argument("--method", choices=sorted(advisor.ALLOCATION_METHODS), default="buckets")
+    parser.add_argument("--rebalance", choices=sorted(REBALANCE_MONTHS) + ["none"], default="monthly")
+    parser.add_argument("--amount", type=float, default=10000)
+    parser.add_argument("--start")
+    parser.add_argument("--end")
+    args = parser.parse_args(argv)
+
+    assets = advisor.default_universe()
+    allocation = advisor.recommend_allocation(assets, args.risk_score, method=args.method, version=assets.version)
+    load_start = time.perf_counter()
+    history = PriceHistory.from_file(args.prices)
+    run_start = time.perf_counter()
+    backtest = run_backtest(history, allocation, args.amount, None if args.rebalance == "none" else args.rebalance,
+                            args.start, args.end)
+    finished = time.perf_counter()
+    if backtest is None:
+        raise SystemExit(1)
+    if backtest["missing"]:
+        print(f"No price history for: {', '.join(backtest['missing'])}")
+    for key, value in backtest["stats"].items():
+        print(f"{key:<22} {value}")
+    print(f"Loaded {history.prices.shape[0]} days x {history.prices.shape[1]} tickers in {run_start - load_start:.3f}s, "
+          f"backtest in {finished - run_start:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+import argparse
+import csv
+import json
+import logging
+import os
+import time
+import datetime
+
+import advisor
+import parallel
+import persistence
+from migrate import parse_literal
+
+# Headless batch advisory pipeline: re-scores client profiles without the Streamlit app.
+# Run this code using "python batch.py --csv profiles.csv" or "python batch.py --from-db"
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 250
+
+# Profile columns expected in a CSV file (investment_goals is ";" separated)
+CSV_FIELDS = ["name", "income", "savings", "risk_score", "target_return", "investment_goals", "initial_investment"]
+
+
+def default_investment(savings):
+    # Same default as the "Investment Amount" slider in main.py
+    return min(10000, int(savings / 2))
+
+
+def read_csv_profiles(path):
+    # Stream profiles from a CSV file one row at a time
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            savings = float(row.get("savings") or 0)
+            goals = row.get("investment_goals") or ""
+            initial_investment = row.get("initial_investment")
+            yield {
+                "user_id": int(row["user_id"]) if row.get("user_id") else None,
+                "name": row.get("name", ""),
+                "income": float(row.get("income") or 0),
+                "savings": savings,
+                "risk_score": float(row["risk_score"]),
+                "target_return": float(row.get("target_return") or 0.08),
+                "investment_goals": [goal.strip() for goal in goals.split(";") if goal.strip()],
+                "initial_investment": float(initial_investment) if initial_investment else default_investment(savings),
+            }
+
+
+def read_db_profiles(db_path=None, fetch_size=DEFAULT_CHUNK_SIZE):
+    # Stream profiles from the users table, with each user's latest investment amount.
+    # Pages are read by id so no read transaction stays open while results are written.
+    with persistence.get_pool(db_path or advisor.DB_PATH).connection() as conn:
+        last_id = 0
+        while True:
+            rows = conn.execute('''
+            SELECT u.id, u.name, u.income, u.savings, u.risk_score, u.target_return, u.investment_goals,
+                   (SELECT p.initial_investment FROM portfolios p WHERE p.user_id = u.id ORDER BY p.id DESC LIMIT 1)
+            FROM users u
+            WHERE u.id > ?
+            ORDER BY u.id
+            LIMIT ?
+            ''', (last_id, fetch_size)).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            for user_id, name, income, savings, risk_score, target_return, goals, initial_investment in rows:
+                savings = savings or 0.0
+                # Stored as str(list); parsed so profiles read the same as from a CSV file
+                goals = parse_literal(goals, (list, tuple)) or []
+                yield {
+                    "user_id": user_id,
+                    "name": name,
+                    "income": income or 0.0,
+                    "savings": savings,
+                    "risk_score": risk_score,
+                    "target_return": target_return,
+                    "investment_goals": [str(goal) for goal in goals],
+                    "initial_investment": initial_investment if initial_investment is not None else default_investment(savings),
+                }
+
+
+def score_profile(profile, assets, years=5, method="buckets", version=None):
+    # Allocation -> simulation -> recommendations for one profile (version: asset universe version, if known)
+    allocation = advisor.recommend_allocation(assets, profile["risk_score"], method=method, version=version)
+    portfolio_data = {
+        "allocation": allocation,
+        "initial_investment": profile["initial_investment"],
+    }
+    simulation_results = advisor.simulate_growth(profile["initial_investment"], allocation, assets, years=years)
+    recommendations = advisor.generate_recommendations(profile, portfolio_data, assets, simulation_results)
+
+    expected_return = advisor.portfolio_return(allocation, assets)
+    final_row = simulation_results.iloc[-1] if not simulation_results.empty else None
+    return {
+        "user_id": profile.get("user_id"),
+        "name": profile["name"],
+        "allocation": allocation,
+        "initial_investment": profile["initial_investment"],
+        "years": years,
+        "expected_return": expected_return,
+        "final_value": float(final_row["Total_Value"]) if final_row is not None else None,
+        "inflation_adjusted_value": float(final_row["Inflation_Adjusted_Value"]) if final_row is not None else None,
+        "recommendations": recommendations,
+    }
+
+
+def score_chunk(profiles, years=5, method="buckets"):
+    # Worker entry point: score a list of profiles with the process-wide asset list
+    assets, version = parallel.worker_assets()
+    return [score_profile(profile, assets, years, method, version) for profile in profiles]
+
+
+def score_profiles(profiles, years=5, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, method="buckets"):
+    # Score a stream of profiles across a process pool, yielding one list of results per chunk
+    return parallel.map_chunks(score_chunk, profiles, chunk_size, workers, years, method)
+
+
+def setup_results_table(conn):
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS advisory_results (
+        id INTEGER PRIMARY KEY,
+        user_id INTEGER,
+        name TEXT,
+        allocation TEXT,
+        initial_investment REAL,
+        years INTEGER,
+        expected_return REAL,
+        final_value REAL,
+        inflation_adjusted_value REAL,
+        recommendations TEXT,
+        scored_at TEXT,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )
+    ''')
+
+
+def write_results(conn, results, scored_at):
+    # Write one chunk of results in a single transaction
+    with persistence.transaction(conn):
+        conn.executemany('''
+        INSERT INTO advisory_results (user_id, name, allocation, initial_investment, years, expected_return,
+                                      final_value, inflation_adjusted_value, recommendations, scored_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [
+            (
+                result["user_id"],
+                result["name"],
+                json.dumps(result["allocation"]),
+                result["initial_investment"],
+                result["years"],
+                result["expected_return"],
+                result["final_value"],
+                result["inflation_adjusted_value"],
+                json.dumps(result["recommendations"]),
+                scored_at,
+            )
+            for result in results
+        ])
+
+
+def run_batch(profiles, db_path=None, years=5, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, method="buckets"):
+    # Score profiles and write the results back in bulk; returns throughput statistics
+    db_path = db_path or advisor.DB_PATH
+    persistence.ensure_schema(db_path)
+    with persistence.get_pool(db_path).connection() as conn:
+        setup_results_table(conn)
+        scored_at = datetime.datetime.now().isoformat(timespec="seconds")
+        count = 0
+        start = time.perf_counter()
+        for results in score_profiles(profiles, years=years, workers=workers, chunk_size=chunk_size, method=method):
+            write_results(conn, results, scored_at)
+            count += len(results)
+            elapsed = time.perf_counter() - start
+            logger.info("Scored %d profiles (%.1f profiles/s)", count, count / elapsed if elapsed else 0.0)
+        elapsed = time.perf_counter() - start
+    return {
+        "profiles": count,
+        "seconds": elapsed,
+        "profiles_per_second": count / elapsed if elapsed else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-score client profiles without the Streamlit app.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--csv", help="CSV file with columns: " + ", ".join(CSV_FIELDS))
+    source.add_argument("--from-db", action="store_true", help="read profiles from the users table")
+    parser.add_argument("--db", default=advisor.DB_PATH, help="SQLite database to read from and write results to")
+    parser.add_argument("--years", type=int, default=5, help="simulation horizon in years")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="profiles per worker task")
+    parser.add_argument("--method", choices=sorted(advisor.ALLOCATION_METHODS), default="buckets", help="allocation method")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    if args.csv:
+        profiles = read_csv_profiles(args.csv)
+    else:
+        profiles = read_db_profiles(args.db, fetch_size=args.chunk_size)
+
+    stats = run_batch(profiles, db_path=args.db, years=args.years, workers=args.workers,
+                      chunk_size=args.chunk_size, method=args.method)
+    print(f"Scored {stats['profiles']} profiles in {stats['seconds']:.2f}s "
+          f"({stats['profiles_per_second']:.1f} profiles/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+# Offline benchmarks for the advisory hot paths; nothing here starts the Streamlit app.
+# Run this code using "python benchmarks/bench_advisor.py" (add --quick for a short run) and
+# compare against an earlier run with "--baseline benchmarks/results/<file>.json".
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+
+import advisor
+import backtest
+import charts
+import persistence
+import schedules
+from sweep import scenario_grid
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+FULL_SWEEP = {
+    "years": [1, 5, 10, 15, 25, 50],
+    "asset_counts": [10, 100, 1000],
+    "db_rows": [1_000, 10_000, 100_000, 1_000_000],
+    "renders": 5,
+    "backtest_tickers": [10, 100, 500],
+    "schedules": [1, 100, 1000],
+}
+QUICK_SWEEP = {
+    "years": [1, 15, 50],
+    "asset_counts": [10, 100],
+    "db_rows": [1_000, 10_000],
+    "renders": 2,
+    "backtest_tickers": [10, 100],
+    "schedules": [1, 100],
+}
+
+ASSET_TYPES = ["stock", "bond", "commodity", "real_estate"]
+
+
+def make_assets(count, seed=0):
+    # The 10 default assets, topped up with synthetic instruments of every type
+    assets = advisor.load_default_assets()[:count]
+    rng = np.random.default_rng(seed)
+    for i in range(len(assets), count):
+        assets.append({
+            "name": f"Synthetic Asset {i}",
+            "type": ASSET_TYPES[i % len(ASSET_TYPES)],
+            "return": float(rng.uniform(0.02, 0.14)),
+            "risk": float(rng.uniform(0.1, 1.0)),
+            "price": float(rng.uniform(10, 500)),
+        })
+    return assets
+
+
+def time_call(fn, repeat=5, min_time=0.05):
+    # Median seconds per call over `repeat` rounds; each round loops until it takes at least min_time
+    fn()
+    samples = []
+    for _ in range(repeat):
+        loops = 0
+        start = time.perf_counter()
+        while True:
+            fn()
+            loops += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= min_time:
+                break
+        samples.append(elapsed / loops)
+    return statistics.median(samples)
+
+
+USER = {
+    "name": "Benchmark User",
+    "income": 1200000.0,
+    "savings": 500000.0,
+    "risk_score": 0.55,
+    "target_return": 0.08,
+    "investment_goals": ["Retirement", "Education"],
+}
+
+
+def bench_simulation(sweep, results):
+    for count in sweep["asset_counts"]:
+        assets = make_assets(count)
+        allocation = advisor.recommend_allocation(assets, 0.55)
+        results[f"recommend_allocation[assets={count}]"] = time_call(
+            lambda: advisor.recommend_allocation(assets, 0.55))
+        for years in sweep["years"]:
+            results[f"simulate_growth[assets={count},years={years}]"] = time_call(
+                lambda: advisor.simulate_growth(10000, allocation, assets, years=years))
+
+        # 3 risk bands x 15 horizons x 100 amounts in one batched computation
+        amounts = np.linspace(1000, 500000, 100)
+        horizons = np.arange(1, 16)
+        results[f"scenario_grid[assets={count},scenarios=4500]"] = time_call(
+            lambda: scenario_grid(assets, amounts, horizons))
+
+        simulation_results = advisor.simulate_growth(10000, allocation, assets, years=15)
+        portfolio_data = {"allocation": allocation, "initial_investment": 10000}
+        results[f"generate_recommendations[assets={count}]"] = time_call(
+            lambda: advisor.generate_recommendations(USER, portfolio_data, assets, simulation_results))
+
+
+def bench_charts(sweep, results):
+    assets = make_assets(10)
+    allocation = advisor.recommend_allocation(assets, 0.55)
+    portfolio_data = {"allocation": allocation, "initial_investment": 10000}
+    for years in (1, 15, 50):
+        simulation_results = advisor.simulate_growth(10000, allocation, assets, years=years)
+        results[f"create_portfolio_visualizations[years={years}]"] = time_call(
+            lambda: charts.render_chart(portfolio_data, simulation_results), repeat=sweep["renders"], min_time=0)
+
+
+def bench_backtest(sweep, results):
+    # Ten years of daily prices, rebalanced monthly
+    for count in sweep["backtest_tickers"]:
+        names = [f"Ticker {i}" for i in range(count)]
+        history = backtest.synthetic_history(names, years=10)
+        allocation = {name: 1 / count for name in names}
+        results[f"run_backtest[tickers={count},years=10]"] = time_call(
+            lambda: backtest.run_backtest(history, allocation, 10000, "monthly"))
+
+
+def bench_schedules(sweep, results):
+    # 30-year monthly SIPs with a 10% annual step-up, batched across schedules
+    assets = make_assets(10)
+    allocation = advisor.recommend_allocation(assets, 0.55)
+    for count in sweep["schedules"]:
+        contributions = np.stack([
+            schedules.contribution_schedule(30, amount, "monthly", 0.1) for amount in np.linspace(1000, 50000, count)
+        ])
+        initial = np.full(count, 10000.0)
+        for rebalance in schedules.REBALANCE_POLICIES:
+            results[f"schedule_values[schedules={count},years=30,rebalance={rebalance}]"] = time_call(
+                lambda: schedules.schedule_values(initial, contributions, allocation, assets, rebalance))
+
+
+def populate(db_path, rows):
+    persistence.ensure_schema(db_path)
+    conn = sqlite3.connect(db_path)
+    allocation = str(advisor.recommend_allocation(advisor.load_default_assets(), 0.55))
+    batch = 50_000
+    with conn:
+        for start in range(0, rows, batch):
+            ids = range(start + 1, min(start + batch, rows) + 1)
+            conn.executemany(
+                "INSERT INTO users (id, name, income, savings, risk_score, target_return, investment_goals) "
+                "VALUES (?, ?, 1000000, 100000, ?, 0.08, \"['Retirement']\")",
+                ((i, f"user {i}", (i % 100) / 100) for i in ids))
+            conn.executemany(
+                "INSERT INTO portfolios (id, user_id, allocation, initial_investment) VALUES (?, ?, ?, 10000)",
+                ((i, i, allocation) for i in ids))
+    conn.close()
+
+
+def bench_database(sweep, results, saves=200):
+    allocation = advisor.recommend_allocation(advisor.load_default_assets(), 0.55)
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in sweep["db_rows"]:
+            db_path = os.path.join(tmp, f"bench_{rows}.db")
+            populate(db_path, rows)
+            advisor.DB_PATH = db_path
+            start = time.perf_counter()
+            for i in range(saves):
+                advisor.save_user_portfolio(
+                    dict(USER, name=f"bench {rows} {i}"),
+                    {"allocation": allocation, "initial_investment": 10000 + i})
+            persistence.get_writer(db_path).flush()
+            results[f"save_user_portfolio[db_rows={rows}]"] = (time.perf_counter() - start) / saves
+
+
+def compare(results, baseline, threshold):
+    # Names of tracked paths that are slower than baseline * (1 + threshold)
+    regressions = []
+    for name, seconds in results.items():
+        previous = baseline.get(name)
+        if previous and seconds > previous * (1 + threshold):
+            regressions.append((name, previous, seconds))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the advisory hot paths.")
+    parser.add_argument("--quick", action="store_true", help="smaller sweep for a fast check")
+    parser.add_argument("--only", choices=["simulation", "charts", "database", "backtest", "schedules"], action="append",
+                        help="run only these groups (repeatable)")
+    parser.add_argument("--output", help="JSON results file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed slowdown versus the baseline before failing (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    sweep = QUICK_SWEEP if args.quick else FULL_SWEEP
+    groups = args.only or ["simulation", "charts", "database", "backtest", "schedules"]
+    results = {}
+    if "simulation" in groups:
+        bench_simulation(sweep, results)
+    if "charts" in groups:
+        bench_charts(sweep, results)
+    if "database" in groups:
+        bench_database(sweep, results)
+    if "backtest" in groups:
+        bench_backtest(sweep, results)
+    if "schedules" in groups:
+        bench_schedules(sweep, results)
+
+    for name, seconds in results.items():
+        print(f"{name:<55} {seconds * 1e3:10.3f} ms")
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, datetime.datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({
+            "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "sweep": sweep,
+            "results": results,
+        }, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for name, previous, seconds in regressions:
+            print(f"REGRESSION {name}: {previous * 1e3:.3f} ms -> {seconds * 1e3:.3f} ms")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from bench_advisor import ROOT, compare
+
+# Concurrent-session load test: N scripted sessions run main.py at the same time through Streamlit's
+# AppTest (in-process, no browser or network) and every rerun is timed. Each session submits a profile,
+# moves the investment slider a few times, runs a simulation (polled until the job finishes) and
+# presses Save Portfolio on the Recommendations tab, which writes the portfolio to SQLite.
+# Each concurrency level runs in a fresh interpreter with its own database, so caches, RSS and the
+# writer statistics start from zero. Lock wait is the time every write transaction in the process spent
+# in BEGIN IMMEDIATE waiting for SQLite's write lock (persistence.lock_wait_stats).
+# Run this code using "python benchmarks/bench_load.py --sessions 1 2 4 8 16" (same --output/--baseline options as bench_advisor.py)
+
+GOALS = ["Retirement", "Education", "Home Purchase", "Vacation", "Wealth Building"]
+RSS_SAMPLE_SECONDS = 0.05
+STREAMLIT_VERSION = "1.65.0"  # share_runtime patches AppTest internals; pinned in benchmarks/requirements.txt
+
+
+def percentile(values, q):
+    # Nearest-rank percentile of a non-empty list
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered))) - 1))]
+
+
+def share_runtime():
+    # AppTest installs a mock Runtime for each run and clears it when the run ends, which pulls it out from
+    # under the sessions still running; keep the last one installed, like the single Runtime of a real server
+    import streamlit
+    if streamlit.__version__ != STREAMLIT_VERSION:
+        raise SystemExit(f"bench_load.py patches Streamlit {STREAMLIT_VERSION} internals; "
+                         f"found {streamlit.__version__} (pip install -r benchmarks/requirements.txt)")
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.testing.v1 import app_test, local_script_runner
+
+    installed = {}
+
+    def instance(cls):
+        if cls._instance is not None:
+            installed["runtime"] = cls._instance
+        if "runtime" not in installed:
+            raise RuntimeError("Runtime hasn't been created!")
+        return installed["runtime"]
+
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(lambda cls: cls._instance is not None or "runtime" in installed)
+    # Each run also compiles main.py into a fresh ScriptCache, and parsing on several threads at once
+    # trips CPython's AST converter; a server compiles the script once, so share one cache, filled
+    # before any session starts
+    script_cache = ScriptCache()
+    script_cache.get_bytecode(os.path.join(ROOT, "main.py"))
+    app_test.ScriptCache = local_script_runner.ScriptCache = lambda: script_cache
+
+
+def run_session(index, seed, slider_moves, timings, failures):
+    # One scripted user; appends (step, seconds) for every rerun
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(seed + index)
+    steps = ["start"]
+
+    def timed(step, element):
+        steps.append(step)
+        start = time.perf_counter()
+        at = element.run()
+        timings.append((step, time.perf_counter() - start))
+        if at.exception:
+            raise RuntimeError(f"{step}: {at.exception[0].message}")
+        return at
+
+    def widget(elements, label):
+        for element in elements:
+            if element.label == label:
+                return element
+        raise LookupError(f"no {label!r} widget after {steps[-1]}")
+
+    try:
+        at = timed("first_render", AppTest.from_file(os.path.join(ROOT, "main.py"), default_timeout=300))
+        savings = rng.randrange(100000, 5000000, 500)
+        at.text_input[0].input(f"Load Session {index}")
+        widget(at.number_input, "Annual Income (INR)").set_value(float(rng.randrange(300000, 5000000)))
+        widget(at.number_input, "Total Savings (INR)").set_value(float(savings))
+        for goal in rng.sample(GOALS, rng.randint(1, 3)):
+            widget(at.checkbox, goal).check()
+        for radio in at.radio:
+            radio.set_value(rng.choice(radio.options))
+        at = timed("submit", widget(at.button, "Submit").click())
+
+        for _ in range(slider_moves):
+            at = timed("slider", widget(at.slider, "Investment Amount (INR)").set_value(rng.randrange(0, savings // 2, 500)))
+
+        # Includes the polling reruns until the job is done and the recommendations are generated
+        at = timed("simulation", widget(at.button, "Run Simulation").click())
+        if not any("Recommendations" in info.value for info in at.info):
+            raise RuntimeError("simulation did not finish")
+        # Save Portfolio is only shown once there are recommendations (a profile that triggers none
+        # has nothing to save); the step includes the polling reruns until the writer has stored it
+        save = [button for button in at.button if button.label == "Save Portfolio"]
+        if save:
+            at = timed("save", save[0].click())
+            if not any(success.value == "Portfolio saved." for success in at.success):
+                raise RuntimeError("portfolio was not saved")
+    except Exception as e:
+        failures.append(f"session {index}: {e}")
+
+
+def run_level(sessions, seed, slider_moves):
+    # Runs in a fresh interpreter (see main); returns the measurements for one concurrency level
+    from streamlit.testing.v1.util import patch_config_options
+
+    share_runtime()
+    import charts
+    import persistence
+
+    timings = []
+    failures = []
+    peak_rss = [charts.current_rss_kb()]
+    start_rss = peak_rss[0]
+    done = threading.Event()
+
+    def sample_rss():
+        while not done.wait(RSS_SAMPLE_SECONDS):
+            peak_rss[0] = max(peak_rss[0], charts.current_rss_kb())
+
+    sampler = threading.Thread(target=sample_rss, daemon=True)
+    sampler.start()
+    threads = [
+        threading.Thread(target=run_session, args=(i, seed, slider_moves, timings, failures))
+        for i in range(sessions)
+    ]
+    start = time.perf_counter()
+    # Each run also patches the config for its own duration; hold the same patch for the whole level
+    # so a run finishing early cannot restore the unpatched config under the others
+    with patch_config_options({"global.appTest": True}):
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    persistence.flush_writers()
+    elapsed = time.perf_counter() - start
+    done.set()
+    sampler.join()
+
+    reruns = [seconds for step, seconds in timings if step != "simulation"]
+    simulations = [seconds for step, seconds in timings if step == "simulation"]
+    writer = persistence.get_writer().stats
+    lock_waits = persistence.lock_wait_stats()
+    return {
+        "sessions": sessions,
+        "failures": failures,
+        "reruns": len(timings),
+        "rerun_p50": percentile(reruns, 50) if reruns else None,
+        "rerun_p95": percentile(reruns, 95) if reruns else None,
+        "rerun_p99": percentile(reruns, 99) if reruns else None,
+        "simulation_p50": percentile(simulations, 50) if simulations else None,
+        "simulation_p95": percentile(simulations, 95) if simulations else None,
+        "elapsed": elapsed,
+        "reruns_per_second": len(timings) / elapsed,
+        "sessions_per_second": (sessions - len(failures)) / elapsed,
+        "portfolios_written": writer["written"],
+        "write_transactions": lock_waits["transactions"],
+        "lock_wait_ms": lock_waits["wait_seconds"] * 1e3,
+        "max_lock_wait_ms": lock_waits["max_wait_seconds"] * 1e3,
+        "lock_retries": writer["lock_waits"],
+        "write_errors": writer["errors"],
+        "start_rss_mb": start_rss / 1024,
+        "peak_rss_mb": peak_rss[0] / 1024,
+    }
+
+
+def measure(sessions, seed, slider_moves):
+    with tempfile.TemporaryDirectory() as tmp:
+        # Keep the load away from the real database and frontier cache
+        env = dict(os.environ, PYTHONPATH=ROOT,
+                   ADVISOR_DB_PATH=os.path.join(tmp, "load.db"),
+                   ADVISOR_CACHE_DIR=os.path.join(tmp, "cache"))
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--level", str(sessions),
+             "--seed", str(seed), "--slider-moves", str(slider_moves)],
+            cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+        ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the Streamlit app with concurrent scripted sessions.")
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 2, 4, 8, 16],
+                        help="concurrency levels to run, one fresh process each")
+    parser.add_argument("--slider-moves", type=int, default=3, help="investment slider changes per session")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the scripted answers")
+    parser.add_argument("--output", help="JSON results file")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25)
+    parser.add_argument("--level", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.level is not None:
+        print(json.dumps(run_level(args.level, args.seed, args.slider_moves)))
+        return
+
+    levels = []
+    print(f"{'sessions':>8} {'reruns':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'sim p50 s':>9} "
+          f"{'reruns/s':>9} {'sessions/s':>10} {'lock wait ms':>12} {'max wait ms':>11} {'peak RSS MB':>11}")
+    for sessions in args.sessions:
+        level = measure(sessions, args.seed, args.slider_moves)
+        levels.append(level)
+        print(f"{sessions:>8} {level['reruns']:>7} {level['rerun_p50'] * 1e3:>8.1f} {level['rerun_p95'] * 1e3:>8.1f} "
+              f"{level['rerun_p99'] * 1e3:>8.1f} {level['simulation_p50']:>9.2f} {level['reruns_per_second']:>9.2f} "
+              f"{level['sessions_per_second']:>10.2f} {level['lock_wait_ms']:>12.2f} {level['max_lock_wait_ms']:>11.2f} "
+              f"{level['peak_rss_mb']:>11.1f}")
+        for failure in level["failures"]:
+            print(f"  FAILED {failure}")
+
+    # Latencies are tracked for regressions (lower is better); throughput and RSS are kept for reference
+    results = {}
+    for level in levels:
+        for name in ("rerun_p50", "rerun_p95", "rerun_p99", "simulation_p50"):
+            if level[name] is not None:
+                results[f"load_{level['sessions']}_sessions_{name}"] = level[name]
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "levels": levels,
+                "results": results,
+            }, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    failed = any(level["failures"] for level in levels)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for name, previous, seconds in regressions:
+            print(f"REGRESSION {name}: {previous * 1e3:.3f} ms -> {seconds * 1e3:.3f} ms")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
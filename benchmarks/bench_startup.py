@@ -0,0 +1,105 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from bench_advisor import ROOT, compare
+
+# Cold start benchmark: import time of the app modules and time to the first rendered page,
+# each measured in a fresh interpreter. Also reports which heavy libraries the first page loaded.
+# Run this code using "python benchmarks/bench_startup.py" (same --output/--baseline options as bench_advisor.py)
+
+HEAVY_MODULES = ("pandas", "matplotlib", "pyarrow")
+
+IMPORT_PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import advisor, cache, charts, persistence, questionnaire, telemetry
+seconds = time.perf_counter() - start
+print(json.dumps({"seconds": seconds, "heavy": [m for m in HEAVY_MODULES if m in sys.modules]}))
+"""
+
+APP_PROBE = """
+import sys, time, json
+from streamlit.testing.v1 import AppTest
+before = set(sys.modules)
+start = time.perf_counter()
+at = AppTest.from_file(MAIN, default_timeout=120).run()
+first_render = time.perf_counter() - start
+assert not at.exception, at.exception
+heavy = [m for m in HEAVY_MODULES if m in sys.modules and m not in before]
+
+start = time.perf_counter()
+at.run()
+rerun = time.perf_counter() - start
+
+at.text_input[0].input("Startup Bench")
+at.number_input[0].set_value(1200000.0)
+at.number_input[1].set_value(500000.0)
+at.checkbox[1].check()
+at.button[0].click().run()
+start = time.perf_counter()
+[b for b in at.button if b.label == "Run Simulation"][0].click().run()
+first_chart = time.perf_counter() - start
+assert not at.exception, at.exception
+print(json.dumps({"first_render": first_render, "rerun": rerun, "first_chart": first_chart, "heavy": heavy}))
+"""
+
+
+def run_probe(code, env):
+    preamble = f"HEAVY_MODULES = {HEAVY_MODULES!r}\nMAIN = {os.path.join(ROOT, 'main.py')!r}\n"
+    output = subprocess.run(
+        [sys.executable, "-c", preamble + code],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure cold import and first-render time.")
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters per measurement")
+    parser.add_argument("--output", help="JSON results file")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Keep the benchmark away from the real database and frontier cache
+        env = dict(os.environ, PYTHONPATH=ROOT,
+                   ADVISOR_DB_PATH=os.path.join(tmp, "startup.db"),
+                   ADVISOR_CACHE_DIR=os.path.join(tmp, "cache"))
+        imports = [run_probe(IMPORT_PROBE, env) for _ in range(args.repeat)]
+        apps = [run_probe(APP_PROBE, env) for _ in range(args.repeat)]
+
+    results = {
+        "import_app_modules": statistics.median(r["seconds"] for r in imports),
+        "first_render": statistics.median(r["first_render"] for r in apps),
+        "rerun": statistics.median(r["rerun"] for r in apps),
+        "first_chart": statistics.median(r["first_chart"] for r in apps),
+    }
+    for name, seconds in results.items():
+        print(f"{name:<25} {seconds * 1e3:10.1f} ms")
+    print(f"Heavy modules loaded by the app imports: {imports[0]['heavy'] or 'none'}")
+    print(f"Heavy modules loaded by the first page:  {apps[0]['heavy'] or 'none'}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"results": results, "heavy_modules": {"imports": imports[0]["heavy"], "first_render": apps[0]["heavy"]}}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for name, previous, seconds in regressions:
+            print(f"REGRESSION {name}: {previous * 1e3:.1f} ms -> {seconds * 1e3:.1f} ms")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+# Content-keyed caches shared by every Streamlit session in the process.
+# Streamlit re-executes main.py on each rerun but keeps imported modules, so caches live here.
+# Caches holding results have a byte budget as well as an entry count, measured with size_of like
+# the per-session results.ResultStore, so sharing a result across sessions cannot grow without bound.
+
+SIMULATION_CACHE_BYTES = int(float(os.environ.get("ADVISOR_SIMULATION_CACHE_MB", "64")) * 1024 * 1024)
+CHART_CACHE_BYTES = int(float(os.environ.get("ADVISOR_CHART_CACHE_MB", "32")) * 1024 * 1024)
+JOB_CACHE_BYTES = int(float(os.environ.get("ADVISOR_JOB_CACHE_MB", "32")) * 1024 * 1024)
+
+
+def size_of(value):
+    # Approximate bytes held by a value (arrays, compact results, DataFrames, chart bytes, jobs and containers of them)
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(size_of(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(size_of(v) for v in value)
+    if hasattr(value, "memory_usage"):
+        return int(value.memory_usage(deep=True).sum())
+    if hasattr(value, "nbytes"):
+        return int(value.nbytes)
+    return sys.getsizeof(value)
+
+
+class TTLCache:
+    # Thread-safe LRU cache with a time-to-live and hit/miss counters; with maxbytes, least recently
+    # used entries are also evicted until the values fit (a value larger than the budget is not kept)
+
+    def __init__(self, name, maxsize=256, ttl=600, maxbytes=None):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.maxbytes = maxbytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()  # key -> (expires_at, value, nbytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires_at, value, _ = entry
+                if expires_at > now:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._evict(key)
+            self.misses += 1
+            return default
+
+    def set(self, key, value, ttl=None):
+        # ttl overrides the cache's time-to-live for this entry
+        nbytes = size_of(value) if self.maxbytes is not None else 0
+        with self._lock:
+            self._remove(key)
+            self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value, nbytes)
+            self._bytes += nbytes
+            while len(self._data) > self.maxsize or (self.maxbytes is not None and self._bytes > self.maxbytes):
+                self._evict(next(iter(self._data)))
+
+    def _remove(self, key):
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+        return entry
+
+    def _evict(self, key):
+        self._remove(key)
+        self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        # The value is computed outside the lock; concurrent misses may compute it twice
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "cache": self.name,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "bytes": self._bytes,
+                "maxbytes": self.maxbytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def __len__(self):
+        return len(self._data)
+
+
+def make_key(allocation, investment_amount, years, universe_version, *extra):
+    # Cache key for anything derived from an allocation and the simulation inputs (years=None if unused)
+    years = int(years) if years is not None else None
+    return (tuple(sorted(allocation.items())), float(investment_amount), years, universe_version) + extra
+
+
+allocation_table_cache = TTLCache("allocation_table", maxsize=1024, ttl=3600)
+simulation_cache = TTLCache("simulation", maxsize=256, ttl=600, maxbytes=SIMULATION_CACHE_BYTES)
+chart_cache = TTLCache("chart", maxsize=128, ttl=600, maxbytes=CHART_CACHE_BYTES)  # rendered PNG/SVG bytes
+# Finished background jobs (see jobs.py); they only wait here until the sessions polling them have
+# copied the result into their session store, the parts stay shared through the caches above
+job_cache = TTLCache("job", maxsize=256, ttl=30, maxbytes=JOB_CACHE_BYTES)
+
+CACHES = [allocation_table_cache, simulation_cache, chart_cache, job_cache]
+
+
+def cache_stats():
+    return [c.stats() for c in CACHES]
@@ -0,0 +1,87 @@
+import argparse
+import gc
+import io
+import resource
+
+import advisor
+from cache import chart_cache
+
+# Renders portfolio charts to PNG/SVG bytes with the Agg canvas (no pyplot global state).
+# Rendered bytes are cached by the caller's content key, and every figure is released after rendering.
+# matplotlib is only imported when the first chart is drawn.
+# Run this code using "python charts.py --renders 2000" to check that RSS stays flat.
+
+CHART_FORMATS = {"png": "image/png", "svg": "image/svg+xml"}
+
+
+def figure_to_bytes(fig, fmt="png", dpi=100):
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    canvas = FigureCanvasAgg(fig)
+    buffer = io.BytesIO()
+    try:
+        canvas.print_figure(buffer, format=fmt, dpi=dpi)
+    finally:
+        fig.clear()
+    return buffer.getvalue()
+
+
+def render_chart(portfolio_data, simulation_results, monte_carlo=None, fmt="png", key=None):
+    # Chart bytes for the allocation pie and growth projection; key=None skips the cache
+    if fmt not in CHART_FORMATS:
+        raise ValueError(f"Unsupported chart format {fmt!r}")
+    cache_key = (key, fmt) if key is not None else None
+    if cache_key is not None:
+        cached = chart_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    fig = advisor.create_portfolio_visualizations(portfolio_data, simulation_results, monte_carlo=monte_carlo)
+    if fig is None:
+        return None
+    data = figure_to_bytes(fig, fmt)
+    if cache_key is not None:
+        chart_cache.set(cache_key, data)
+    return data
+
+
+def current_rss_kb():
+    # Resident set size now (Linux), falling back to the peak RSS elsewhere
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * resource.getpagesize() // 1024
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def memory_check(renders=2000, report_every=250, fmt="png"):
+    # Render many uncached charts and report RSS; a leak shows up as steady growth
+    assets = advisor.load_default_assets()
+    samples = []
+    for i in range(renders):
+        allocation = advisor.recommend_allocation(assets, (i % 100) / 100)
+        portfolio_data = {"allocation": allocation, "initial_investment": 10000 + i}
+        results = advisor.simulate_growth(10000 + i, allocation, assets, years=1 + i % 15)
+        render_chart(portfolio_data, results, fmt=fmt)
+        if (i + 1) % report_every == 0:
+            gc.collect()
+            samples.append((i + 1, current_rss_kb()))
+            print(f"{i + 1:>6} renders  RSS {samples[-1][1] / 1024:.1f} MB")
+    return samples
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check that chart rendering does not leak memory.")
+    parser.add_argument("--renders", type=int, default=2000)
+    parser.add_argument("--report-every", type=int, default=250)
+    parser.add_argument("--format", choices=sorted(CHART_FORMATS), default="png")
+    args = parser.parse_args(argv)
+
+    samples = memory_check(args.renders, args.report_every, args.format)
+    if len(samples) >= 2:
+        growth = samples[-1][1] - samples[0][1]
+        print(f"RSS change after the first sample: {growth / 1024:+.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
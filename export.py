@@ -0,0 +1,257 @@
+import argparse
+import contextlib
+import csv
+import json
+import os
+import sqlite3
+import sys
+from urllib.request import pathname2url
+
+import persistence
+
+# Streaming export of the advisor tables to CSV, JSON Lines or Parquet.
+# Rows are paged by key and read with fetchmany, so memory stays flat for any table size.
+# Run this code using "python export.py portfolios --format csv --output portfolios.csv"
+
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_PAGE_SIZE = 50000
+
+# Exportable tables: key columns used for keyset pagination and the column used by date filters
+TABLES = {
+    "users": {"keys": ("id",), "date": "created_at"},
+    "portfolios": {"keys": ("id",), "date": "created_at"},
+    "portfolio_allocations": {"keys": ("portfolio_id", "asset_name"), "date": None},
+    "user_goals": {"keys": ("user_id", "goal"), "date": None},
+    "portfolio_submissions": {"keys": ("submission_key",), "date": "created_at"},
+    "advisory_results": {"keys": ("id",), "date": "scored_at"},
+}
+
+
+def connect_readonly(db_path):
+    # Exports only read: mode=ro sets no pragmas (so no WAL switch or -wal/-shm files next to the
+    # database) and a mistyped path fails instead of creating an empty database
+    return sqlite3.connect(f"file:{pathname2url(os.path.abspath(db_path))}?mode=ro", uri=True)
+
+
+def table_columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def column_types(conn, table):
+    return {row[1]: row[2].upper() for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def key_value(text, sqlite_type):
+    # Command-line key part converted to its column's type, so it compares like the stored keys
+    if "INT" in sqlite_type:
+        return int(text)
+    if "REAL" in sqlite_type or "FLOA" in sqlite_type or "DOUB" in sqlite_type:
+        return float(text)
+    return text
+
+
+def iter_batches(conn, table, columns=None, since=None, until=None, after=None,
+                 limit=None, batch_size=DEFAULT_BATCH_SIZE, page_size=DEFAULT_PAGE_SIZE):
+    # Yield (column_names, rows) batches in key order.
+    # after: key tuple to resume from; since/until: inclusive/exclusive bounds on the table's date column.
+    if table not in TABLES:
+        raise ValueError(f"Unknown table {table!r}; choose from {', '.join(TABLES)}")
+    spec = TABLES[table]
+    available = table_columns(conn, table)
+    if not available:
+        raise ValueError(f"Table {table} does not exist in this database")
+    columns = list(columns or available)
+    unknown = [c for c in columns if c not in available]
+    if unknown:
+        raise ValueError(f"Unknown column(s) for {table}: {', '.join(unknown)}")
+    if (since or until) and spec["date"] not in available:
+        raise ValueError(f"Table {table} has no date column to filter on")
+
+    keys = spec["keys"]
+    # Key columns are always read so the next page can start after the last row
+    selected = columns + [k for k in keys if k not in columns]
+    key_positions = [selected.index(k) for k in keys]
+    output_width = len(columns)
+
+    filters = []
+    params = []
+    if since:
+        filters.append(f"{spec['date']} >= ?")
+        params.append(since)
+    if until:
+        filters.append(f"{spec['date']} < ?")
+        params.append(until)
+
+    last_key = None
+    if after:
+        if len(after) != len(keys):
+            raise ValueError(f"after needs {len(keys)} value(s) for {table}: {', '.join(keys)}")
+        types = column_types(conn, table)
+        try:
+            last_key = tuple(
+                key_value(part, types[key]) if isinstance(part, str) else part for key, part in zip(keys, after)
+            )
+        except ValueError:
+            raise ValueError(f"after value {', '.join(map(str, after))} does not match the key types of {table}")
+
+    key_list = ", ".join(keys)
+    key_placeholders = ", ".join("?" for _ in keys)
+    remaining = limit
+    while remaining is None or remaining > 0:
+        where = list(filters)
+        page_params = list(params)
+        if last_key is not None:
+            where.append(f"({key_list}) > ({key_placeholders})")
+            page_params.extend(last_key)
+        page_limit = page_size if remaining is None else min(page_size, remaining)
+        sql = f"SELECT {', '.join(selected)} FROM {table}"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY {key_list} LIMIT ?"
+
+        cursor = conn.execute(sql, page_params + [page_limit])
+        page_rows = 0
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            page_rows += len(rows)
+            last_key = tuple(rows[-1][p] for p in key_positions)
+            yield columns, [row[:output_width] for row in rows]
+        cursor.close()
+
+        if remaining is not None:
+            remaining -= page_rows
+        if page_rows < page_limit:
+            break
+
+
+class CsvWriter:
+    def __init__(self, stream, delimiter=","):
+        self._writer = csv.writer(stream, delimiter=delimiter)
+        self._header_written = False
+
+    def write(self, columns, rows):
+        if not self._header_written:
+            self._writer.writerow(columns)
+            self._header_written = True
+        self._writer.writerows(rows)
+
+    def close(self):
+        pass
+
+
+class JsonLinesWriter:
+    def __init__(self, stream):
+        self._stream = stream
+
+    def write(self, columns, rows):
+        self._stream.writelines(json.dumps(dict(zip(columns, row))) + "\n" for row in rows)
+
+    def close(self):
+        pass
+
+
+class ParquetWriter:
+    # Each batch becomes one row group; requires the optional pyarrow package
+
+    def __init__(self, path, types):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet export requires pyarrow (pip install pyarrow)")
+        self._pa = pa
+        self._pq = pq
+        self._path = path
+        self._types = types
+        self._writer = None
+
+    def _arrow_type(self, sqlite_type):
+        if "INT" in sqlite_type:
+            return self._pa.int64()
+        if "REAL" in sqlite_type or "FLOA" in sqlite_type or "DOUB" in sqlite_type:
+            return self._pa.float64()
+        return self._pa.string()
+
+    def write(self, columns, rows):
+        if self._writer is None:
+            schema = self._pa.schema([(name, self._arrow_type(self._types.get(name, ""))) for name in columns])
+            self._writer = self._pq.ParquetWriter(self._path, schema)
+        arrays = [
+            self._pa.array([row[i] for row in rows], type=self._writer.schema.field(i).type)
+            for i in range(len(columns))
+        ]
+        self._writer.write_table(self._pa.Table.from_arrays(arrays, schema=self._writer.schema))
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def export_table(db_path, table, output=None, fmt="csv", delimiter=",", **filters):
+    # Stream one table to a file path or text stream; returns the number of rows written
+    if fmt == "parquet" and not isinstance(output, str):
+        raise ValueError("Parquet export needs an output file path")
+
+    count = 0
+    stream = None
+    writer = None
+    with contextlib.closing(connect_readonly(db_path)) as conn:
+        try:
+            if fmt == "parquet":
+                writer = ParquetWriter(output, column_types(conn, table))
+            else:
+                stream = open(output, "w", newline="", encoding="utf-8") if isinstance(output, str) else (output or sys.stdout)
+                writer = CsvWriter(stream, delimiter) if fmt == "csv" else JsonLinesWriter(stream)
+            for columns, rows in iter_batches(conn, table, **filters):
+                writer.write(columns, rows)
+                count += len(rows)
+        finally:
+            if writer is not None:
+                writer.close()
+            if isinstance(output, str) and stream is not None:
+                stream.close()
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export advisor tables in fixed-size batches.")
+    parser.add_argument("table", choices=sorted(TABLES))
+    parser.add_argument("--db", default=persistence.DB_PATH, help="SQLite database to read")
+    parser.add_argument("--format", choices=["csv", "jsonl", "parquet"], default="csv")
+    parser.add_argument("--output", help="output file (default: stdout; required for parquet)")
+    parser.add_argument("--columns", help="comma separated columns to export (default: all)")
+    parser.add_argument("--since", help="only rows on or after this ISO date/time")
+    parser.add_argument("--until", help="only rows before this ISO date/time")
+    parser.add_argument("--after", help="resume after this key (comma separated for composite keys)")
+    parser.add_argument("--limit", type=int, help="maximum number of rows")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="rows per fetchmany call")
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE, help="rows per keyset page query")
+    parser.add_argument("--delimiter", default=",", help="CSV delimiter")
+    args = parser.parse_args(argv)
+
+    try:
+        count = export_table(
+            args.db,
+            args.table,
+            args.output,
+            fmt=args.format,
+            delimiter=args.delimiter,
+            columns=args.columns.split(",") if args.columns else None,
+            since=args.since,
+            until=args.until,
+            after=args.after.split(",") if args.after else None,
+            limit=args.limit,
+            batch_size=args.batch_size,
+            page_size=args.page_size,
+        )
+    except (ValueError, RuntimeError) as e:
+        parser.error(str(e))
+    except sqlite3.Error as e:
+        parser.error(f"Cannot read {args.db}: {e}")
+    print(f"Exported {count} rows from {args.table}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
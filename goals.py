@@ -0,0 +1,111 @@
+import numpy as np
+
+from advisor import INFLATION_RATE
+from universe import as_universe
+
+# Goal planning: solve for the lump sum, monthly contribution or horizon that reaches a target corpus,
+# instead of re-running the simulation by trial and error.
+# The projection is the same monthly model as simulate_growth / simulate_schedule: each asset grows by
+# its return / 12 a month and contributions (paid from month 1) are invested at the target weights.
+# After n months a lump sum L and monthly contribution c are worth L * M(n) + c * A(n), where
+#   M(n) = sum_i w_i g_i^n   and   A(n) = sum_i w_i (g_i^n - 1) / (g_i - 1),   g_i = 1 + r_i / 12
+# (with monthly rebalancing the blended rate g = w . g_i replaces the per-asset sums).
+# Lump sum and contribution are closed-form; the horizon is the first month where the value
+# reaches the inflated target, found with one vectorized pass over every month.
+
+MAX_YEARS = 100  # horizons beyond this are reported as unreachable
+
+# Starting points for the planner inputs: (target corpus in today's INR, years)
+GOAL_DEFAULTS = {
+    "Retirement": (10000000.0, 25),
+    "Education": (2000000.0, 15),
+    "Home Purchase": (5000000.0, 10),
+    "Vacation": (300000.0, 3),
+    "Wealth Building": (1000000.0, 10),
+}
+
+
+def growth_terms(allocation, assets, months, rebalance=None):
+    # (M, A) for each entry of months: value multiple of a lump sum and of a 1-unit monthly contribution
+    universe = as_universe(assets)
+    weights = universe.weights(allocation)
+    weights = weights / weights.sum()
+    months = np.asarray(months)
+    growth = 1 + universe.returns / 12
+    if rebalance == "monthly":
+        # Rebalanced every month the whole portfolio compounds at the blended rate
+        growth = np.array([weights @ growth])
+        weights = np.ones(1)
+    elif rebalance is not None:
+        raise ValueError(f"No closed form for rebalancing policy {rebalance!r}; use schedules.simulate_schedule")
+    powers = growth ** months[..., None]
+    rate = growth - 1
+    # A zero-return asset accumulates contributions without growth: (g^n - 1) / (g - 1) -> n
+    with np.errstate(invalid="ignore", divide="ignore"):
+        annuity = np.where(rate == 0, months[..., None], (powers - 1) / np.where(rate == 0, 1, rate))
+    return powers @ weights, annuity @ weights
+
+
+def inflated(target, months, inflation_rate=INFLATION_RATE):
+    # A target in today's money expressed in money of `months` from now
+    return np.asarray(target, dtype=float) * (1 + inflation_rate / 12) ** np.asarray(months)
+
+
+def required_lump_sum(target, years, allocation, assets, monthly_contribution=0.0, rebalance=None,
+                      inflation_rate=INFLATION_RATE):
+    # Lump sum invested today that reaches `target` (today's money) after `years`, alongside any contribution.
+    # target, years and monthly_contribution broadcast; 0 where the contributions alone are enough.
+    months = np.asarray(years) * 12
+    lump, annuity = growth_terms(allocation, assets, months, rebalance)
+    needed = inflated(target, months, inflation_rate) - np.asarray(monthly_contribution) * annuity
+    return np.maximum(needed / lump, 0.0)
+
+
+def required_contribution(target, years, allocation, assets, initial_investment=0.0, rebalance=None,
+                          inflation_rate=INFLATION_RATE):
+    # Monthly contribution that, with `initial_investment` today, reaches `target` (today's money) after `years`
+    months = np.asarray(years) * 12
+    lump, annuity = growth_terms(allocation, assets, months, rebalance)
+    needed = inflated(target, months, inflation_rate) - np.asarray(initial_investment) * lump
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(needed > 0, needed / np.where(annuity > 0, annuity, np.nan), 0.0)
+
+
+def required_horizon(target, allocation, assets, initial_investment=0.0, monthly_contribution=0.0, rebalance=None,
+                     inflation_rate=INFLATION_RATE, max_years=MAX_YEARS):
+    # Years (in whole months) until the plan reaches `target` (today's money); NaN if not within max_years.
+    # target, initial_investment and monthly_contribution broadcast against each other.
+    months = np.arange(max_years * 12 + 1)
+    lump, annuity = growth_terms(allocation, assets, months, rebalance)
+    target, initial_investment, monthly_contribution = np.broadcast_arrays(
+        np.asarray(target, dtype=float), np.asarray(initial_investment, dtype=float),
+        np.asarray(monthly_contribution, dtype=float))
+    value = initial_investment[..., None] * lump + monthly_contribution[..., None] * annuity
+    reached = value >= inflated(target[..., None], months, inflation_rate)
+    first = reached.argmax(axis=-1)
+    return np.where(reached.any(axis=-1), first / 12, np.nan)
+
+
+def plan_goals(goal_targets, allocation, assets, initial_investment=0.0, monthly_contribution=0.0, rebalance=None):
+    # goal_targets: {goal: (target in today's INR, years)}; every goal is solved on its own,
+    # as if the whole investment and contribution went to it. Returns one dict per goal.
+    if not goal_targets:
+        return []
+    goals = list(goal_targets)
+    targets = np.array([goal_targets[goal][0] for goal in goals], dtype=float)
+    years = np.array([goal_targets[goal][1] for goal in goals])
+    lump_sums = required_lump_sum(targets, years, allocation, assets, rebalance=rebalance)
+    contributions = required_contribution(targets, years, allocation, assets, initial_investment, rebalance)
+    horizons = required_horizon(targets, allocation, assets, initial_investment, monthly_contribution, rebalance)
+    return [
+        {
+            "goal": goal,
+            "target": float(targets[i]),
+            "years": int(years[i]),
+            "target_at_horizon": float(inflated(targets[i], years[i] * 12)),
+            "lump_sum": float(lump_sums[i]),
+            "monthly_contribution": float(contributions[i]),
+            "years_needed": float(horizons[i]),
+        }
+        for i, goal in enumerate(goals)
+    ]
@@ -0,0 +1,123 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import job_cache, size_of
+
+# Background jobs for long simulations so a Streamlit rerun never blocks on them.
+# Jobs are keyed by their inputs: submitting a key that is already running returns the running job
+# (from any session), and a finished job stays in job_cache so resubmitting returns it at once.
+# Failed jobs are kept for FAILED_JOB_SECONDS so the UI can show the error; resubmitting retries them.
+# The job function reports progress through job.update(); the UI polls job.progress and job.done.
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = 2
+POLL_SECONDS = 0.5  # how often the UI reruns to check a running job
+FAILED_JOB_SECONDS = 60
+
+
+class Job:
+    def __init__(self, key):
+        self.key = key
+        self.status = "queued"  # queued -> running -> done | failed
+        self.progress = 0.0
+        self.message = "Waiting for a free worker..."
+        self.result = None
+        self.error = None
+        self.submitted_at = time.monotonic()
+        self.finished_at = None
+        self._finished = threading.Event()
+
+    def update(self, progress, message=None):
+        # Called from the job function; progress is a fraction between 0 and 1
+        self.progress = min(max(float(progress), 0.0), 1.0)
+        if message:
+            self.message = message
+
+    @property
+    def done(self):
+        return self._finished.is_set()
+
+    def wait(self, timeout=None):
+        return self._finished.wait(timeout)
+
+    @property
+    def nbytes(self):
+        # Counted against job_cache's byte budget
+        return size_of(self.result)
+
+    @property
+    def elapsed(self):
+        return (self.finished_at or time.monotonic()) - self.submitted_at
+
+
+class JobRunner:
+    # Thread pool with per-key deduplication; NumPy releases the GIL for the heavy array work
+
+    def __init__(self, max_workers=JOB_WORKERS, results=job_cache):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="advisor-job")
+        self._running = {}
+        self._results = results
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.deduplicated = 0
+        self.failed = 0
+
+    def submit(self, key, fn, *args, **kwargs):
+        # Run fn(job, *args, **kwargs) in the background unless the same key is running or cached
+        with self._lock:
+            job = self._running.get(key)
+            if job is not None:
+                self.deduplicated += 1
+                return job
+            job = self._results.get(key)
+            if job is not None and job.status != "failed":
+                return job
+            job = Job(key)
+            self._running[key] = job
+            self.submitted += 1
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def get(self, key):
+        # Running or finished job for key, or None
+        with self._lock:
+            job = self._running.get(key)
+        return job if job is not None else self._results.get(key)
+
+    def _run(self, job, fn, args, kwargs):
+        job.status = "running"
+        job.update(0.0, "Running...")
+        try:
+            job.result = fn(job, *args, **kwargs)
+            job.status = "done"
+            job.update(1.0, "Done")
+        except Exception as e:
+            logger.exception("Job %r failed", job.key)
+            job.error = e
+            job.status = "failed"
+            job.message = f"Failed: {e}"
+        finally:
+            job.finished_at = time.monotonic()
+            with self._lock:
+                self._running.pop(job.key, None)
+                if job.status == "done":
+                    self._results.set(job.key, job)
+                else:
+                    self._results.set(job.key, job, ttl=FAILED_JOB_SECONDS)
+                    self.failed += 1
+            job._finished.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "running": len(self._running),
+                "submitted": self.submitted,
+                "deduplicated": self.deduplicated,
+                "failed": self.failed,
+            }
+
+
+runner = JobRunner()
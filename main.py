@@ -1,8 +1,42 @@
+import time
+import uuid
+
+import numpy as np
 import streamlit as st
-import pandas as pd
-import matplotlib.pyplot as plt
-import sqlite3
-import datetime
+from advisor import (
+    set_error_handler,
+    collect_errors,
+    setup_database,
+    save_user_portfolio,
+    default_universe,
+    portfolio_return,
+    ALLOCATION_METHODS,
+    simulate_monte_carlo,
+    generate_recommendations,
+)
+from charts import render_chart
+import backtest
+import schedules
+import sweep
+from questionnaire import (
+    RISK_QUESTIONS,
+    ANSWER_SCORES,
+    MAX_HORIZON_YEARS,
+    lookup_outcome,
+    simulate_from_outcome,
+)
+from cache import (
+    allocation_table_cache,
+    simulation_cache,
+    make_key,
+    cache_stats,
+)
+import telemetry
+import jobs
+import optimizer
+import analytics
+import goals
+from results import session_results
 
 # Set page configuration
 st.set_page_config(
@@ -11,97 +45,8 @@ st.set_page_config(
     layout="wide"
 )
 
-# Database functions
-def setup_database():
-    # Initialize SQLite database
-    try:
-        conn = sqlite3.connect('investment_advisor.db')
-        cursor = conn.cursor()
-        
-        # Create users table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY,
-            name TEXT,
-            income REAL,
-            savings REAL,
-            risk_score REAL,
-            target_return REAL,
-            investment_goals TEXT
-        )
-        ''')
-        
-        # Create portfolios table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS portfolios (
-            id INTEGER PRIMARY KEY,
-            user_id INTEGER,
-            allocation TEXT,
-            initial_investment REAL,
-            FOREIGN KEY (user_id) REFERENCES users (id)
-        )
-        ''')
-        
-        conn.commit()
-        conn.close()
-        return True
-    except Exception as e:
-        st.error(f"Database error: {e}")
-        return False
-
-def save_user_portfolio(user_data, portfolio_data):
-    # store user and portfolio data to database
-    try:
-        conn = sqlite3.connect('investment_advisor.db')
-        cursor = conn.cursor()
-        
-        # Insert user data
-        cursor.execute('''
-        INSERT INTO users (name, income, savings, risk_score, target_return, investment_goals)
-        VALUES (?, ?, ?, ?, ?, ?)
-        ''', (
-            user_data['name'],
-            user_data['income'],
-            user_data['savings'],
-            user_data['risk_score'],
-            user_data['target_return'],
-            str(user_data['investment_goals']),
-        ))
-        
-        user_id = cursor.lastrowid
-        
-        # Insert portfolio data
-        cursor.execute('''
-        INSERT INTO portfolios (user_id, allocation, initial_investment)
-        VALUES (?, ?, ?)
-        ''', (
-            user_id,
-            str(portfolio_data['allocation']),
-            portfolio_data['initial_investment'],
-        ))
-        
-        conn.commit()
-        conn.close()
-        return True
-    except Exception as e:
-        st.error(f"Database save error: {e}")
-        return False
-
-# Load default assets
-def load_default_assets():
-    # default investment assets
-    return [
-        {"name": "Nifty 500 ETF", "type": "stock", "return": 0.10, "risk": 0.8, "price": 450.0},
-        {"name": "Total Bond ETF", "type": "bond", "return": 0.04, "risk": 0.3, "price": 80.0},
-        {"name": "Gold ETF", "type": "commodity", "return": 0.05, "risk": 0.6, "price": 180.0},
-        {"name": "Real Estate ETF", "type": "real_estate", "return": 0.08, "risk": 0.7, "price": 95.0},
-        {"name": "High-Yield Dividend ETF", "type": "stock", "return": 0.07, "risk": 0.6, "price": 55.0},
-        {"name": "Treasury Bonds", "type": "bond", "return": 0.03, "risk": 0.2, "price": 100.0},
-        {"name": "International Stocks ETF", "type": "stock", "return": 0.09, "risk": 0.8, "price": 65.0},
-        {"name": "Emerging Markets ETF", "type": "stock", "return": 0.11, "risk": 0.9, "price": 45.0},
-        {"name": "Technology Sector ETF", "type": "stock", "return": 0.12, "risk": 0.9, "price": 160.0},
-        {"name": "Corporate Bonds ETF", "type": "bond", "return": 0.05, "risk": 0.4, "price": 110.0}
-    ]
+# Show errors from the advisory functions in the app
+set_error_handler(st.error)
 
 # Risk assessment function
 def risk_assessment():
@@ -109,285 +54,120 @@ def risk_assessment():
     st.subheader("Risk Assessment Questionnaire")
     st.write("Please answer the following questions to determine your risk tolerance.")
     
-    questions = [
-        {
-            "question": "How would you react if your portfolio lost 20% of its value in a month?",
-            "options": [
-                "Sell everything immediately ",
-                "Sell some investments to cut losses ",
-                "Do nothing and wait for recovery ",
-                "Buy more at the lower prices "
-            ],
-            "scores": [1, 3, 5, 10]
-        },
-        {
-            "question": "How long do you keep your money invested?",
-            "options": [
-                "Less than 2 years ",
-                "2-5 years ",
-                "5-10 years ",
-                "More than 10 years "
-            ],
-            "scores": [1, 4, 7, 10]
-        },
-        {
-            "question": "What is your primary investment goal?",
-            "options": [
-                "Preserve capital ",
-                "Generate income ",
-                "Balanced growth and income ",
-                "Maximize growth "
-            ],
-            "scores": [1, 4, 7, 10]
-        },
-        {
-            "question": "How much financial knowledge do you have?",
-            "options": [
-                "Very little ",
-                "Basic understanding ",
-                "Good knowledge ",
-                "Advanced/Professional "
-            ],
-            "scores": [2, 5, 8, 10]
-        }       
-    ]
-    
-    total_score = 0
-    max_score = 0
-    
-    for q in questions:
+    answers = []
+    for q in RISK_QUESTIONS:
         choice = st.radio(q["question"], q["options"])
         # Get index of selected choice
-        index = q["options"].index(choice)
-        # Add score
-        total_score += q["scores"][index]
-        max_score += 10
-    
-    # Normalize to 0-1 scale
-    risk_score = total_score / max_score
+        answers.append(q["options"].index(choice))
+    answers = tuple(answers)
     
-    if risk_score < 0.3:
-        risk_category = "low"
-    elif risk_score < 0.7:
-        risk_category = "medium"
-    else:
-        risk_category = "high"
+    # Score and category come from the precomputed answer table
+    risk_score, risk_category = ANSWER_SCORES[answers]
     
     st.subheader("Your Risk Profile")
     st.write(f"Risk Score: {risk_score*100 :.2f}")
     st.write(f"Risk Category: {risk_category}")
     
-    return risk_score
-
-# Portfolio allocation function
-def recommend_allocation(assets, risk_score):
-    # Recommend asset allocation based on user's risk level
-    allocation = {}
-    
-    if risk_score < 0.3:
-            risk_category = "low"
-    elif risk_score < 0.7:
-        risk_category = "medium"
-    else:
-        risk_category = "high"
-
-    # Basic asset classes
-    asset_classes = {
-        "stock": {"low": 0.30, "medium": 0.50, "high": 0.70},
-        "bond": {"low": 0.50, "medium": 0.30, "high": 0.10},
-        "commodity": {"low": 0.10, "medium": 0.10, "high": 0.10},
-        "real_estate": {"low": 0.10, "medium": 0.10, "high": 0.10}
-    }
-    
-    # Create asset_by_type dict according to type of asset ex.Stock,Bond,Etc.
-    asset_by_type = {}
-    for asset in assets:
-        asset_type = asset["type"]
-        if asset_type not in asset_by_type:
-            asset_by_type[asset_type] = []
-        asset_by_type[asset_type].append(asset)
+    return risk_score, answers
 
-# asset_class->This variable represents a specific type of asset
-# allocations->This varable contain dictionary of value of asset_classes
-# class_assets->Take a assest class sub dict
-# allocation->contain the ammount of distribution of percentage
+# Background optimizer frontier solve, once per asset universe (runs on a jobs.runner thread)
+def run_frontier_job(job, assets, version):
+    job.update(0.0, "Preparing the mean-variance optimizer...")
+    optimizer.get_frontier(
+        assets,
+        version=version,
+        progress=lambda done: job.update(done, f"Preparing the mean-variance optimizer ({done:.0%})...")
+    )
 
-    # Set allocation for each asset class
-    for asset_class, allocations in asset_classes.items():
-        if asset_class in asset_by_type:
-            class_assets = asset_by_type[asset_class]
-            pct = allocations[risk_category]
-            
-            if class_assets:
-                if risk_category == "high":
-                    # Sort by return (high for high risk)
-                    class_assets = sorted(class_assets, key=lambda x: x["return"], reverse=True)
-                elif risk_category == "low":
-                    # Sort by risk level (low risk first)
-                    class_assets = sorted(class_assets, key=lambda x: x["risk"])
-                
-                class_allocation = pct / len(class_assets)
-                for asset in class_assets:
-                    allocation[asset["name"]] = class_allocation
+# Background simulation job (runs on a jobs.runner thread, so no Streamlit calls in here)
+def run_simulation_job(job, request):
+    session_id = request["session_id"]
+    assets = request["assets"]
+    allocation = request["allocation"]
+    investment_amount = request["investment_amount"]
+    years = request["years"]
     
-    return allocation
-
-# Portfolio simulation function
-def simulate_growth(initial_investment, allocation, assets, years=5):
-    # Show portfolio growth over specified years
-    try:
-        inflation_rate = 0.06 #6% inflation  
-       
-        # Create a date range for the simulation
-        start_date = datetime.datetime.now()
-        date_range = []
-        for month in range(years * 12 + 1):
-            # Add months to start date
-            new_date = start_date.replace(month=((start_date.month - 1 + month) % 12) + 1,
-                                         year=start_date.year + ((start_date.month - 1 + month) // 12))
-            date_range.append(new_date)
-        
-        # Initialize results dataframe
-        results = pd.DataFrame({
-            'Date': date_range,
-            'Year': [d.year for d in date_range],
-            'Month': [d.month for d in date_range],
-            'Total_Value': 0.0,
-            'Inflation_Adjusted_Value': 0.0
-        })
-        
-        # Add columns for each asset
-        for asset in assets:
-            results[asset["name"]] = 0.0
-        
-        # Initial allocation
-        for asset in assets:
-            if asset["name"] in allocation:
-                results.loc[0, asset["name"]] = initial_investment * allocation[asset["name"]]
-        
-        results.loc[0, 'Total_Value'] = initial_investment
-        results.loc[0, 'Inflation_Adjusted_Value'] = initial_investment
-        
-        # Simulate monthly growth
-        for i in range(1, len(results)):
-            for asset in assets:
-                if asset["name"] in allocation:
-                    # Monthly return (annual return / 12)
-                    monthly_return = asset["return"] / 12
-                    
-                    # Previous value
-                    prev_value = results.loc[i-1, asset["name"]]
-                    
-                    # New value with growth
-                    new_value = prev_value * (1 + monthly_return)
-                    results.loc[i, asset["name"]] = new_value
-            
-            # Calculate total value for this month
-            asset_values = [results.loc[i, asset["name"]] for asset in assets if asset["name"] in allocation]
-            results.loc[i, 'Total_Value'] = sum(asset_values)
-            
-            # Apply monthly inflation
-            monthly_inflation = inflation_rate / 12
-            results.loc[i, 'Inflation_Adjusted_Value'] = results.loc[i, 'Total_Value'] / (1 + monthly_inflation) ** i
-        
-        return results
-    except Exception as e:
-        st.error(f"Simulation error: {e}")
-        return pd.DataFrame()
-
-# Generate recommendations function
-def generate_recommendations(user_data, portfolio_data, assets, simulation_results):
-    # Generate personalized recommendations based on portfolio analysis
-    recommendations = []
-    
-    try:
-        # Calculate expected return
-        expected_return = 0
-        for asset in assets:
-            if asset["name"] in portfolio_data["allocation"]:
-                expected_return += asset["return"] * portfolio_data["allocation"][asset["name"]]
-        
-        # Compare with target return
-        if expected_return < user_data["target_return"]:
-            gap = (user_data["target_return"] - expected_return) * 100
-            recommendations.append(
-                f"Your current allocation may not meet your target annual return of {user_data['target_return'] * 100:.2f}%. "
-                f"Consider increasing your allocation to higher-return assets to close the {gap:.2f}% gap."
-            )
-        
-        # Diversification check
-        high_allocation = []
-        for asset_name, alloc in portfolio_data["allocation"].items():
-            if alloc > 0.3:
-                high_allocation.append(asset_name)
-                
-        if high_allocation:
-            asset_names = ", ".join(high_allocation)
-            recommendations.append(
-                f"You have a high concentration in {asset_names}. Consider diversifying to reduce risk."
-            )
+    with collect_errors() as errors:
+        job.update(0.05, "Projecting portfolio growth...")
+        simulation_key = request["simulation_key"]
+        schedule = request["schedule"]
+        with telemetry.stage("simulate", session_id):
+            simulation_results = simulation_cache.get(simulation_key)
+            if simulation_results is None:
+                if schedule:
+                    simulation_results = schedules.simulate_schedule(
+                        investment_amount, allocation, assets, years=years, **schedule
+                    )
+                else:
+                    simulation_results = simulate_from_outcome(
+                        request["outcome"], assets, investment_amount, years=years
+                    )
+                if not simulation_results.empty:
+                    simulation_cache.set(simulation_key, simulation_results)
         
-        # Savings rate recommendation based on income
-        recommended_savings = user_data["income"] * 0.2
-        current_investment = portfolio_data["initial_investment"]
+        monte_carlo = None
+        monte_carlo_key = request["monte_carlo_key"]
+        if monte_carlo_key is not None:
+            job.update(0.1, "Running Monte Carlo simulation...")
+            with telemetry.stage("monte_carlo", session_id):
+                monte_carlo = simulation_cache.get(monte_carlo_key)
+                if monte_carlo is None:
+                    monte_carlo = simulate_monte_carlo(
+                        investment_amount,
+                        allocation,
+                        assets,
+                        years=years,
+                        progress=lambda done: job.update(0.1 + 0.7 * done),
+                        **request["monte_carlo"]
+                    )
+                    if monte_carlo is not None:
+                        simulation_cache.set(monte_carlo_key, monte_carlo)
         
-        if current_investment < recommended_savings:
-            recommendations.append(
-                f"Consider increasing your investment amount. A good target is 20% of your annual income (Rs.{recommended_savings:,.2f})."
+        # Create visualizations (rendered bytes are shared across sessions)
+        job.update(0.85, "Drawing charts...")
+        with telemetry.stage("render", session_id):
+            chart = render_chart(
+                request["portfolio_data"],
+                simulation_results,
+                monte_carlo=monte_carlo,
+                key=(simulation_key, monte_carlo_key)
             )
         
-        # Long-term growth recommendation
-        if not simulation_results.empty:
-            final_value = simulation_results.iloc[-1]['Total_Value']
-            initial_investment = portfolio_data["initial_investment"]
-            total_growth = (final_value - initial_investment) / initial_investment
-            
-            if total_growth < 0.5:  # Less than 50% growth over simulation period
-                recommendations.append(
-                    "Your long-term growth projection is lower than average. Consider increasing your investment horizon or adjusting your asset allocation for better long-term results."
-                )
-        
-        return recommendations
-    except Exception as e:
-        st.error(f"Recommendation generation error: {e}")
-        return ["Unable to generate recommendations due to an error."]
-
-# Create portfolio summary visualizations
-def create_portfolio_visualizations(portfolio_data, simulation_results):
-    """Create visualizations for portfolio allocation and growth"""
-    try:
-        fig = plt.figure(figsize=(15,8))
-
-        # Plot 1: Asset Allocation Pie Chart (top-left)
-        plt.subplot(1,2,1)
-        labels = list(portfolio_data["allocation"].keys())
-        sizes = [portfolio_data["allocation"][asset] * 100 for asset in labels]
-        
-        plt.pie(sizes, labels=labels, autopct='%1.1f%%', startangle=90)
-        plt.title('Asset Allocation')
-        plt.axis('equal')
-        
-        # Plot 2: Portfolio Growth Over Time (top-right)
-        plt.subplot(1,2,2)
-        plt.plot(simulation_results['Date'], simulation_results['Total_Value'], label='Projected Value')
-        plt.plot(simulation_results['Date'], simulation_results['Inflation_Adjusted_Value'],label='Inflation Adjusted', linestyle='--')
-        plt.title('Portfolio Growth Projection')
-        plt.xlabel('Date')
-        plt.ylabel('Value (INR)')
-        plt.legend()
-        plt.grid(True)
-         
-        plt.tight_layout()
-        return fig
-    except Exception as e:
-        st.error(f"Visualization error: {e}")
-        return None
+        backtest_result = None
+        backtest_chart = None
+        backtest_key = request["backtest_key"]
+        if backtest_key is not None:
+            job.update(0.9, "Backtesting on historical prices...")
+            with telemetry.stage("backtest", session_id):
+                backtest_result = simulation_cache.get(backtest_key)
+                if backtest_result is None:
+                    backtest_result = backtest.run_backtest(
+                        request["price_history"], allocation, investment_amount, request["rebalance"]
+                    )
+                    if backtest_result is not None:
+                        simulation_cache.set(backtest_key, backtest_result)
+            if backtest_result is not None:
+                backtest_chart = render_chart(request["portfolio_data"], backtest_result["results"], key=backtest_key)
+    
+    return {
+        "simulation_results": simulation_results,
+        "monte_carlo": monte_carlo,
+        "chart": chart,
+        "backtest": backtest_result,
+        "backtest_chart": backtest_chart,
+        "errors": errors,
+    }
 
 # Main Streamlit app
 def main():
-    # Setup database
-    setup_database()
-    import streamlit as st
+    # Session tag for the per-stage timings (telemetry is a no-op unless ADVISOR_TELEMETRY=1)
+    if 'session_id' not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex[:8]
+    session_id = st.session_state.session_id
+    
+    # Setup database (only does work on the first run in this process)
+    with telemetry.stage("setup_database", session_id):
+        setup_database()
 
     # Title and description
     st.title("Personalized Investment Portfolio Advisor")
@@ -397,21 +177,46 @@ def main():
     portfolio growth simulations, and financial insights.
     """)
     
-    # Load default assets
-    assets = load_default_assets()
+    # Load the asset universe (built once per process and shared read-only)
+    assets = default_universe()
+    universe_version = assets.version
+    
+    # Cache hit rates for checking the memoization layer under load
+    # (opt-in so the first page does not pull in the dataframe stack)
+    if st.sidebar.checkbox("Show cache statistics"):
+        st.sidebar.dataframe(cache_stats())
+        st.sidebar.dataframe([session_results.stats()])
+    
+    # Rolling per-stage latency, only when telemetry is enabled
+    if telemetry.ENABLED:
+        with st.sidebar.expander("Stage timings"):
+            st.caption(f"Session {session_id}")
+            st.dataframe(telemetry.summary(session_id))
+            st.caption("All sessions")
+            st.dataframe(telemetry.summary())
     
     # Create tabs for different sections
-    tab1, tab2, tab3, tab4= st.tabs(["User Profile", "Portfolio Analysis", "Recommendations", "Presentation"])
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(["User Profile", "Portfolio Analysis", "Recommendations", "Presentation", "Advisor Analytics"])
     
     # Initialize session state to store user data
     if 'user_data' not in st.session_state:
         st.session_state.user_data = None
     if 'portfolio_data' not in st.session_state:
         st.session_state.portfolio_data = None
-    if 'simulation_results' not in st.session_state:
-        st.session_state.simulation_results = None
     if 'recommendations' not in st.session_state:
         st.session_state.recommendations = None
+    if 'risk_answers' not in st.session_state:
+        st.session_state.risk_answers = None
+    # Only the key of the last simulation lives in session_state; its results are held in
+    # session_results, which evicts idle sessions' results to stay within the memory budget
+    if 'simulation_job_key' not in st.session_state:
+        st.session_state.simulation_job_key = None
+    if 'simulation_collected_key' not in st.session_state:
+        st.session_state.simulation_collected_key = None
+    # (user data, portfolio data, writer Future) of the last Save Portfolio press
+    if 'portfolio_save' not in st.session_state:
+        st.session_state.portfolio_save = None
+    poll_job = False
     
     with tab1:
         st.header("Your Financial Profile")
@@ -442,7 +247,7 @@ def main():
                         selected_goals.append(goal)
             
             # Risk assessment questionnaire
-            risk_score = risk_assessment()
+            risk_score, risk_answers = risk_assessment()
             
             # Submit button
             submit_button = st.form_submit_button("Submit")
@@ -454,6 +259,7 @@ def main():
                     st.error("Please select at least one investment goal.")
                 else:
                     # Store user data in session state
+                    st.session_state.risk_answers = risk_answers
                     st.session_state.user_data = {
                         "name": name,
                         "income": income,
@@ -482,8 +288,32 @@ def main():
                 step=500
             )
             
-            # Generate recommended allocation
-            allocation = recommend_allocation(assets, st.session_state.user_data["risk_score"])
+            # Generate recommended allocation (shared across sessions with the same risk score)
+            allocation_method = st.selectbox(
+                "Allocation Method",
+                options=list(ALLOCATION_METHODS),
+                format_func=ALLOCATION_METHODS.get
+            )
+            # The optimizer's frontier is solved once per asset universe; until it is ready the solve
+            # runs in the background and the risk bucket allocation is shown instead
+            if allocation_method == "optimizer" and not optimizer.frontier_ready(assets, version=universe_version):
+                frontier_key = ("frontier", universe_version)
+                frontier_job = jobs.runner.get(frontier_key)
+                if frontier_job is None or frontier_job.status != "failed":
+                    frontier_job = jobs.runner.submit(frontier_key, run_frontier_job, assets, universe_version)
+                if frontier_job.status == "failed":
+                    st.error(f"Optimizer error: {frontier_job.error}. Showing the risk bucket allocation instead.")
+                else:
+                    st.progress(frontier_job.progress, text=frontier_job.message)
+                    st.info("The optimizer is being prepared for these assets; the risk bucket allocation "
+                            "is shown until it is ready.")
+                    poll_job = True
+                allocation_method = "buckets"
+            with telemetry.stage("allocation", session_id):
+                outcome = lookup_outcome(
+                    st.session_state.risk_answers, assets, method=allocation_method, version=universe_version
+                )
+            allocation = outcome["allocation"]
             
             # Store portfolio data in session state
             st.session_state.portfolio_data = {
@@ -495,66 +325,275 @@ def main():
             st.subheader("Recommended Asset Allocation")
             
             # Create a DataFrame for better display
-            allocation_data = []
-            for asset_name, alloc_pct in allocation.items():
-                asset_info = next((a for a in assets if a["name"] == asset_name), None)
-                if asset_info:
-                    amount = investment_amount * alloc_pct
-                    expected_annual_return = asset_info["return"] * amount
-                    allocation_data.append({
-                        "Asset": asset_name,
-                        "Type": asset_info["type"].capitalize(),
-                        "Allocation (%)": f"{alloc_pct * 100:.2f}%",
-                        "Amount (Rs.)": f"Rs.{amount:.2f}",
-                        "Expected Annual Return": f"Rs.{expected_annual_return:.2f} ({asset_info['return'] * 100:.2f}%)"
-                    })
+            def build_allocation_table():
+                allocation_data = []
+                for asset_name, alloc_pct in allocation.items():
+                    asset_info = assets.get(asset_name)
+                    if asset_info:
+                        amount = investment_amount * alloc_pct
+                        expected_annual_return = asset_info["return"] * amount
+                        allocation_data.append({
+                            "Asset": asset_name,
+                            "Type": asset_info["type"].capitalize(),
+                            "Allocation (%)": f"{alloc_pct * 100:.2f}%",
+                            "Amount (Rs.)": f"Rs.{amount:.2f}",
+                            "Expected Annual Return": f"Rs.{expected_annual_return:.2f} ({asset_info['return'] * 100:.2f}%)"
+                        })
+                return allocation_data
             
-            allocation_df = pd.DataFrame(allocation_data)
+            with telemetry.stage("allocation_table", session_id):
+                allocation_df = allocation_table_cache.get_or_compute(
+                    make_key(allocation, investment_amount, None, universe_version),
+                    build_allocation_table
+                )
             st.dataframe(allocation_df)
             
             # Calculate expected return
-            expected_return = sum(asset["return"] * allocation.get(asset["name"], 0) for asset in assets)
+            expected_return = portfolio_return(allocation, assets)
             st.write(f"Expected Annual Return: {expected_return * 100:.2f}%")
             
             # Portfolio simulation
             st.subheader("Portfolio Growth Simulation")
-            years = st.slider("Simulation Years", min_value=1, max_value=15, value=5)
+            years = st.slider("Simulation Years", min_value=1, max_value=MAX_HORIZON_YEARS, value=5)
+            baseline = outcome["baseline"][years]
+            st.write(
+                f"Baseline projection after {years} years: Rs.{investment_amount * baseline['final_multiple']:,.2f} "
+                f"(Rs.{investment_amount * baseline['inflation_adjusted_multiple']:,.2f} inflation adjusted)"
+            )
+            
+            # Optional Monte Carlo mode on top of the deterministic projection
+            monte_carlo_mode = st.checkbox("Monte Carlo mode (uses each asset's risk as volatility)")
+            if monte_carlo_mode:
+                mc_col1, mc_col2 = st.columns(2)
+                with mc_col1:
+                    n_paths = st.select_slider("Simulated Paths", options=[1000, 5000, 10000, 20000, 50000], value=20000)
+                with mc_col2:
+                    seed = int(st.number_input("Random Seed", min_value=0, value=42, step=1))
+            
+            # Monthly SIP / periodic top-ups and a rebalancing policy
+            with st.expander("Contributions & rebalancing"):
+                sip_col1, sip_col2 = st.columns(2)
+                with sip_col1:
+                    sip_amount = st.number_input("Contribution Amount (INR)", min_value=0.0, value=0.0, step=500.0)
+                    sip_frequency = st.selectbox("Contribution Frequency", options=list(schedules.CONTRIBUTION_FREQUENCIES),
+                                                 format_func=str.capitalize)
+                    step_up = st.slider("Annual Step-up (%)", min_value=0, max_value=25, value=0) / 100
+                with sip_col2:
+                    rebalance_policy = st.selectbox("Rebalancing Policy", options=list(schedules.REBALANCE_POLICIES),
+                                                    format_func=schedules.REBALANCE_POLICIES.get)
+                    band = schedules.DEFAULT_BAND
+                    if rebalance_policy == "threshold":
+                        band = st.slider("Rebalancing Band (%)", min_value=1, max_value=20, value=5) / 100
+            use_schedule = sip_amount > 0 or rebalance_policy is not None
+            if monte_carlo_mode and use_schedule:
+                # The Monte Carlo paths model the initial lump sum only; next to a projection with
+                # contributions or rebalancing their bands and target probability would be misleading
+                st.info("Monte Carlo mode models the initial investment only, so it is skipped while "
+                        "contributions or rebalancing are set.")
+                monte_carlo_mode = False
+            
+            # Backtest mode replays the allocation on historical prices (when a price file is configured)
+            price_history = backtest.default_history()
+            backtest_mode = price_history is not None and st.checkbox("Backtest against historical prices")
+            if backtest_mode:
+                rebalance = st.selectbox("Rebalancing", options=list(backtest.REBALANCE_MONTHS) + [None],
+                                         format_func=lambda r: r.capitalize() if r else "Never (buy and hold)")
+            
+            # Inputs that identify this simulation; identical requests share one background job
+            simulation_key = make_key(allocation, investment_amount, years, universe_version)
+            if use_schedule:
+                simulation_key += ("schedule", sip_amount, sip_frequency, step_up, rebalance_policy, band)
+            monte_carlo_key = None
+            if monte_carlo_mode:
+                target_return = st.session_state.user_data["target_return"]
+                monte_carlo_key = make_key(
+                    allocation, investment_amount, years, universe_version,
+                    "monte_carlo", target_return, n_paths, seed
+                )
+            backtest_key = None
+            if backtest_mode:
+                backtest_key = make_key(
+                    allocation, investment_amount, None, universe_version,
+                    "backtest", rebalance, price_history.version
+                )
+            job_key = (simulation_key, monte_carlo_key, backtest_key)
             
             if st.button("Run Simulation"):
-                with st.spinner("Running simulation..."):
-                    simulation_results = simulate_growth(
-                        investment_amount,
-                        allocation,
-                        assets,
-                        years=years,
+                st.session_state.simulation_job_key = job_key
+                jobs.runner.submit(job_key, run_simulation_job, {
+                    "session_id": session_id,
+                    "assets": assets,
+                    "outcome": outcome,
+                    "allocation": allocation,
+                    "investment_amount": investment_amount,
+                    "years": years,
+                    "portfolio_data": dict(st.session_state.portfolio_data),
+                    "simulation_key": simulation_key,
+                    "schedule": {
+                        "contribution": sip_amount,
+                        "frequency": sip_frequency,
+                        "step_up": step_up,
+                        "rebalance": rebalance_policy,
+                        "band": band,
+                    } if use_schedule else None,
+                    "monte_carlo_key": monte_carlo_key,
+                    "monte_carlo": {
+                        "target_return": target_return,
+                        "n_paths": n_paths,
+                        "seed": seed,
+                    } if monte_carlo_mode else None,
+                    "backtest_key": backtest_key,
+                    "price_history": price_history,
+                    "rebalance": rebalance if backtest_mode else None,
+                })
+            
+            # Progress while the job for the current inputs runs, its results once it is done
+            result = session_results.get(session_id, "simulation")
+            if result is not None and result["key"] != job_key:
+                result = None
+            job = None
+            if result is None and st.session_state.simulation_job_key == job_key:
+                # None if the finished job already left job_cache; Run Simulation starts it again
+                job = jobs.runner.get(job_key)
+            if job is not None:
+                if not job.done:
+                    st.progress(job.progress, text=job.message)
+                    poll_job = True
+                elif job.status == "failed":
+                    st.error(f"Simulation error: {job.error}. Press Run Simulation to try again.")
+                else:
+                    result = dict(job.result, key=job_key)
+                    if not session_results.put(session_id, "simulation", result):
+                        st.warning("These results are larger than this session's memory budget, so they are "
+                                   "not kept; press Run Simulation to see them again.")
+                    # Collected: once the store evicts it, it is not pulled back from job_cache
+                    st.session_state.simulation_job_key = None
+                    st.session_state.simulation_collected_key = job_key
+            elif result is None and st.session_state.simulation_collected_key == job_key:
+                st.info("These results were cleared to free memory; press Run Simulation to compute them again.")
+            if result is not None:
+                for message in result["errors"]:
+                    st.error(message)
+                simulation_results = result["simulation_results"]
+                monte_carlo = result["monte_carlo"]
+                
+                if result["chart"]:
+                    st.image(result["chart"])
+                
+                if use_schedule and not simulation_results.empty:
+                    st.write(
+                        f"Total contributed: Rs.{simulation_results.final('Contributed'):,.2f} | "
+                        f"Projected value after {years} years: Rs.{simulation_results.final():,.2f}"
                     )
-                    
-                    st.session_state.simulation_results = simulation_results
-                    
-                    # Create visualizations
-                    fig = create_portfolio_visualizations(
-                        st.session_state.portfolio_data,
-                        simulation_results
+                
+                backtest_result = result["backtest"]
+                if backtest_result is not None:
+                    stats = backtest_result["stats"]
+                    st.subheader("Historical Backtest")
+                    if backtest_result["missing"]:
+                        st.warning(f"No price history for {', '.join(backtest_result['missing'])}; "
+                                   "the remaining weights were scaled up.")
+                    if result["backtest_chart"]:
+                        st.image(result["backtest_chart"])
+                    st.write(
+                        f"{stats['start']} to {stats['end']}: total return {stats['total_return'] * 100:.2f}%, "
+                        f"annualized {stats['annualized_return'] * 100:.2f}%, "
+                        f"volatility {stats['annualized_volatility'] * 100:.2f}%, "
+                        f"max drawdown {stats['max_drawdown'] * 100:.2f}%"
                     )
-                    
-                    if fig:
-                        st.pyplot(fig)
-                    
-                    # Generate recommendations
+                
+                if monte_carlo:
+                    bands = monte_carlo["bands"]
+                    st.write(
+                        f"Monte Carlo ({monte_carlo['n_paths']:,} paths) final value: "
+                        f"P5 Rs.{bands.final('P5'):,.2f} | P50 Rs.{bands.final('P50'):,.2f} | P95 Rs.{bands.final('P95'):,.2f}"
+                    )
+                    st.write(
+                        f"Probability of reaching your target return "
+                        f"(Rs.{monte_carlo['target_value']:,.2f}): {monte_carlo['target_probability'] * 100:.1f}%"
+                    )
+                
+                # Generate recommendations
+                with telemetry.stage("recommendations", session_id):
                     recommendations = generate_recommendations(
                         st.session_state.user_data,
                         st.session_state.portfolio_data,
                         assets,
                         simulation_results
                     )
-                    
-                    st.session_state.recommendations = recommendations
-                    
-                    # Navigation instruction
-                    st.info("Please visit the 'Recommendations' tab to view your personalized financial insights.")
+                
+                st.session_state.recommendations = recommendations
+                
+                # Navigation instruction
+                st.info("Please visit the 'Recommendations' tab to view your personalized financial insights.")
+            
+            # Scenario sweep: every horizon x amount x risk band in one array computation
+            with st.expander("Scenario Sweep"):
+                if st.checkbox("Show scenario sweep"):
+                    max_amount = max(int(st.session_state.user_data["savings"]), 1000)
+                    sweep_col1, sweep_col2 = st.columns(2)
+                    with sweep_col1:
+                        amount_range = st.slider("Amount Range (INR)", min_value=0, max_value=max_amount,
+                                                 value=(min(1000, max_amount), max_amount), step=500)
+                        amount_steps = st.select_slider("Amount Steps", options=[10, 25, 50, 100, 200], value=50)
+                    with sweep_col2:
+                        sweep_metric = st.radio("Heatmap Value", options=["final", "inflation_adjusted"],
+                                                format_func={"final": "Final value", "inflation_adjusted": "Inflation adjusted value"}.get)
+                    sweep_key = (universe_version, allocation_method, amount_range, amount_steps)
+                    with telemetry.stage("sweep", session_id):
+                        grid = simulation_cache.get_or_compute(
+                            ("sweep",) + sweep_key,
+                            lambda: sweep.scenario_grid(
+                                assets,
+                                np.linspace(amount_range[0], amount_range[1], amount_steps),
+                                np.arange(1, MAX_HORIZON_YEARS + 1),
+                                method=allocation_method,
+                                version=universe_version,
+                            )
+                        )
+                        heatmap = sweep.render_sweep_heatmap(grid, sweep_metric, key=sweep_key)
+                    st.image(heatmap)
+                    st.caption(
+                        f"{grid['final'].size:,} scenarios: {len(grid['bands'])} risk bands x "
+                        f"{len(grid['horizons'])} horizons x {len(grid['amounts'])} amounts"
+                    )
+            
+            # Goal planner: solves for the lump sum, SIP or horizon per goal instead of trial-and-error simulations
+            with st.expander("Goal Planner"):
+                st.caption(
+                    "Targets are in today's money and grow with 6% annual inflation. Each goal is solved on its own, "
+                    "as if the whole investment amount and contribution went to it."
+                )
+                planned_contribution = st.number_input("Planned Monthly Contribution (INR)", min_value=0.0,
+                                                       value=0.0, step=500.0)
+                goal_targets = {}
+                for goal in st.session_state.user_data["investment_goals"]:
+                    default_target, default_years = goals.GOAL_DEFAULTS.get(goal, (1000000.0, 10))
+                    goal_col1, goal_col2 = st.columns(2)
+                    with goal_col1:
+                        goal_target = st.number_input(f"{goal} Target (INR, today's money)", min_value=0.0,
+                                                      value=default_target, step=50000.0)
+                    with goal_col2:
+                        goal_years = st.slider(f"{goal} Horizon (Years)", min_value=1, max_value=50, value=default_years)
+                    goal_targets[goal] = (goal_target, goal_years)
+                with telemetry.stage("goals", session_id):
+                    plan = goals.plan_goals(goal_targets, allocation, assets, investment_amount, planned_contribution)
+                st.dataframe([
+                    {
+                        "Goal": row["goal"],
+                        "Target at Horizon": f"Rs.{row['target_at_horizon']:,.2f}",
+                        "Lump Sum Needed Today": f"Rs.{row['lump_sum']:,.2f}",
+                        f"Monthly SIP Needed (with Rs.{investment_amount:,} invested)": f"Rs.{row['monthly_contribution']:,.2f}",
+                        "Years Needed (current plan)": (
+                            f"{row['years_needed']:.1f}" if not np.isnan(row["years_needed"])
+                            else f"Over {goals.MAX_YEARS}"
+                        ),
+                    }
+                    for row in plan
+                ])
             
             # Display sample message if simulation hasn't been run
-            if st.session_state.simulation_results is None:
+            if session_results.get(session_id, "simulation") is None:
                 st.write("Click 'Run Simulation' to see how your portfolio might grow over time.")
         else:
             st.warning("Please complete your financial profile in the 'User Profile' tab first.")
@@ -563,9 +602,28 @@ def main():
         st.header("Personalized Recommendations")
         
         if st.session_state.recommendations:
-            save_user_portfolio(st.session_state.user_data,st.session_state.portfolio_data)
             for i, rec in enumerate(st.session_state.recommendations, 1):
                 st.write(f"{i}. {rec}")
+            
+            # Saved only when asked; the background writer stores each distinct submission once
+            if st.button("Save Portfolio"):
+                with telemetry.stage("save", session_id):
+                    saved = save_user_portfolio(st.session_state.user_data, st.session_state.portfolio_data)
+                if saved is not None:
+                    st.session_state.portfolio_save = (
+                        dict(st.session_state.user_data), dict(st.session_state.portfolio_data), saved
+                    )
+            # Outcome of the last save, while the profile and portfolio are still the ones saved
+            if st.session_state.portfolio_save is not None:
+                saved_user, saved_portfolio, saved = st.session_state.portfolio_save
+                if saved_user == st.session_state.user_data and saved_portfolio == st.session_state.portfolio_data:
+                    if not saved.done():
+                        st.info("Saving your portfolio...")
+                        poll_job = True
+                    elif saved.exception() is not None:
+                        st.error(f"Database save error: {saved.exception()}. Press Save Portfolio to try again.")
+                    else:
+                        st.success("Portfolio saved.")
     
     with tab4:
         st.header("Presentation")
@@ -575,6 +633,33 @@ def main():
         frameborder="0" width="1000" height="360" allowfullscreen="true" mozallowfullscreen="true" webkitallowfullscreen="true"></iframe>""",
         unsafe_allow_html=True
         )
-main() 
+    
+    with tab5:
+        st.header("Advisor Analytics")
+        # Fleet-wide summaries; opt-in so ordinary reruns skip the queries and chart libraries
+        if st.checkbox("Show fleet analytics"):
+            with telemetry.stage("analytics", session_id):
+                data = analytics.dashboard()
+            if data:
+                if data["needs_backfill"]:
+                    st.warning("Portfolios saved before analytics were enabled are not counted yet. "
+                               "Run 'python analytics.py --backfill' to include them.")
+                st.subheader("Risk Score Distribution")
+                st.bar_chart(data["risk_distribution"], x="Risk Score", y="Users")
+                st.subheader("Average Allocation by Risk Band")
+                st.dataframe(data["band_summary"])
+                st.dataframe(data["band_allocations"])
+                st.subheader("Initial Investment by Goal")
+                st.dataframe(data["goal_investments"])
+    
+    # Refresh the Prometheus textfile with this rerun's samples
+    telemetry.flush()
+    
+    # Rerun shortly while a simulation job or a save is in progress so its status updates
+    if poll_job:
+        time.sleep(jobs.POLL_SECONDS)
+        st.rerun()
+if __name__ == "__main__":
+    main()
 
 # Run this code using "streamlit run main.py" in terminal of VS CODE
\ No newline at end of file
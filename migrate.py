@@ -0,0 +1,130 @@
+import argparse
+import ast
+import datetime
+import logging
+import time
+
+import advisor
+import persistence
+
+# One-shot migration from the str(dict)/str(list) columns to the normalized
+# portfolio_allocations and user_goals tables.
+# Run this code using "python migrate.py" (add --force to re-run a completed migration)
+
+logger = logging.getLogger(__name__)
+
+MIGRATION_NAME = "0001_normalize_allocations_and_goals"
+DEFAULT_BATCH_SIZE = 5000
+
+
+def parse_literal(text, expected_type):
+    # Parse a value written with str() without evaluating arbitrary code
+    try:
+        value = ast.literal_eval(text)
+    except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+        return None
+    return value if isinstance(value, expected_type) else None
+
+
+def _migrate_table(conn, select_sql, parse_row, insert_sql, batch_size):
+    # Walk a table by id in batches; each batch is parsed and inserted in its own transaction
+    last_id = 0
+    migrated = 0
+    skipped = 0
+    while True:
+        rows = conn.execute(select_sql, (last_id, batch_size)).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        values = []
+        for row in rows:
+            parsed = parse_row(row)
+            if parsed is None:
+                skipped += 1
+                continue
+            values.extend(parsed)
+            migrated += 1
+        with persistence.transaction(conn):
+            conn.executemany(insert_sql, values)
+        logger.info("Migrated up to id %d", last_id)
+    return migrated, skipped
+
+
+def _allocation_rows(row):
+    portfolio_id, text = row
+    allocation = parse_literal(text, dict)
+    if allocation is None:
+        return None
+    return [(portfolio_id, str(name), float(weight)) for name, weight in allocation.items()]
+
+
+def _goal_rows(row):
+    user_id, text = row
+    goals = parse_literal(text, (list, tuple))
+    if goals is None:
+        return None
+    return [(user_id, str(goal)) for goal in goals]
+
+
+def migrate(db_path=None, batch_size=DEFAULT_BATCH_SIZE, force=False):
+    db_path = db_path or advisor.DB_PATH
+    persistence.ensure_schema(db_path)
+    assets = advisor.default_universe()
+    persistence.sync_assets(assets, assets.version, db_path)
+
+    with persistence.get_pool(db_path).connection() as conn:
+        done = conn.execute(
+            "SELECT completed_at FROM schema_migrations WHERE name = ?", (MIGRATION_NAME,)
+        ).fetchone()
+        if done and not force:
+            logger.info("Migration %s already completed at %s", MIGRATION_NAME, done[0])
+            return None
+
+        start = time.perf_counter()
+        portfolios, bad_portfolios = _migrate_table(
+            conn,
+            "SELECT id, allocation FROM portfolios WHERE id > ? ORDER BY id LIMIT ?",
+            _allocation_rows,
+            "INSERT OR IGNORE INTO portfolio_allocations (portfolio_id, asset_name, weight) VALUES (?, ?, ?)",
+            batch_size,
+        )
+        users, bad_users = _migrate_table(
+            conn,
+            "SELECT id, investment_goals FROM users WHERE id > ? ORDER BY id LIMIT ?",
+            _goal_rows,
+            "INSERT OR IGNORE INTO user_goals (user_id, goal) VALUES (?, ?)",
+            batch_size,
+        )
+
+        with persistence.transaction(conn):
+            conn.execute('''
+            INSERT INTO schema_migrations (name, completed_at) VALUES (?, ?)
+            ON CONFLICT (name) DO UPDATE SET completed_at = excluded.completed_at
+            ''', (MIGRATION_NAME, datetime.datetime.now().isoformat(timespec="seconds")))
+        conn.execute("ANALYZE")
+
+    return {
+        "portfolios": portfolios,
+        "unparseable_portfolios": bad_portfolios,
+        "users": users,
+        "unparseable_users": bad_users,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Normalize stored allocations and investment goals.")
+    parser.add_argument("--db", default=advisor.DB_PATH, help="SQLite database to migrate")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="rows parsed per transaction")
+    parser.add_argument("--force", action="store_true", help="run again even if already completed")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    stats = migrate(args.db, batch_size=args.batch_size, force=args.force)
+    if stats:
+        print(f"Migrated {stats['portfolios']} portfolios and {stats['users']} users in {stats['seconds']:.2f}s "
+              f"({stats['unparseable_portfolios']} portfolios and {stats['unparseable_users']} users could not be parsed)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+import argparse
+import hashlib
+import os
+import threading
+import time
+
+import numpy as np
+
+from advisor import RISK_TO_VOLATILITY, asset_universe_version, build_correlation_matrix, default_universe
+from universe import CACHE_DIR, AssetUniverse, as_universe
+
+# Mean-variance optimizer for recommend_allocation(method="optimizer").
+# The efficient frontier is solved once per asset universe on a fine risk-score grid and cached
+# in memory and on disk; each request then interpolates between two grid rows in O(assets).
+# Run this code using "python optimizer.py" (or "python optimizer.py catalog.csv") to build the
+# frontier ahead of time; until it exists the app builds it in the background.
+
+GRID_POINTS = 201           # risk-score grid step of 0.005
+MAX_WEIGHT = 0.30           # same concentration limit generate_recommendations warns about
+RISK_AVERSION_RANGE = (40.0, 1.0)  # risk aversion at risk score 0 and at risk score 1
+SOLVER_ITERATIONS = 5000       # upper bound; the solver stops once weights stop moving
+MIN_WEIGHT = 1e-4           # weights below this are dropped from the allocation
+
+_frontiers = {}
+_lock = threading.Lock()
+
+
+def build_covariance(assets, correlation=None):
+    # Covariance from each asset's risk (scaled to annual volatility) and a correlation matrix
+    volatility = as_universe(assets).risks * RISK_TO_VOLATILITY
+    if correlation is None:
+        correlation = build_correlation_matrix(assets)
+    correlation = np.asarray(correlation, dtype=float)
+    return correlation * np.outer(volatility, volatility)
+
+
+def risk_aversion(risk_scores):
+    # Log-spaced: risk score 0 -> most averse, risk score 1 -> least averse
+    high, low = RISK_AVERSION_RANGE
+    return high * (low / high) ** np.asarray(risk_scores, dtype=float)
+
+
+def project_capped_simplex(points, cap=MAX_WEIGHT):
+    # Exact Euclidean projection of each row onto {w : sum(w) = 1, 0 <= w <= cap}.
+    # The projection is clip(points - shift, 0, cap); its sum is piecewise linear in the shift with a
+    # kink at every x - cap and x, so the shift is read off the sorted kinks instead of bisected.
+    rows, n_assets = points.shape
+    kinks = np.concatenate([points - cap, points], axis=1)
+    slope_steps = np.concatenate([np.full((rows, n_assets), -1.0), np.ones((rows, n_assets))], axis=1)
+    order = np.argsort(kinks, axis=1)
+    kinks = np.take_along_axis(kinks, order, axis=1)
+    # Slope of the sum just after each kink, and the sum at each kink (n_assets * cap before the first)
+    slopes = np.cumsum(np.take_along_axis(slope_steps, order, axis=1), axis=1)
+    totals = np.empty_like(kinks)
+    totals[:, 0] = n_assets * cap
+    np.cumsum(slopes[:, :-1] * np.diff(kinks, axis=1), axis=1, out=totals[:, 1:])
+    totals[:, 1:] += n_assets * cap
+    # The sum reaches 1 on the segment before the first kink where it is 1 or less
+    first = np.argmax(totals <= 1, axis=1)
+    previous = np.maximum(first - 1, 0)
+    rows = np.arange(rows)
+    shift = np.where(
+        first == 0,
+        kinks[rows, 0],
+        kinks[rows, previous] + (totals[rows, previous] - 1) / -np.minimum(slopes[rows, previous], -1e-300),
+    )
+    return np.clip(points - shift[:, None], 0, cap)
+
+
+def solve_on_support(expected_returns, covariance, aversion, weights, cap=MAX_WEIGHT, tolerance=1e-10):
+    # Exact optimum for one aversion, assuming the assets at zero and at the cap in weights are the
+    # right ones: solve the KKT equations for the free assets, then check they stay within bounds and
+    # the held-out assets would not improve the objective. Returns None when the guess is wrong.
+    capped = weights >= cap
+    free = (weights > 0) & ~capped
+    fixed = np.where(capped, cap, 0.0)
+    n_free = int(free.sum())
+
+    system = np.zeros((n_free + 1, n_free + 1))
+    system[:n_free, :n_free] = aversion * covariance[np.ix_(free, free)]
+    system[:n_free, n_free] = 1
+    system[n_free, :n_free] = 1
+    rhs = np.append(expected_returns[free] - aversion * (covariance[free] @ fixed), 1 - fixed.sum())
+    try:
+        solution = np.linalg.solve(system, rhs)
+    except np.linalg.LinAlgError:
+        return None
+    candidate = fixed
+    candidate[free] = solution[:n_free]
+    if n_free and (candidate[free].min() < -tolerance or candidate[free].max() > cap + tolerance):
+        return None
+
+    # Marginal gain of each asset; it must not pay to raise a zero weight or lower a capped one
+    gain = expected_returns - aversion * (covariance @ candidate) - solution[n_free]
+    if (gain[~free & ~capped] > tolerance).any() or (gain[capped] < -tolerance).any():
+        return None
+    return np.clip(candidate, 0, cap)
+
+
+def solve_frontier(expected_returns, covariance, aversions, cap=MAX_WEIGHT, iterations=SOLVER_ITERATIONS, tolerance=1e-8,
+                   progress=None):
+    # Maximise w.mu - (aversion / 2) w'Cw for each aversion. Rows are solved in grid order, each
+    # starting from the previous row's weights: neighbouring rows usually hold the same assets, so
+    # solve_on_support finishes most rows at once. Otherwise accelerated projected gradient (with
+    # adaptive restart) runs until the held assets settle, checking solve_on_support every few steps.
+    # progress, if given, is called with the fraction of rows solved.
+    n_assets = len(expected_returns)
+    cap = max(cap, 1.0 / n_assets)
+    aversions = np.asarray(aversions, dtype=float)
+    largest_eigenvalue = np.linalg.eigvalsh(covariance)[-1]
+
+    frontier = np.empty((len(aversions), n_assets))
+    weights = np.full((1, n_assets), 1.0 / n_assets)
+    for row, aversion in enumerate(aversions):
+        step = 1.0 / (aversion * largest_eigenvalue + 1e-12)
+        weights = project_capped_simplex(weights, cap)
+        momentum = weights.copy()
+        t = 1.0
+        for iteration in range(iterations):
+            if iteration % 10 == 0:
+                exact = solve_on_support(expected_returns, covariance, aversion, weights[0], cap)
+                if exact is not None:
+                    weights = exact[None, :]
+                    break
+            gradient = expected_returns - aversion * (momentum @ covariance)
+            new_weights = project_capped_simplex(momentum + step * gradient, cap)
+            change = new_weights - weights
+            if np.abs(change).max() < tolerance:
+                weights = new_weights
+                break
+            # Restart the momentum when it stops pointing uphill
+            if ((momentum - new_weights) * change).sum() > 0:
+                momentum = new_weights
+                t = 1.0
+            else:
+                t_next = (1 + np.sqrt(1 + 4 * t * t)) / 2
+                momentum = new_weights + (t - 1) / t_next * change
+                t = t_next
+            weights = new_weights
+        frontier[row] = weights[0]
+        if progress is not None:
+            progress((row + 1) / len(aversions))
+    return frontier
+
+
+def _frontier_key(assets, correlation, version=None):
+    digest = hashlib.sha1((version or asset_universe_version(assets)).encode())
+    if correlation is not None:
+        digest.update(np.ascontiguousarray(correlation, dtype=float).tobytes())
+    digest.update(repr((GRID_POINTS, MAX_WEIGHT, RISK_AVERSION_RANGE, SOLVER_ITERATIONS, RISK_TO_VOLATILITY)).encode())
+    return digest.hexdigest()[:16]
+
+
+def _load_frontier(key, n_assets):
+    # Frontier from memory or from the disk cache, or None if it has not been solved yet
+    frontier = _frontiers.get(key)
+    if frontier is not None:
+        return frontier
+    try:
+        frontier = np.load(os.path.join(CACHE_DIR, f"frontier-{key}.npy"))
+    except (OSError, ValueError):
+        return None
+    if frontier.shape != (GRID_POINTS, n_assets):
+        return None
+    frontier.setflags(write=False)
+    _frontiers[key] = frontier
+    return frontier
+
+
+def frontier_ready(assets, correlation=None, version=None):
+    # True when get_frontier would return without solving (never waits on a solve in progress)
+    return _load_frontier(_frontier_key(assets, correlation, version), len(assets)) is not None
+
+
+def get_frontier(assets, correlation=None, version=None, progress=None):
+    # Frontier weights (GRID_POINTS x assets) for this universe, from memory, disk, or a fresh solve.
+    # Pass the asset universe version when known to skip re-hashing the asset list.
+    # progress, if given, is passed to solve_frontier when a solve is needed.
+    key = _frontier_key(assets, correlation, version)
+    frontier = _frontiers.get(key)
+    if frontier is not None:
+        return frontier
+
+    with _lock:
+        frontier = _load_frontier(key, len(assets))
+        if frontier is not None:
+            return frontier
+
+        expected_returns = as_universe(assets).returns
+        covariance = build_covariance(assets, correlation)
+        grid = np.linspace(0, 1, GRID_POINTS)
+        frontier = solve_frontier(expected_returns, covariance, risk_aversion(grid), progress=progress)
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        # Write then rename so a concurrent reader never sees a partial file
+        path = os.path.join(CACHE_DIR, f"frontier-{key}.npy")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, frontier)
+        os.replace(tmp_path, path)
+
+        frontier.setflags(write=False)
+        _frontiers[key] = frontier
+        return frontier
+
+
+def optimal_allocation(assets, risk_score, correlation=None, version=None):
+    # Interpolate between the two nearest frontier points; a blend of feasible weights stays feasible
+    universe = as_universe(assets)
+    frontier = get_frontier(universe, correlation, version)
+    position = min(max(float(risk_score), 0.0), 1.0) * (GRID_POINTS - 1)
+    lower = int(position)
+    upper = min(lower + 1, GRID_POINTS - 1)
+    fraction = position - lower
+    weights = (1 - fraction) * frontier[lower] + fraction * frontier[upper]
+
+    keep = weights >= MIN_WEIGHT
+    weights = weights * keep
+    weights = weights / weights.sum()
+    positions = np.flatnonzero(keep)
+    return dict(zip(universe.names[positions].tolist(), weights[positions].tolist()))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Solve and cache the efficient frontier for an asset universe.")
+    parser.add_argument("catalog", nargs="?", help="asset catalog (default: the app's asset universe)")
+    args = parser.parse_args(argv)
+
+    assets = AssetUniverse.from_catalog(args.catalog) if args.catalog else default_universe()
+    if frontier_ready(assets, version=assets.version):
+        print(f"Frontier for {len(assets)} assets (version {assets.version}) is already cached in {CACHE_DIR}")
+        return
+    start = time.perf_counter()
+    get_frontier(assets, version=assets.version)
+    print(f"Solved the frontier for {len(assets)} assets (version {assets.version}) "
+          f"in {time.perf_counter() - start:.1f}s; cached in {CACHE_DIR}")
+
+
+if __name__ == "__main__":
+    main()
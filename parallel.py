@@ -0,0 +1,55 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import advisor
+
+# Chunked process-pool map shared by the headless tools (batch.py, reports.py).
+# Each worker process loads the app's asset universe once; at most two chunks per worker are in
+# flight, so memory stays bounded for any input size.
+
+_worker_assets = None
+_worker_version = None
+
+
+def _init_worker():
+    global _worker_assets, _worker_version
+    _worker_assets = advisor.default_universe()
+    _worker_version = _worker_assets.version
+
+
+def worker_assets():
+    # (asset universe, version) of this process, loaded on first use
+    if _worker_assets is None:
+        _init_worker()
+    return _worker_assets, _worker_version
+
+
+def chunks(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def map_chunks(fn, items, chunk_size, workers=None, *args):
+    # Yield fn(chunk, *args) for each chunk of items, in input order.
+    # fn must be a module-level function so it can be sent to the worker processes.
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for chunk in chunks(items, chunk_size):
+            yield fn(chunk, *args)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        pending = deque()
+        for chunk in chunks(items, chunk_size):
+            pending.append(pool.submit(fn, chunk, *args))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
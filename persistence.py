@@ -0,0 +1,551 @@
+import atexit
+import datetime
+import hashlib
+import json
+import logging
+import math
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+# SQLite persistence: per-process connection pool, one-time schema setup and a
+# write-behind queue that batches portfolio saves into single transactions.
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = os.environ.get("ADVISOR_DB_PATH", "investment_advisor.db")
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-8000",
+    "PRAGMA foreign_keys=ON",
+)
+
+SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY,
+        name TEXT,
+        income REAL,
+        savings REAL,
+        risk_score REAL,
+        target_return REAL,
+        investment_goals TEXT
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS portfolios (
+        id INTEGER PRIMARY KEY,
+        user_id INTEGER,
+        allocation TEXT,
+        initial_investment REAL,
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    )
+    ''',
+    # One row per distinct submission so reruns and retries never duplicate users/portfolios
+    '''
+    CREATE TABLE IF NOT EXISTS portfolio_submissions (
+        submission_key TEXT PRIMARY KEY,
+        user_id INTEGER,
+        portfolio_id INTEGER,
+        created_at TEXT,
+        FOREIGN KEY (user_id) REFERENCES users (id),
+        FOREIGN KEY (portfolio_id) REFERENCES portfolios (id)
+    )
+    ''',
+    # Normalized allocation and goals; portfolios.allocation / users.investment_goals keep the legacy str() form
+    '''
+    CREATE TABLE IF NOT EXISTS portfolio_allocations (
+        portfolio_id INTEGER NOT NULL,
+        asset_name TEXT NOT NULL,
+        weight REAL NOT NULL,
+        PRIMARY KEY (portfolio_id, asset_name),
+        FOREIGN KEY (portfolio_id) REFERENCES portfolios (id)
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS user_goals (
+        user_id INTEGER NOT NULL,
+        goal TEXT NOT NULL,
+        PRIMARY KEY (user_id, goal),
+        FOREIGN KEY (user_id) REFERENCES users (id)
+    ) WITHOUT ROWID
+    ''',
+    # Asset reference data so allocations can be grouped by asset type in SQL
+    '''
+    CREATE TABLE IF NOT EXISTS assets (
+        name TEXT PRIMARY KEY,
+        type TEXT NOT NULL,
+        expected_return REAL,
+        risk REAL,
+        price REAL
+    )
+    ''',
+    # Tracks one-shot data migrations (see migrate.py)
+    '''
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        name TEXT PRIMARY KEY,
+        completed_at TEXT
+    )
+    ''',
+    # Analytics summary tables, kept current by write_portfolios in the same transaction as the rows
+    # they summarize (rebuilt from scratch by "python analytics.py --backfill")
+    '''
+    CREATE TABLE IF NOT EXISTS analytics_risk_histogram (
+        bucket INTEGER PRIMARY KEY,
+        users INTEGER NOT NULL
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS analytics_band_totals (
+        band TEXT PRIMARY KEY,
+        portfolios INTEGER NOT NULL,
+        investment_sum REAL NOT NULL
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS analytics_band_allocations (
+        band TEXT NOT NULL,
+        asset_name TEXT NOT NULL,
+        weight_sum REAL NOT NULL,
+        PRIMARY KEY (band, asset_name)
+    ) WITHOUT ROWID
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS analytics_goal_investments (
+        goal TEXT NOT NULL,
+        bucket INTEGER NOT NULL,
+        portfolios INTEGER NOT NULL,
+        investment_sum REAL NOT NULL,
+        PRIMARY KEY (goal, bucket)
+    ) WITHOUT ROWID
+    ''',
+    "CREATE INDEX IF NOT EXISTS idx_portfolios_user_id ON portfolios (user_id)",
+    "CREATE INDEX IF NOT EXISTS idx_portfolio_submissions_user_id ON portfolio_submissions (user_id)",
+    "CREATE INDEX IF NOT EXISTS idx_portfolio_allocations_asset_name ON portfolio_allocations (asset_name)",
+    "CREATE INDEX IF NOT EXISTS idx_user_goals_goal ON user_goals (goal)",
+    "CREATE INDEX IF NOT EXISTS idx_users_risk_score ON users (risk_score)",
+    "CREATE INDEX IF NOT EXISTS idx_assets_type ON assets (type)",
+)
+
+# Columns added after the original tables shipped: (table, column, type)
+ADDED_COLUMNS = (
+    ("users", "created_at", "TEXT"),
+    ("portfolios", "created_at", "TEXT"),
+)
+
+# Same thresholds as recommend_allocation
+RISK_BAND_SQL = "CASE WHEN u.risk_score < 0.3 THEN 'low' WHEN u.risk_score < 0.7 THEN 'medium' ELSE 'high' END"
+
+LOCK_RETRIES = 5
+
+ANALYTICS_MIGRATION = "0002_analytics_summary_tables"  # recorded once the analytics tables cover every portfolio
+RISK_HISTOGRAM_BUCKETS = 20  # risk scores 0..1 in steps of 0.05
+INVESTMENT_BUCKETS_PER_DECADE = 20  # log-spaced investment buckets, each about 12% wide
+
+
+class ConnectionPool:
+    # Reuses SQLite connections within one process; connections are created lazily
+
+    def __init__(self, db_path, size=4):
+        self.db_path = db_path
+        self.size = size
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    def _connect(self):
+        # isolation_level=None: transactions are opened explicitly with transaction()
+        conn = sqlite3.connect(self.db_path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    @contextmanager
+    def connection(self):
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            try:
+                self._idle.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_lock = threading.Lock()
+_pid = None
+_pools = {}
+_schema_ready = set()
+_synced_assets = set()
+_writers = {}
+
+
+def _reset_after_fork():
+    # Connections and threads do not survive fork; start fresh in a child process
+    global _pid
+    if _pid != os.getpid():
+        _pid = os.getpid()
+        _pools.clear()
+        _schema_ready.clear()
+        _synced_assets.clear()
+        _writers.clear()
+
+
+def get_pool(db_path=None):
+    db_path = db_path or DB_PATH
+    with _lock:
+        _reset_after_fork()
+        pool = _pools.get(db_path)
+        if pool is None:
+            pool = _pools[db_path] = ConnectionPool(db_path)
+        return pool
+
+
+# Time spent in BEGIN IMMEDIATE, which blocks (up to the busy timeout) while another connection
+# holds the write lock; the pool itself never blocks, it opens another connection instead
+_lock_waits = {"transactions": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0}
+_lock_waits_lock = threading.Lock()
+
+
+def lock_wait_stats():
+    with _lock_waits_lock:
+        return dict(_lock_waits)
+
+
+def _record_lock_wait(seconds):
+    with _lock_waits_lock:
+        _lock_waits["transactions"] += 1
+        _lock_waits["wait_seconds"] += seconds
+        _lock_waits["max_wait_seconds"] = max(_lock_waits["max_wait_seconds"], seconds)
+
+
+@contextmanager
+def transaction(conn):
+    # BEGIN IMMEDIATE takes the write lock up front instead of failing on upgrade
+    start = time.perf_counter()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+    finally:
+        _record_lock_wait(time.perf_counter() - start)
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    else:
+        conn.commit()
+
+
+def ensure_schema(db_path=None):
+    # Create tables once per process; later calls are a set lookup
+    db_path = db_path or DB_PATH
+    if db_path in _schema_ready and _pid == os.getpid():
+        return
+    pool = get_pool(db_path)
+    with _lock:
+        if db_path in _schema_ready:
+            return
+        with pool.connection() as conn:
+            with transaction(conn):
+                for statement in SCHEMA:
+                    conn.execute(statement)
+                for table, column, column_type in ADDED_COLUMNS:
+                    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+                    if column not in existing:
+                        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_users_created_at ON users (created_at)")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_portfolios_created_at ON portfolios (created_at)")
+                # A database with no portfolios yet needs no analytics backfill: every save adds its own deltas
+                if conn.execute("SELECT 1 FROM portfolios LIMIT 1").fetchone() is None:
+                    conn.execute(
+                        "INSERT OR IGNORE INTO schema_migrations (name, completed_at) VALUES (?, ?)",
+                        (ANALYTICS_MIGRATION, datetime.datetime.now().isoformat(timespec="seconds"))
+                    )
+        _schema_ready.add(db_path)
+
+
+def submission_key(user_data, portfolio_data):
+    # Content hash of one submission: the same profile and portfolio always map to the same key
+    payload = json.dumps({"user": user_data, "portfolio": portfolio_data}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _is_lock_error(error):
+    message = str(error).lower()
+    return "locked" in message or "busy" in message
+
+
+def insert_allocations(conn, portfolio_id, allocation):
+    conn.executemany(
+        "INSERT OR IGNORE INTO portfolio_allocations (portfolio_id, asset_name, weight) VALUES (?, ?, ?)",
+        [(portfolio_id, asset_name, float(weight)) for asset_name, weight in allocation.items()]
+    )
+
+
+def insert_goals(conn, user_id, goals):
+    conn.executemany(
+        "INSERT OR IGNORE INTO user_goals (user_id, goal) VALUES (?, ?)",
+        [(user_id, goal) for goal in goals]
+    )
+
+
+def risk_band(risk_score):
+    # Python twin of RISK_BAND_SQL
+    if risk_score < 0.3:
+        return "low"
+    elif risk_score < 0.7:
+        return "medium"
+    return "high"
+
+
+def risk_bucket(risk_score):
+    return min(max(int(risk_score * RISK_HISTOGRAM_BUCKETS), 0), RISK_HISTOGRAM_BUCKETS - 1)
+
+
+def investment_bucket(amount):
+    # Log-spaced bucket index; amounts below 1 INR share bucket 0
+    return int(math.floor(math.log10(max(amount, 1.0)) * INVESTMENT_BUCKETS_PER_DECADE))
+
+
+def update_analytics(conn, user_data, portfolio_data):
+    # Add one new user + portfolio to the analytics tables; the caller holds the transaction
+    risk_score = float(user_data['risk_score'])
+    investment = float(portfolio_data['initial_investment'])
+    band = risk_band(risk_score)
+    conn.execute('''
+    INSERT INTO analytics_risk_histogram (bucket, users) VALUES (?, 1)
+    ON CONFLICT (bucket) DO UPDATE SET users = users + 1
+    ''', (risk_bucket(risk_score),))
+    conn.execute('''
+    INSERT INTO analytics_band_totals (band, portfolios, investment_sum) VALUES (?, 1, ?)
+    ON CONFLICT (band) DO UPDATE SET
+        portfolios = portfolios + 1,
+        investment_sum = investment_sum + excluded.investment_sum
+    ''', (band, investment))
+    conn.executemany('''
+    INSERT INTO analytics_band_allocations (band, asset_name, weight_sum) VALUES (?, ?, ?)
+    ON CONFLICT (band, asset_name) DO UPDATE SET weight_sum = weight_sum + excluded.weight_sum
+    ''', [(band, asset_name, float(weight)) for asset_name, weight in portfolio_data['allocation'].items()])
+    # Goals are a set per user (see user_goals), so a repeated goal counts once
+    bucket = investment_bucket(investment)
+    conn.executemany('''
+    INSERT INTO analytics_goal_investments (goal, bucket, portfolios, investment_sum) VALUES (?, ?, 1, ?)
+    ON CONFLICT (goal, bucket) DO UPDATE SET
+        portfolios = portfolios + 1,
+        investment_sum = investment_sum + excluded.investment_sum
+    ''', [(goal, bucket, investment) for goal in dict.fromkeys(user_data['investment_goals'])])
+
+
+def sync_assets(assets, version, db_path=None):
+    # Upsert the asset reference table once per process and asset universe version
+    db_path = db_path or DB_PATH
+    if (db_path, version) in _synced_assets:
+        return
+    with get_pool(db_path).connection() as conn:
+        with transaction(conn):
+            conn.executemany('''
+            INSERT INTO assets (name, type, expected_return, risk, price) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (name) DO UPDATE SET
+                type = excluded.type,
+                expected_return = excluded.expected_return,
+                risk = excluded.risk,
+                price = excluded.price
+            ''', [(a["name"], a["type"], a["return"], a["risk"], a["price"]) for a in assets])
+    _synced_assets.add((db_path, version))
+
+
+def average_type_weight_by_risk_band(conn, asset_type):
+    # e.g. average stock weight per portfolio, grouped by the owner's risk band
+    return conn.execute(f'''
+    SELECT {RISK_BAND_SQL} AS band, COUNT(*), SUM(COALESCE(tw.weight, 0)) / COUNT(*)
+    FROM portfolios p
+    JOIN users u ON u.id = p.user_id
+    LEFT JOIN (
+        SELECT portfolio_id, SUM(weight) AS weight
+        FROM portfolio_allocations
+        WHERE asset_name IN (SELECT name FROM assets WHERE type = ?)
+        GROUP BY portfolio_id
+    ) tw ON tw.portfolio_id = p.id
+    GROUP BY band
+    ''', (asset_type,)).fetchall()
+
+
+def write_portfolios(conn, submissions):
+    # Write (key, user_data, portfolio_data) submissions in one transaction, skipping known keys.
+    # Returns (written, duplicates).
+    written = 0
+    duplicates = 0
+    created_at = datetime.datetime.now().isoformat(timespec="seconds")
+    with transaction(conn):
+        for key, user_data, portfolio_data in submissions:
+            exists = conn.execute(
+                "SELECT 1 FROM portfolio_submissions WHERE submission_key = ?", (key,)
+            ).fetchone()
+            if exists:
+                duplicates += 1
+                continue
+
+            cursor = conn.execute('''
+            INSERT INTO users (name, income, savings, risk_score, target_return, investment_goals, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                user_data['name'],
+                user_data['income'],
+                user_data['savings'],
+                user_data['risk_score'],
+                user_data['target_return'],
+                str(user_data['investment_goals']),
+                created_at,
+            ))
+            user_id = cursor.lastrowid
+
+            cursor = conn.execute('''
+            INSERT INTO portfolios (user_id, allocation, initial_investment, created_at)
+            VALUES (?, ?, ?, ?)
+            ''', (
+                user_id,
+                str(portfolio_data['allocation']),
+                portfolio_data['initial_investment'],
+                created_at,
+            ))
+            portfolio_id = cursor.lastrowid
+
+            insert_allocations(conn, portfolio_id, portfolio_data['allocation'])
+            insert_goals(conn, user_id, user_data['investment_goals'])
+            update_analytics(conn, user_data, portfolio_data)
+
+            conn.execute('''
+            INSERT INTO portfolio_submissions (submission_key, user_id, portfolio_id, created_at)
+            VALUES (?, ?, ?, ?)
+            ''', (key, user_id, portfolio_id, created_at))
+            written += 1
+    return written, duplicates
+
+
+class PortfolioWriter:
+    # Write-behind queue: submissions are coalesced into batched transactions on a background thread
+
+    def __init__(self, db_path=None, batch_size=200, flush_interval=0.25, recent_keys=10000):
+        self.db_path = db_path or DB_PATH
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.stats = {"submitted": 0, "written": 0, "duplicates": 0, "batches": 0, "lock_waits": 0, "errors": 0}
+        self._queue = queue.Queue()
+        # Keys queued recently by this process (key -> Future); re-submitting the same data stops here
+        self._recent = OrderedDict()
+        self._recent_limit = recent_keys
+        self._recent_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="portfolio-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, user_data, portfolio_data):
+        # Queue a submission; returns a Future that resolves to True once it is stored (or was already)
+        # and raises the write error if its batch failed. Re-submitting queued data returns the same Future.
+        key = submission_key(user_data, portfolio_data)
+        with self._recent_lock:
+            future = self._recent.get(key)
+            if future is not None:
+                self._recent.move_to_end(key)
+                return future
+            future = self._recent[key] = Future()
+            if len(self._recent) > self._recent_limit:
+                self._recent.popitem(last=False)
+            self.stats["submitted"] += 1
+        self._queue.put((key, user_data, portfolio_data, future))
+        return future
+
+    def flush(self):
+        # Block until every queued submission has been written
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write(self, batch):
+        try:
+            ensure_schema(self.db_path)
+            pool = get_pool(self.db_path)
+        except Exception as e:
+            self._fail(batch, e)
+            return
+        for attempt in range(LOCK_RETRIES):
+            try:
+                with pool.connection() as conn:
+                    written, duplicates = write_portfolios(conn, [submission[:3] for submission in batch])
+                self.stats["written"] += written
+                self.stats["duplicates"] += duplicates
+                self.stats["batches"] += 1
+                for submission in batch:
+                    submission[3].set_result(True)
+                return
+            except sqlite3.OperationalError as e:
+                if not _is_lock_error(e) or attempt == LOCK_RETRIES - 1:
+                    self._fail(batch, e)
+                    return
+                self.stats["lock_waits"] += 1
+                time.sleep(0.05 * 2 ** attempt)
+            except Exception as e:
+                self._fail(batch, e)
+                return
+
+    def _fail(self, batch, error):
+        # Report the error to whoever submitted, and forget the keys so the data can be submitted again
+        self.stats["errors"] += 1
+        logger.error("Database save error: %s (%d submissions dropped)", error, len(batch))
+        with self._recent_lock:
+            for key, _, _, _ in batch:
+                self._recent.pop(key, None)
+        for submission in batch:
+            submission[3].set_exception(error)
+
+
+def get_writer(db_path=None):
+    db_path = db_path or DB_PATH
+    with _lock:
+        _reset_after_fork()
+        writer = _writers.get(db_path)
+        if writer is None:
+            writer = _writers[db_path] = PortfolioWriter(db_path)
+        return writer
+
+
+def flush_writers():
+    for writer in list(_writers.values()):
+        writer.flush()
+
+
+atexit.register(flush_writers)
@@ -0,0 +1,143 @@
+import itertools
+import threading
+
+import numpy as np
+
+import advisor
+from results import SimulationResult
+from universe import as_universe
+
+# Risk questionnaire and its precomputed outcome table.
+# Four questions with four options give 256 answer tuples but only a handful of distinct risk
+# scores, so score, category, allocation and a baseline projection per horizon are computed
+# once per asset universe and every later rerun is a dictionary lookup.
+
+RISK_QUESTIONS = (
+    {
+        "question": "How would you react if your portfolio lost 20% of its value in a month?",
+        "options": (
+            "Sell everything immediately ",
+            "Sell some investments to cut losses ",
+            "Do nothing and wait for recovery ",
+            "Buy more at the lower prices "
+        ),
+        "scores": (1, 3, 5, 10)
+    },
+    {
+        "question": "How long do you keep your money invested?",
+        "options": (
+            "Less than 2 years ",
+            "2-5 years ",
+            "5-10 years ",
+            "More than 10 years "
+        ),
+        "scores": (1, 4, 7, 10)
+    },
+    {
+        "question": "What is your primary investment goal?",
+        "options": (
+            "Preserve capital ",
+            "Generate income ",
+            "Balanced growth and income ",
+            "Maximize growth "
+        ),
+        "scores": (1, 4, 7, 10)
+    },
+    {
+        "question": "How much financial knowledge do you have?",
+        "options": (
+            "Very little ",
+            "Basic understanding ",
+            "Good knowledge ",
+            "Advanced/Professional "
+        ),
+        "scores": (2, 5, 8, 10)
+    }
+)
+
+MAX_HORIZON_YEARS = 15  # matches the "Simulation Years" slider
+
+
+def score_answers(answers):
+    # Risk score (0-1) and category for a tuple of selected option indexes
+    total_score = sum(q["scores"][index] for q, index in zip(RISK_QUESTIONS, answers))
+    max_score = 10 * len(RISK_QUESTIONS)
+    risk_score = total_score / max_score
+    return risk_score, advisor.classify_risk(risk_score)
+
+
+# Scores do not depend on the asset universe, so this part of the table is built at import
+ANSWER_SCORES = {
+    answers: score_answers(answers)
+    for answers in itertools.product(*(range(len(q["options"])) for q in RISK_QUESTIONS))
+}
+
+
+def build_outcome_table(assets, method="buckets", version=None):
+    # answers -> {risk_score, risk_category, allocation, weights, growth_factors, baseline}.
+    # Answer tuples with the same risk score share one outcome dict, and every outcome shares
+    # one months x assets growth factor array, so memory does not scale with the number of scores.
+    version = version or advisor.asset_universe_version(assets)
+    universe = as_universe(assets)
+    factors = advisor.growth_factors(universe, MAX_HORIZON_YEARS)
+    factors.setflags(write=False)
+    inflation = (1 + advisor.INFLATION_RATE / 12) ** np.arange(len(factors))
+    by_score = {}
+    table = {}
+    for answers, (risk_score, risk_category) in ANSWER_SCORES.items():
+        outcome = by_score.get(risk_score)
+        if outcome is None:
+            allocation = advisor.recommend_allocation(universe, risk_score, method=method, version=version)
+            weights = universe.weights(allocation)
+            weights.setflags(write=False)
+            totals = factors @ weights
+            outcome = by_score[risk_score] = {
+                "risk_score": risk_score,
+                "risk_category": risk_category,
+                "allocation": allocation,
+                "weights": weights,
+                "growth_factors": factors,
+                # Growth of 1 unit invested after each horizon (nominal and inflation adjusted)
+                "baseline": {
+                    years: {
+                        "final_multiple": float(totals[years * 12]),
+                        "inflation_adjusted_multiple": float(totals[years * 12] / inflation[years * 12]),
+                    }
+                    for years in range(1, MAX_HORIZON_YEARS + 1)
+                },
+            }
+        table[answers] = outcome
+    return table
+
+
+_tables = {}
+_lock = threading.Lock()
+
+
+def lookup_outcome(answers, assets, method="buckets", version=None):
+    # Outcome for one answer tuple; the table is rebuilt when the asset universe version changes
+    version = version or advisor.asset_universe_version(assets)
+    table = _tables.get((version, method))
+    if table is None:
+        with _lock:
+            table = _tables.get((version, method))
+            if table is None:
+                table = build_outcome_table(assets, method, version)
+                # Drop tables built for an older asset universe
+                for key in [key for key in _tables if key[0] != version]:
+                    del _tables[key]
+                _tables[(version, method)] = table
+    return table[tuple(answers)]
+
+
+def simulate_from_outcome(outcome, assets, initial_investment, years=5):
+    # advisor.simulate_growth as a compact SimulationResult, scaled from the precomputed unit growth paths
+    try:
+        if years > MAX_HORIZON_YEARS:
+            unit_values = advisor.unit_growth(outcome["allocation"], assets, years)
+        else:
+            unit_values = outcome["growth_factors"][:years * 12 + 1] * outcome["weights"]
+        return SimulationResult.from_unit_values(unit_values, assets, initial_investment)
+    except Exception as e:
+        advisor.report_error(f"Simulation error: {e}")
+        return SimulationResult.blank()
@@ -0,0 +1,393 @@
+import argparse
+import contextlib
+import datetime
+import functools
+import hashlib
+import html
+import json
+import logging
+import os
+import sqlite3
+import textwrap
+import time
+
+import numpy as np
+
+import advisor
+import charts
+import migrate
+import parallel
+from export import connect_readonly
+from results import SimulationResult
+from universe import as_universe
+
+# Quarter-end client statements: one static HTML or PDF report per stored portfolio, with the
+# allocation table, growth chart and recommendations the app shows in main().
+# Portfolios are read in keyset pages and rendered on a process pool. Charts are written once per
+# content key (allocation, investment, horizon and statement date) under <output>/charts, so clients
+# with the same portfolio share one render, also across worker processes.
+# Run this code using "python reports.py --output-dir statements" (add --format pdf for PDF files)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 100
+REPORT_FORMATS = ("html", "pdf")
+CHART_DIR = "charts"
+PDF_TABLE_ROWS = 15  # larger allocations list their biggest holdings plus "Other" in the PDF table
+CHART_WAIT_SECONDS = 60  # how long a worker waits for a chart another worker is drawing
+CHART_PIXEL_CACHE_SIZE = 16  # decoded charts kept per worker for PDF pages (about 4 MB each)
+
+HTML_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>Portfolio Statement - {name}</title>
+<style>
+body {{ font-family: sans-serif; margin: 2em auto; max-width: 60em; color: #222; }}
+table {{ border-collapse: collapse; }}
+th, td {{ border: 1px solid #ccc; padding: 0.3em 0.8em; text-align: right; }}
+th:first-child, td:first-child {{ text-align: left; }}
+img {{ max-width: 100%; }}
+</style>
+</head>
+<body>
+<h1>Portfolio Statement</h1>
+<p>{name} &middot; statement date {as_of} &middot; portfolio #{portfolio_id}</p>
+<p>Initial investment Rs.{initial_investment:,.2f} &middot; expected annual return {expected_return:.2%}<br>
+Projected value after {years} years: Rs.{final_value:,.2f} (Rs.{inflation_adjusted_value:,.2f} in today's money)</p>
+<h2>Asset Allocation</h2>
+<table>
+<tr><th>Asset</th><th>Weight</th><th>Amount (INR)</th></tr>
+{allocation_rows}
+</table>
+<h2>Growth Projection</h2>
+{chart}
+<h2>Recommendations</h2>
+<ol>
+{recommendations}
+</ol>
+</body>
+</html>
+"""
+
+
+def migration_applied(conn):
+    try:
+        return conn.execute(
+            "SELECT 1 FROM schema_migrations WHERE name = ?", (migrate.MIGRATION_NAME,)
+        ).fetchone() is not None
+    except sqlite3.OperationalError:
+        # No schema_migrations table: the database predates migrations altogether
+        return False
+
+
+def read_portfolios(db_path=None, fetch_size=DEFAULT_CHUNK_SIZE):
+    # Stream every stored portfolio with its owner's profile, allocation and goals, paged by portfolio id.
+    # Each page's allocations and goals are read with one range query each.
+    db_path = db_path or advisor.DB_PATH
+    # Reports only read: the database is opened read-only, and the allocations and goals must
+    # already be in the normalized tables
+    with contextlib.closing(connect_readonly(db_path)) as conn:
+        if not migration_applied(conn):
+            raise RuntimeError(f"{db_path} has not been migrated to the normalized allocation and goal tables; "
+                               f"run 'python migrate.py --db {db_path}' first")
+        last_id = 0
+        while True:
+            rows = conn.execute('''
+            SELECT p.id, p.user_id, p.initial_investment, u.name, u.income, u.savings, u.risk_score, u.target_return
+            FROM portfolios p
+            JOIN users u ON u.id = p.user_id
+            WHERE p.id > ?
+            ORDER BY p.id
+            LIMIT ?
+            ''', (last_id, fetch_size)).fetchall()
+            if not rows:
+                break
+            first_id, last_id = rows[0][0], rows[-1][0]
+            allocations = {}
+            for portfolio_id, asset_name, weight in conn.execute(
+                    "SELECT portfolio_id, asset_name, weight FROM portfolio_allocations WHERE portfolio_id BETWEEN ? AND ?",
+                    (first_id, last_id)):
+                allocations.setdefault(portfolio_id, {})[asset_name] = weight
+            goals = {}
+            for user_id, goal in conn.execute('''
+            SELECT user_id, goal FROM user_goals
+            WHERE user_id IN (SELECT user_id FROM portfolios WHERE id BETWEEN ? AND ?)
+            ''', (first_id, last_id)):
+                goals.setdefault(user_id, []).append(goal)
+
+            for portfolio_id, user_id, initial_investment, name, income, savings, risk_score, target_return in rows:
+                if portfolio_id not in allocations:
+                    logger.warning("Portfolio %d has no allocation; skipped", portfolio_id)
+                    continue
+                yield {
+                    "portfolio_id": portfolio_id,
+                    "user_id": user_id,
+                    "name": name or "",
+                    "income": income or 0.0,
+                    "savings": savings or 0.0,
+                    "risk_score": risk_score,
+                    "target_return": target_return or 0.0,
+                    "investment_goals": goals.get(user_id, []),
+                    "allocation": allocations[portfolio_id],
+                    "initial_investment": initial_investment or 0.0,
+                }
+
+
+def chart_key(allocation, initial_investment, years, as_of, version=None):
+    # Content hash of everything the chart shows; equal keys draw identical charts
+    content = json.dumps([version, as_of.isoformat(), years, initial_investment, list(allocation.items())])
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()[:32]
+
+
+def chart_file(output_dir, key, portfolio_data, simulation_results):
+    # (path, reused) of the PNG chart for key, drawing it only if no worker has drawn it yet.
+    # The first worker to need a key claims it with a lock file; the others wait for its render.
+    path = os.path.join(output_dir, CHART_DIR, f"{key}.png")
+    lock = f"{path}.lock"
+    deadline = time.monotonic() + CHART_WAIT_SECONDS
+    while not os.path.exists(path):
+        owned = True
+        try:
+            os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            if time.monotonic() < deadline:
+                time.sleep(0.05)
+                continue
+            # The claiming worker died or is stuck; draw it here rather than wait forever, but leave
+            # its lock alone so a third worker does not claim the key as well
+            logger.warning("Chart %s still locked after %ds; drawing it again", key, CHART_WAIT_SECONDS)
+            owned = False
+        try:
+            # The previous owner may have finished between our exists() check and taking the lock
+            if os.path.exists(path):
+                break
+            data = charts.render_chart(portfolio_data, simulation_results)
+            if data is None:
+                return None, False
+            # Written under a temporary name and renamed, so other workers never read a partial file
+            temporary = f"{path}.{os.getpid()}.tmp"
+            with open(temporary, "wb") as f:
+                f.write(data)
+            os.replace(temporary, path)
+        finally:
+            if owned:
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(lock)
+        return path, False
+    return path, True
+
+
+def ordered_allocation(allocation, assets):
+    # Allocation in universe order (as recommend_allocation builds it), so equal portfolios hash equally
+    names = [name for name in as_universe(assets).names.tolist() if name in allocation]
+    names += sorted(name for name in allocation if name not in set(names))
+    return {name: allocation[name] for name in names}
+
+
+def build_report(portfolio, assets, years, as_of, version=None):
+    # Projection, recommendations and chart inputs for one stored portfolio
+    allocation = ordered_allocation(portfolio["allocation"], assets)
+    initial_investment = portfolio["initial_investment"]
+    portfolio_data = {"allocation": allocation, "initial_investment": initial_investment}
+    unit_values = advisor.unit_growth(allocation, assets, years)
+    simulation_results = SimulationResult.from_unit_values(unit_values, assets, initial_investment, start=as_of)
+    recommendations = advisor.generate_recommendations(portfolio, portfolio_data, assets, simulation_results)
+    return {
+        "portfolio_id": portfolio["portfolio_id"],
+        "name": portfolio["name"],
+        "as_of": as_of.date().isoformat(),
+        "years": years,
+        "allocation": allocation,
+        "initial_investment": initial_investment,
+        "expected_return": advisor.portfolio_return(allocation, assets),
+        "final_value": simulation_results.final(),
+        "inflation_adjusted_value": simulation_results.final("Inflation_Adjusted_Value"),
+        "recommendations": recommendations,
+        "portfolio_data": portfolio_data,
+        "simulation_results": simulation_results,
+        "chart_key": chart_key(allocation, initial_investment, years, as_of, version),
+    }
+
+
+def write_html(report, chart_path, path):
+    rows = "\n".join(
+        f"<tr><td>{html.escape(name)}</td><td>{weight:.2%}</td><td>{weight * report['initial_investment']:,.2f}</td></tr>"
+        for name, weight in report["allocation"].items()
+    )
+    # Charts are linked, not inlined, so a shared render is stored once
+    chart = (f'<img src="{CHART_DIR}/{os.path.basename(chart_path)}" alt="Asset allocation and growth projection">'
+             if chart_path else "<p>Chart unavailable.</p>")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(HTML_TEMPLATE.format(
+            name=html.escape(report["name"]),
+            as_of=report["as_of"],
+            portfolio_id=report["portfolio_id"],
+            initial_investment=report["initial_investment"],
+            expected_return=report["expected_return"],
+            years=report["years"],
+            final_value=report["final_value"],
+            inflation_adjusted_value=report["inflation_adjusted_value"],
+            allocation_rows=rows,
+            chart=chart,
+            recommendations="\n".join(f"<li>{html.escape(rec)}</li>" for rec in report["recommendations"]),
+        ))
+
+
+@functools.lru_cache(maxsize=CHART_PIXEL_CACHE_SIZE)
+def chart_pixels(chart_path):
+    # Decoded 8-bit RGB pixels of a shared chart; the PNG is opaque, so the alpha channel is dropped
+    import matplotlib.image
+    return (matplotlib.image.imread(chart_path)[..., :3] * 255).round().astype(np.uint8)
+
+
+def write_pdf(report, chart_path, path):
+    # One A4 page drawn with matplotlib's PDF canvas; the shared PNG chart is embedded as an image
+    from matplotlib.backends.backend_pdf import FigureCanvasPdf
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(8.27, 11.69))
+    fig.text(0.08, 0.95, "Portfolio Statement", fontsize=18, weight="bold")
+    fig.text(0.08, 0.925, f"{report['name']} · statement date {report['as_of']} · portfolio #{report['portfolio_id']}",
+             fontsize=9)
+    fig.text(0.08, 0.885,
+             f"Initial investment Rs.{report['initial_investment']:,.2f} · expected annual return {report['expected_return']:.2%}\n"
+             f"Projected value after {report['years']} years: Rs.{report['final_value']:,.2f} "
+             f"(Rs.{report['inflation_adjusted_value']:,.2f} in today's money)", fontsize=9)
+
+    holdings = sorted(report["allocation"].items(), key=lambda item: item[1], reverse=True)
+    if len(holdings) > PDF_TABLE_ROWS:
+        holdings = holdings[:PDF_TABLE_ROWS - 1] + [("Other", sum(weight for _, weight in holdings[PDF_TABLE_ROWS - 1:]))]
+    table_ax = fig.add_axes([0.08, 0.58, 0.84, 0.28])
+    table_ax.axis("off")
+    table = table_ax.table(
+        cellText=[[name, f"{weight:.2%}", f"{weight * report['initial_investment']:,.2f}"] for name, weight in holdings],
+        colLabels=["Asset", "Weight", "Amount (INR)"],
+        loc="upper center",
+    )
+    table.auto_set_font_size(False)
+    table.set_fontsize(8)
+
+    if chart_path:
+        chart_ax = fig.add_axes([0.04, 0.2, 0.92, 0.37])
+        # interpolation="none" embeds the pixels as they are instead of resampling them for every page
+        chart_ax.imshow(chart_pixels(chart_path), interpolation="none")
+        chart_ax.axis("off")
+
+    lines = ["Recommendations"]
+    for i, rec in enumerate(report["recommendations"], 1):
+        lines += textwrap.wrap(f"{i}. {rec}", width=110)
+    fig.text(0.08, 0.19, "\n".join(lines), fontsize=8, va="top")
+
+    try:
+        FigureCanvasPdf(fig).print_figure(path, format="pdf")
+    finally:
+        fig.clear()
+
+
+REPORT_WRITERS = {"html": write_html, "pdf": write_pdf}
+
+
+def render_report(portfolio, assets, output_dir, fmt="html", years=5, as_of=None, version=None):
+    # Write one client's statement; returns its path, time taken and whether the chart was reused
+    start = time.perf_counter()
+    as_of = as_of or datetime.datetime.combine(datetime.date.today(), datetime.time())
+    path = None
+    chart_reused = False
+    with advisor.collect_errors() as errors:
+        try:
+            report = build_report(portfolio, assets, years, as_of, version)
+            chart_path, chart_reused = chart_file(output_dir, report["chart_key"], report["portfolio_data"],
+                                                  report["simulation_results"])
+            path = os.path.join(output_dir, f"portfolio_{portfolio['portfolio_id']}.{fmt}")
+            REPORT_WRITERS[fmt](report, chart_path, path)
+        except Exception as e:
+            advisor.report_error(f"Report error for portfolio {portfolio['portfolio_id']}: {e}")
+            path = None
+    return {
+        "portfolio_id": portfolio["portfolio_id"],
+        "path": path,
+        "seconds": time.perf_counter() - start,
+        "chart_reused": chart_reused,
+        "errors": errors,
+    }
+
+
+def render_chunk(portfolios, output_dir, fmt="html", years=5, as_of=None):
+    # Worker entry point: write the statements for a list of portfolios with the process-wide asset list
+    assets, version = parallel.worker_assets()
+    return [render_report(portfolio, assets, output_dir, fmt, years, as_of, version) for portfolio in portfolios]
+
+
+def render_reports(portfolios, output_dir, fmt="html", years=5, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, as_of=None):
+    # Render a stream of portfolios across a process pool, yielding one list of results per chunk
+    if fmt not in REPORT_WRITERS:
+        raise ValueError(f"Unsupported report format {fmt!r}; choose from {', '.join(REPORT_FORMATS)}")
+    os.makedirs(os.path.join(output_dir, CHART_DIR), exist_ok=True)
+    # Every worker dates the projections from the same day, so equal portfolios draw equal charts
+    as_of = as_of or datetime.datetime.combine(datetime.date.today(), datetime.time())
+    return parallel.map_chunks(render_chunk, portfolios, chunk_size, workers, output_dir, fmt, years, as_of)
+
+
+def run_reports(output_dir, db_path=None, fmt="html", years=5, workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    # Write a statement for every stored portfolio; returns throughput statistics
+    count = 0
+    failed = 0
+    reused = 0
+    report_seconds = 0.0
+    slowest = 0.0
+    start = time.perf_counter()
+    portfolios = read_portfolios(db_path, fetch_size=chunk_size)
+    for results in render_reports(portfolios, output_dir, fmt, years, workers, chunk_size):
+        for result in results:
+            logger.debug("Portfolio %d: %.1f ms%s", result["portfolio_id"], result["seconds"] * 1e3,
+                         " (chart reused)" if result["chart_reused"] else "")
+            for message in result["errors"]:
+                logger.error(message)
+            if result["path"] is None:
+                failed += 1
+            reused += result["chart_reused"]
+            report_seconds += result["seconds"]
+            slowest = max(slowest, result["seconds"])
+        count += len(results)
+        elapsed = time.perf_counter() - start
+        logger.info("Wrote %d reports (%.1f reports/s, %.1f ms per report, %d charts reused)",
+                    count, count / elapsed if elapsed else 0.0, report_seconds / count * 1e3, reused)
+    elapsed = time.perf_counter() - start
+    return {
+        "reports": count,
+        "failed": failed,
+        "charts_reused": reused,
+        "seconds": elapsed,
+        "reports_per_second": count / elapsed if elapsed else 0.0,
+        "mean_report_seconds": report_seconds / count if count else 0.0,
+        "max_report_seconds": slowest,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a client statement for every stored portfolio.")
+    parser.add_argument("--output-dir", required=True, help="directory for the reports (charts go in a charts/ subdirectory)")
+    parser.add_argument("--db", default=advisor.DB_PATH, help="SQLite database to read portfolios from")
+    parser.add_argument("--format", choices=REPORT_FORMATS, default="html", help="report file format")
+    parser.add_argument("--years", type=int, default=5, help="projection horizon in years")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="portfolios per worker task")
+    parser.add_argument("--verbose", action="store_true", help="log the time of every report")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if args.verbose:
+        logger.setLevel(logging.DEBUG)
+    try:
+        stats = run_reports(args.output_dir, db_path=args.db, fmt=args.format, years=args.years,
+                            workers=args.workers, chunk_size=args.chunk_size)
+    except (RuntimeError, sqlite3.Error) as e:
+        parser.error(str(e))
+    print(f"Wrote {stats['reports']} reports in {stats['seconds']:.2f}s ({stats['reports_per_second']:.1f} reports/s, "
+          f"{stats['mean_report_seconds'] * 1e3:.1f} ms per report, {stats['charts_reused']} charts reused, "
+          f"{stats['failed']} failed)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+import datetime
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import advisor
+from cache import size_of
+from universe import as_universe
+
+# Compact simulation results and the per-session store that holds them between reruns.
+# A SimulationResult keeps float32 monthly values for the held assets only; dates, year/month
+# numbers and the inflation-adjusted series are derived when asked for, and to_frame() rebuilds
+# the simulate_growth DataFrame for code that wants one. A SeriesResult does the same for dated
+# series that are not a monthly projection, such as Monte Carlo bands and backtest values.
+# Session results live in one process-wide ResultStore with a byte budget per session and in total;
+# the least recently used entries are evicted first, so idle sessions give their memory back.
+
+SESSION_RESULT_BYTES = int(float(os.environ.get("ADVISOR_SESSION_RESULT_MB", "4")) * 1024 * 1024)
+TOTAL_RESULT_BYTES = int(float(os.environ.get("ADVISOR_RESULT_BUDGET_MB", "256")) * 1024 * 1024)
+
+
+class SimulationResult:
+    # Monthly projection: values (months x held assets, float32) plus the total value and any extra
+    # columns (float64, one column each, so the headline figures are exact).
+    # Indexing by column name returns a NumPy array, so it reads like the DataFrame it replaces.
+
+    def __init__(self, start, names, values, total, extra=None):
+        self.start = start
+        self.names = tuple(names)
+        self.values = values
+        self.total = total
+        self.extra = extra or {}
+
+    @classmethod
+    def from_values(cls, asset_values, assets, total_value=None, extra_columns=None, start=None):
+        # Same inputs as advisor.values_frame; assets that are zero throughout are dropped
+        asset_values = np.asarray(asset_values)
+        held = np.flatnonzero(asset_values.any(axis=0))
+        if total_value is None:
+            total_value = asset_values.sum(axis=1)
+        return cls(
+            start or datetime.datetime.now(),
+            as_universe(assets).names[held].tolist(),
+            asset_values[:, held].astype(np.float32),
+            np.asarray(total_value, dtype=float),
+            {name: np.asarray(column, dtype=float) for name, column in (extra_columns or {}).items()},
+        )
+
+    @classmethod
+    def from_unit_values(cls, unit_asset_values, assets, initial_investment, start=None):
+        # Same inputs as advisor.projection_frame
+        asset_values = unit_asset_values * initial_investment
+        total_value = asset_values.sum(axis=1)
+        total_value[0] = initial_investment
+        return cls.from_values(asset_values, assets, total_value, start=start)
+
+    @classmethod
+    def blank(cls):
+        # Stand-in for a failed simulation (like an empty DataFrame)
+        return cls(None, (), np.empty((0, 0), dtype=np.float32), np.empty(0))
+
+    def __len__(self):
+        return len(self.total)
+
+    @property
+    def empty(self):
+        return len(self) == 0
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes + self.total.nbytes + sum(column.nbytes for column in self.extra.values())
+
+    @property
+    def columns(self):
+        return ['Date', 'Year', 'Month', 'Total_Value', 'Inflation_Adjusted_Value'] + list(self.extra) + list(self.names)
+
+    def __contains__(self, column):
+        return column in self.columns
+
+    def dates(self):
+        # (dates, year numbers, month numbers), the same calendar advisor.values_frame writes
+        if self.empty:
+            return np.empty(0, dtype="datetime64[us]"), np.empty(0, dtype=int), np.empty(0, dtype=int)
+        return advisor._monthly_dates(self.start, len(self))
+
+    def inflation_adjusted(self):
+        return self.total / (1 + advisor.INFLATION_RATE / 12) ** np.arange(len(self))
+
+    def __getitem__(self, column):
+        if column == 'Total_Value':
+            return self.total
+        if column == 'Inflation_Adjusted_Value':
+            return self.inflation_adjusted()
+        if column in ('Date', 'Year', 'Month'):
+            return self.dates()[('Date', 'Year', 'Month').index(column)]
+        if column in self.extra:
+            return self.extra[column]
+        if column in self.names:
+            return self.values[:, self.names.index(column)]
+        raise KeyError(column)
+
+    def final(self, column='Total_Value'):
+        return float(self[column][-1])
+
+    def to_frame(self):
+        # The simulate_growth DataFrame (held assets only), built on demand
+        import pandas as pd
+        return pd.DataFrame({column: self[column] for column in self.columns})
+
+
+class SeriesResult:
+    # Dated float32 columns in place of a DataFrame; Year and Month are derived from the dates.
+    # Indexing by column name returns a NumPy array, as with SimulationResult.
+
+    def __init__(self, dates, columns):
+        self.timestamps = np.asarray(dates)
+        self.data = {name: np.asarray(column, dtype=np.float32) for name, column in columns.items()}
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    @property
+    def empty(self):
+        return len(self) == 0
+
+    @property
+    def nbytes(self):
+        return self.timestamps.nbytes + sum(column.nbytes for column in self.data.values())
+
+    @property
+    def columns(self):
+        return ['Date', 'Year', 'Month'] + list(self.data)
+
+    def __contains__(self, column):
+        return column in self.columns
+
+    def __getitem__(self, column):
+        if column == 'Date':
+            return self.timestamps
+        if column in ('Year', 'Month'):
+            months = self.timestamps.astype("datetime64[M]").astype(int)
+            return 1970 + months // 12 if column == 'Year' else months % 12 + 1
+        return self.data[column]
+
+    def final(self, column):
+        return float(self[column][-1])
+
+    def to_frame(self):
+        import pandas as pd
+        return pd.DataFrame({column: self[column] for column in self.columns})
+
+
+class ResultStore:
+    # Session -> name -> value, evicted least recently used first when a session or the process
+    # goes over its byte budget. A value larger than the session budget is not stored at all: put()
+    # returns False and the caller recomputes it when it is needed again.
+
+    def __init__(self, session_bytes=SESSION_RESULT_BYTES, total_bytes=TOTAL_RESULT_BYTES):
+        self.session_bytes = session_bytes
+        self.total_bytes = total_bytes
+        self.evictions = 0
+        self.rejected = 0
+        self._entries = OrderedDict()  # (session, name) -> (nbytes, value), least recently used first
+        self._session_usage = {}
+        self._usage = 0
+        self._lock = threading.Lock()
+
+    def put(self, session, name, value):
+        key = (session, name)
+        nbytes = size_of(value)
+        with self._lock:
+            self._remove(key)
+            if nbytes > min(self.session_bytes, self.total_bytes):
+                self.rejected += 1
+                return False
+            self._entries[key] = (nbytes, value)
+            self._session_usage[session] = self._session_usage.get(session, 0) + nbytes
+            self._usage += nbytes
+            if self._session_usage[session] > self.session_bytes:
+                for old in [k for k in self._entries if k[0] == session and k != key]:
+                    if self._session_usage[session] <= self.session_bytes:
+                        break
+                    self._evict(old)
+            for old in list(self._entries):
+                if self._usage <= self.total_bytes:
+                    break
+                if old != key:
+                    self._evict(old)
+            return True
+
+    def get(self, session, name, default=None):
+        with self._lock:
+            entry = self._entries.get((session, name))
+            if entry is None:
+                return default
+            self._entries.move_to_end((session, name))
+            return entry[1]
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._usage -= entry[0]
+            remaining = self._session_usage.get(key[0], 0) - entry[0]
+            if remaining > 0:
+                self._session_usage[key[0]] = remaining
+            else:
+                self._session_usage.pop(key[0], None)
+
+    def _evict(self, key):
+        self._remove(key)
+        self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "sessions": len(self._session_usage),
+                "entries": len(self._entries),
+                "bytes": self._usage,
+                "session_budget_bytes": self.session_bytes,
+                "total_budget_bytes": self.total_bytes,
+                "evictions": self.evictions,
+                "rejected": self.rejected,
+            }
+
+
+session_results = ResultStore()
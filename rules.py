@@ -0,0 +1,303 @@
+import argparse
+import ast
+import csv
+import json
+import logging
+import time
+
+import numpy as np
+
+import advisor
+import persistence
+from universe import as_universe
+
+# Declarative recommendation rules, evaluated column-wise over many portfolios at once.
+# A rule is a code, a condition written as an array expression over portfolio columns
+# (e.g. "max_weight > CONCENTRATION_THRESHOLD") and a message template filled from the same columns.
+# Conditions are parsed once into a whitelisted expression and evaluated with NumPy, so one call
+# checks a whole page of portfolios; messages are only formatted for the rows that need text.
+# Run this code using "python rules.py --years 5 --output codes.csv" to re-check every stored portfolio
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE_SIZE = 100000
+
+# Named thresholds usable in any rule expression
+CONSTANTS = {
+    "CONCENTRATION_THRESHOLD": 0.3,
+    "SAVINGS_RATE": 0.2,
+    "MIN_GROWTH": 0.5,
+}
+
+# Functions usable in rule expressions (element-wise)
+FUNCTIONS = {
+    "abs": np.abs,
+    "minimum": np.minimum,
+    "maximum": np.maximum,
+    "where": np.where,
+    "isnan": np.isnan,
+}
+
+# Columns every portfolio has (see portfolio_columns / book_pages):
+#   target_return, income, initial_investment, expected_return, max_weight, growth (NaN without a simulation),
+#   final_value, contributed, plus derived target_return_pct, return_gap_pct, recommended_savings.
+# Message templates may also use concentrated_assets (names above CONCENTRATION_THRESHOLD).
+
+_ALLOWED_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Compare, ast.Call, ast.Name, ast.Load, ast.Constant,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Mod, ast.Pow, ast.USub, ast.UAdd, ast.Invert,
+    ast.BitAnd, ast.BitOr, ast.BitXor, ast.Lt, ast.LtE, ast.Gt, ast.GtE, ast.Eq, ast.NotEq,
+)
+
+
+def compile_expression(text):
+    # Parse a rule condition into (code object, column names it reads); anything beyond arithmetic,
+    # comparisons, &, |, ~ and the FUNCTIONS is rejected (use & and |, not and/or, on arrays)
+    tree = ast.parse(text, mode="eval")
+    names = set()
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise ValueError(f"Unsupported syntax in rule {text!r}: {type(node).__name__}")
+        if isinstance(node, ast.Call) and not (isinstance(node.func, ast.Name) and node.func.id in FUNCTIONS):
+            raise ValueError(f"Unsupported function in rule {text!r}")
+        if isinstance(node, ast.Name) and node.id not in FUNCTIONS and node.id not in CONSTANTS:
+            names.add(node.id)
+    return compile(tree, f"<rule {text}>", "eval"), names
+
+
+class Rule:
+    def __init__(self, code, when, message):
+        self.code = code
+        self.when = when
+        self.message = message
+        self._compiled, self.columns = compile_expression(when)
+
+    def evaluate(self, columns):
+        # Boolean array, one entry per portfolio
+        namespace = {name: np.asarray(columns[name]) for name in self.columns}
+        namespace.update(CONSTANTS)
+        namespace.update(FUNCTIONS)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            result = eval(self._compiled, {"__builtins__": {}}, namespace)
+        return np.broadcast_to(np.asarray(result, dtype=bool), (len(columns["target_return"]),))
+
+    def __repr__(self):
+        return f"Rule({self.code!r}, {self.when!r})"
+
+
+# The advisor's standard checks, in the order their messages are shown
+RULES = (
+    Rule(
+        "target_gap",
+        "expected_return < target_return",
+        "Your current allocation may not meet your target annual return of {target_return_pct:.2f}%. "
+        "Consider increasing your allocation to higher-return assets to close the {return_gap_pct:.2f}% gap.",
+    ),
+    Rule(
+        "concentration",
+        "max_weight > CONCENTRATION_THRESHOLD",
+        "You have a high concentration in {concentrated_assets}. Consider diversifying to reduce risk.",
+    ),
+    Rule(
+        "savings_rate",
+        "initial_investment < recommended_savings",
+        "Consider increasing your investment amount. A good target is 20% of your annual income (Rs.{recommended_savings:,.2f}).",
+    ),
+    Rule(
+        "low_growth",
+        "growth < MIN_GROWTH",
+        "Your long-term growth projection is lower than average. Consider increasing your investment horizon "
+        "or adjusting your asset allocation for better long-term results.",
+    ),
+)
+
+
+def load_rules(path):
+    # Custom rules from a JSON list of {"code", "when", "message"} objects
+    with open(path, encoding="utf-8") as f:
+        return tuple(Rule(item["code"], item["when"], item["message"]) for item in json.load(f))
+
+
+def derived_columns(columns):
+    # Add the columns computed from the stored ones
+    columns["target_return_pct"] = columns["target_return"] * 100
+    columns["return_gap_pct"] = (columns["target_return"] - columns["expected_return"]) * 100
+    columns["recommended_savings"] = columns["income"] * CONSTANTS["SAVINGS_RATE"]
+    return columns
+
+
+def allocation_columns(rows, asset_names, weights, count, assets, years=None):
+    # expected_return, max_weight and concentrated_assets for `count` portfolios from long-format
+    # allocations (row number, asset name, weight), plus the lump-sum growth over `years` if given
+    universe = as_universe(assets)
+    rows = np.asarray(rows, dtype=np.int64)
+    weights = np.asarray(weights, dtype=float)
+    asset_names = np.asarray(asset_names, dtype=object)
+    order = np.argsort(rows, kind="stable")
+    rows, asset_names, weights = rows[order], asset_names[order], weights[order]
+
+    # Asset name -> universe position (-1 if unknown)
+    name_index = universe.name_index
+    positions = np.array([name_index.get(name, -1) for name in asset_names.tolist()], dtype=np.int64)
+    known = positions >= 0
+
+    columns = {
+        "expected_return": np.bincount(rows[known], weights[known] * universe.returns[positions[known]], minlength=count),
+        "max_weight": np.zeros(count),
+    }
+    if len(rows):
+        starts = np.flatnonzero(np.concatenate(([True], rows[1:] != rows[:-1])))
+        columns["max_weight"][rows[starts]] = np.maximum.reduceat(weights, starts)
+    if years is not None:
+        factors = (1 + universe.returns / 12) ** (years * 12)
+        columns["growth"] = np.bincount(rows[known], weights[known] * factors[positions[known]], minlength=count) - 1
+
+    # Only portfolios over the threshold need names; allocation order is kept within a portfolio
+    concentrated = np.full(count, "", dtype=object)
+    flagged = weights > CONSTANTS["CONCENTRATION_THRESHOLD"]
+    for row, name in zip(rows[flagged].tolist(), asset_names[flagged].tolist()):
+        concentrated[row] = f"{concentrated[row]}, {name}" if concentrated[row] else name
+    columns["concentrated_assets"] = concentrated
+    return columns
+
+
+def portfolio_columns(user_data, portfolio_data, assets, simulation_results=None):
+    # One-row columns for a single portfolio, as generate_recommendations sees it
+    allocation = portfolio_data["allocation"]
+    columns = allocation_columns(np.zeros(len(allocation)), list(allocation), list(allocation.values()), 1, assets)
+    columns["expected_return"] = np.array([advisor.portfolio_return(allocation, assets)])
+    columns["target_return"] = np.array([user_data["target_return"]], dtype=float)
+    columns["income"] = np.array([user_data["income"]], dtype=float)
+    columns["initial_investment"] = np.array([portfolio_data["initial_investment"]], dtype=float)
+    final_value = contributed = np.nan
+    if simulation_results is not None and not simulation_results.empty:
+        final_value = float(np.asarray(simulation_results['Total_Value'])[-1])
+        contributed = portfolio_data["initial_investment"]
+        if 'Contributed' in simulation_results:
+            # With a SIP, growth is measured against everything paid in
+            contributed = float(np.asarray(simulation_results['Contributed'])[-1])
+    columns["final_value"] = np.array([final_value])
+    columns["contributed"] = np.array([contributed], dtype=float)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        columns["growth"] = (columns["final_value"] - columns["contributed"]) / columns["contributed"]
+    return derived_columns(columns)
+
+
+def evaluate(columns, rules=RULES):
+    # Boolean matrix (portfolios x rules); columns is a dict of arrays or a DataFrame
+    return np.column_stack([rule.evaluate(columns) for rule in rules]) if rules else np.zeros((0, 0), dtype=bool)
+
+
+def recommendation_codes(matches, rules=RULES):
+    # Codes of the rules each portfolio triggered, in rule order
+    codes = np.array([rule.code for rule in rules], dtype=object)
+    return [codes[row].tolist() for row in matches]
+
+
+def recommendation_messages(columns, matches, rules=RULES, rows=None):
+    # Message text for each portfolio (or only `rows`), formatted from that portfolio's column values
+    rows = range(len(matches)) if rows is None else rows
+    messages = []
+    for row in rows:
+        values = {}
+        texts = []
+        for rule_index in np.flatnonzero(matches[row]):
+            rule = rules[rule_index]
+            if not values:
+                values = {name: np.asarray(column)[row] for name, column in columns.items()}
+            texts.append(rule.message.format_map(values))
+        messages.append(texts)
+    return messages
+
+
+def book_pages(db_path=None, assets=None, years=5, page_size=DEFAULT_PAGE_SIZE):
+    # Yield (portfolio_ids, columns) for every stored portfolio, one keyset page at a time.
+    # Per-portfolio sums over portfolio_allocations run inside SQLite, so each page is one row per
+    # portfolio. Growth is the lump-sum projection over `years`, as simulate_growth computes it.
+    universe = as_universe(assets if assets is not None else advisor.default_universe())
+    factors = (1 + universe.returns / 12) ** (years * 12)
+    with persistence.get_pool(db_path or advisor.DB_PATH).connection() as conn:
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS rule_assets (name TEXT PRIMARY KEY, expected_return REAL, growth_factor REAL)")
+        conn.execute("DELETE FROM temp.rule_assets")
+        conn.executemany("INSERT INTO temp.rule_assets VALUES (?, ?, ?)",
+                         zip(universe.names.tolist(), universe.returns.tolist(), factors.tolist()))
+        last_id = 0
+        while True:
+            page = conn.execute('''
+            SELECT p.id, u.target_return, u.income, p.initial_investment,
+                   TOTAL(pa.weight * ra.expected_return), MAX(pa.weight), TOTAL(pa.weight * ra.growth_factor),
+                   GROUP_CONCAT(CASE WHEN pa.weight > ? THEN pa.asset_name END, ', ')
+            FROM portfolios p
+            JOIN users u ON u.id = p.user_id
+            LEFT JOIN portfolio_allocations pa ON pa.portfolio_id = p.id
+            LEFT JOIN temp.rule_assets ra ON ra.name = pa.asset_name
+            WHERE p.id > ?
+            GROUP BY p.id
+            ORDER BY p.id
+            LIMIT ?
+            ''', (CONSTANTS["CONCENTRATION_THRESHOLD"], last_id, page_size)).fetchall()
+            if not page:
+                break
+            ids, target_return, income, initial_investment, expected_return, max_weight, growth, concentrated = zip(*page)
+            last_id = ids[-1]
+
+            initial_investment = np.nan_to_num(np.array(initial_investment, dtype=float))
+            # simulate_growth's growth is undefined for a zero investment, so that rule never fires there
+            growth = np.where(initial_investment > 0, np.array(growth, dtype=float) - 1, np.nan)
+            columns = {
+                "target_return": np.nan_to_num(np.array(target_return, dtype=float)),
+                "income": np.nan_to_num(np.array(income, dtype=float)),
+                "initial_investment": initial_investment,
+                "expected_return": np.array(expected_return, dtype=float),
+                "max_weight": np.nan_to_num(np.array(max_weight, dtype=float)),
+                "growth": growth,
+                "final_value": initial_investment * (1 + growth),
+                "contributed": initial_investment,
+                "concentrated_assets": np.array([names or "" for names in concentrated], dtype=object),
+            }
+            yield np.array(ids, dtype=np.int64), derived_columns(columns)
+
+
+def check_book(db_path=None, rules=RULES, years=5, page_size=DEFAULT_PAGE_SIZE, output=None):
+    # Re-check every stored portfolio; returns {"portfolios", "counts": {code: n}, "seconds"}.
+    # output: optional CSV writer target for (portfolio_id, codes) rows.
+    start = time.perf_counter()
+    counts = dict.fromkeys((rule.code for rule in rules), 0)
+    total = 0
+    writer = csv.writer(output) if output is not None else None
+    if writer:
+        writer.writerow(["portfolio_id", "codes"])
+    for ids, columns in book_pages(db_path, years=years, page_size=page_size):
+        matches = evaluate(columns, rules)
+        for code, count in zip(counts, matches.sum(axis=0).tolist()):
+            counts[code] += count
+        total += len(ids)
+        if writer:
+            writer.writerows(zip(ids.tolist(), (";".join(codes) for codes in recommendation_codes(matches, rules))))
+        logger.info("Checked %d portfolios", total)
+    return {"portfolios": total, "counts": counts, "seconds": time.perf_counter() - start}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-check every stored portfolio against the recommendation rules.")
+    parser.add_argument("--db", default=advisor.DB_PATH, help="SQLite database to read")
+    parser.add_argument("--years", type=int, default=5, help="projection horizon for the growth rule")
+    parser.add_argument("--rules", help="JSON file of extra rules: [{\"code\", \"when\", \"message\"}]")
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE)
+    parser.add_argument("--output", help="write portfolio_id,codes rows to this CSV file")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    rules = RULES + (load_rules(args.rules) if args.rules else ())
+    if args.output:
+        with open(args.output, "w", newline="", encoding="utf-8") as f:
+            stats = check_book(args.db, rules, args.years, args.page_size, f)
+    else:
+        stats = check_book(args.db, rules, args.years, args.page_size)
+    for code, count in stats["counts"].items():
+        print(f"{code:<20} {count}")
+    print(f"Checked {stats['portfolios']} portfolios in {stats['seconds']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+import numpy as np
+
+import advisor
+from results import SimulationResult
+from universe import as_universe
+
+# Contribution (SIP) and rebalancing schedules on top of the monthly growth model.
+# Each month every holding grows by its monthly return, then the month's contribution is
+# invested at the target weights, then the rebalancing policy is applied.
+# Buy-and-hold and monthly rebalancing have closed forms (a discounted cumsum); calendar and
+# threshold policies run one NumPy recurrence over the months, batched across schedules.
+
+CONTRIBUTION_FREQUENCIES = {"monthly": 1, "quarterly": 3, "annual": 12}
+REBALANCE_POLICIES = {
+    None: "Never (let the allocation drift)",
+    "monthly": "Monthly",
+    "quarterly": "Quarterly",
+    "annual": "Annual",
+    "threshold": "Threshold band",
+}
+REBALANCE_MONTHS = {"monthly": 1, "quarterly": 3, "annual": 12}
+DEFAULT_BAND = 0.05  # rebalance when any weight is 5 percentage points off target
+
+
+def contribution_schedule(years, amount, frequency="monthly", step_up=0.0):
+    # Contribution paid in each month 0..years*12 (month 0 is the lump sum, so it is 0 here).
+    # Payments start in month 1 and grow by step_up once every 12 months.
+    months = np.arange(years * 12 + 1)
+    step = CONTRIBUTION_FREQUENCIES[frequency]
+    paid = (months >= 1) & ((months - 1) % step == 0)
+    return np.where(paid, amount * (1 + step_up) ** ((months - 1) // 12), 0.0)
+
+
+def schedule_values(initial_investments, contributions, allocation, assets, rebalance=None, band=DEFAULT_BAND):
+    # Per-asset values (schedules x months+1 x assets) for many schedules at once.
+    # initial_investments: (schedules,), contributions: (schedules, months+1) from contribution_schedule.
+    universe = as_universe(assets)
+    weights = universe.weights(allocation)
+    weights = weights / weights.sum()
+    growth = 1 + universe.returns / 12
+    initial = np.asarray(initial_investments, dtype=float)
+    contributions = np.atleast_2d(np.asarray(contributions, dtype=float))
+    months = np.arange(contributions.shape[1])
+
+    if rebalance is None:
+        # Each payment compounds in its own asset: w * g^t * (initial + sum_u c_u * g^-u)
+        discount = growth ** -months[:, None]
+        invested = initial[:, None, None] + np.cumsum(contributions[:, :, None] * discount, axis=1)
+        return invested * growth ** months[:, None] * weights
+
+    if rebalance == "monthly":
+        # Rebalanced every month the portfolio grows at the blended rate g_p = w . g
+        portfolio_growth = weights @ growth
+        discount = portfolio_growth ** -months
+        total = portfolio_growth ** months * (initial[:, None] + np.cumsum(contributions * discount, axis=1))
+        return total[:, :, None] * weights
+
+    if rebalance not in REBALANCE_MONTHS and rebalance != "threshold":
+        raise ValueError(f"Unknown rebalancing policy {rebalance!r}")
+    calendar = np.zeros(len(months), dtype=bool)
+    if rebalance in REBALANCE_MONTHS:
+        calendar[REBALANCE_MONTHS[rebalance]::REBALANCE_MONTHS[rebalance]] = True
+
+    values = np.empty((len(initial), len(months), len(weights)))
+    holdings = initial[:, None] * weights
+    values[:, 0] = holdings
+    for month in months[1:]:
+        holdings = holdings * growth + contributions[:, month, None] * weights
+        total = holdings.sum(axis=1, keepdims=True)
+        if calendar[month]:
+            holdings = total * weights
+        elif rebalance == "threshold":
+            drifted = np.abs(holdings / total - weights).max(axis=1, keepdims=True) > band
+            holdings = np.where(drifted, total * weights, holdings)
+        values[:, month] = holdings
+    return values
+
+
+def simulate_schedule(initial_investment, allocation, assets, years=5, contribution=0.0, frequency="monthly",
+                      step_up=0.0, rebalance=None, band=DEFAULT_BAND):
+    # simulate_growth with a contribution plan and rebalancing policy, as a SimulationResult
+    # with a cumulative 'Contributed' column
+    try:
+        contributions = contribution_schedule(years, contribution, frequency, step_up)
+        asset_values = schedule_values([initial_investment], contributions[None], allocation, assets, rebalance, band)[0]
+        contributed = initial_investment + np.cumsum(contributions)
+        return SimulationResult.from_values(asset_values, assets, extra_columns={"Contributed": contributed})
+    except Exception as e:
+        advisor.report_error(f"Schedule simulation error: {e}")
+        return SimulationResult.blank()
@@ -0,0 +1,79 @@
+import numpy as np
+
+import advisor
+from cache import chart_cache
+from charts import figure_to_bytes
+from universe import as_universe
+
+# Scenario sweep: final value for every (risk band, horizon, amount) in one array computation.
+# A lump sum's projected value is linear in the amount, so the whole grid is one
+# growth-factor x band-weights product followed by a broadcast over amounts.
+
+RISK_BAND_SCORES = {"low": 0.15, "medium": 0.5, "high": 0.85}  # one risk score inside each band
+
+
+def scenario_grid(assets, amounts, horizons, bands=RISK_BAND_SCORES, method="buckets", version=None):
+    # {"bands", "horizons", "amounts", "final", "inflation_adjusted", "allocations"};
+    # final and inflation_adjusted are (bands x horizons x amounts) arrays, matching simulate_growth.
+    universe = as_universe(assets)
+    version = version or universe.version
+    horizons = np.asarray(horizons, dtype=int)
+    amounts = np.asarray(amounts, dtype=float)
+
+    allocations = {
+        band: advisor.recommend_allocation(universe, score, method=method, version=version)
+        for band, score in bands.items()
+    }
+    weights = np.stack([universe.weights(allocation) for allocation in allocations.values()])
+
+    months = horizons * 12
+    # Growth factor of every asset at each horizon (horizons x assets), then per band (bands x horizons)
+    factors = (1 + universe.returns / 12) ** months[:, None]
+    multiples = weights @ factors.T
+    final = multiples[:, :, None] * amounts
+    inflation = (1 + advisor.INFLATION_RATE / 12) ** months
+    return {
+        "bands": list(bands),
+        "horizons": horizons,
+        "amounts": amounts,
+        "final": final,
+        "inflation_adjusted": final / inflation[None, :, None],
+        "allocations": allocations,
+    }
+
+
+def sweep_heatmap(grid, metric="final"):
+    # One heatmap per risk band (horizon rows x amount columns); returns a Figure
+    from matplotlib.figure import Figure
+    values = grid[metric]
+    bands = grid["bands"]
+    fig = Figure(figsize=(5 * len(bands), 5))
+    axes = fig.subplots(1, len(bands), squeeze=False)[0]
+    vmin, vmax = values.min(), values.max()
+    amounts = grid["amounts"]
+    horizons = grid["horizons"]
+    for ax, band, band_values in zip(axes, bands, values):
+        image = ax.imshow(band_values, aspect="auto", origin="lower", cmap="viridis", vmin=vmin, vmax=vmax)
+        x_ticks = advisor.downsample_indices(len(amounts), 6)
+        y_ticks = advisor.downsample_indices(len(horizons), 8)
+        ax.set_xticks(x_ticks, [f"{amounts[i]:,.0f}" for i in x_ticks], rotation=30)
+        ax.set_yticks(y_ticks, [str(horizons[i]) for i in y_ticks])
+        ax.set_title(f"{band.capitalize()} risk")
+        ax.set_xlabel("Investment Amount (INR)")
+        ax.set_ylabel("Years")
+    label = "Inflation Adjusted Value (INR)" if metric == "inflation_adjusted" else "Final Value (INR)"
+    fig.colorbar(image, ax=list(axes), label=label)
+    return fig
+
+
+def render_sweep_heatmap(grid, metric="final", key=None):
+    # PNG bytes of sweep_heatmap, cached in chart_cache under key (None skips the cache)
+    cache_key = ("sweep", key, metric) if key is not None else None
+    if cache_key is not None:
+        cached = chart_cache.get(cache_key)
+        if cached is not None:
+            return cached
+    data = figure_to_bytes(sweep_heatmap(grid, metric))
+    if cache_key is not None:
+        chart_cache.set(cache_key, data)
+    return data
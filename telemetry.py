@@ -0,0 +1,172 @@
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+# Per-stage timing for each Streamlit rerun, tagged by session.
+# Off unless ADVISOR_TELEMETRY=1; when off, stage() hands back a shared no-op context manager.
+# ADVISOR_TELEMETRY_MEMORY=1 also records allocations with tracemalloc (slower, opt-in).
+# Histograms go to a Prometheus textfile (ADVISOR_TELEMETRY_PROM) for node_exporter's textfile
+# collector, and every sample can be appended to a JSON lines log (ADVISOR_TELEMETRY_LOG).
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # seconds
+RECENT_SAMPLES = 500  # per stage, for the rolling summary
+
+ENABLED = os.environ.get("ADVISOR_TELEMETRY", "") not in ("", "0")
+TRACE_MEMORY = os.environ.get("ADVISOR_TELEMETRY_MEMORY", "") not in ("", "0")
+PROM_PATH = os.environ.get("ADVISOR_TELEMETRY_PROM")
+LOG_PATH = os.environ.get("ADVISOR_TELEMETRY_LOG")
+
+_NOOP = contextlib.nullcontext()
+
+logger = logging.getLogger(__name__)
+
+
+class StageStats:
+    # Cumulative histogram plus a window of recent samples for one stage
+
+    def __init__(self):
+        self.bucket_counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.total_seconds = 0.0
+        self.recent = deque(maxlen=RECENT_SAMPLES)  # (session, seconds, allocated_bytes)
+
+    def observe(self, session, seconds, allocated_bytes):
+        self.count += 1
+        self.total_seconds += seconds
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.bucket_counts[i] += 1
+                break
+        self.recent.append((session, seconds, allocated_bytes))
+
+
+class Recorder:
+    def __init__(self):
+        self.stages = {}
+        self._lock = threading.Lock()
+        self._log_lock = threading.Lock()
+
+    def observe(self, stage, session, seconds, allocated_bytes=None):
+        with self._lock:
+            stats = self.stages.get(stage)
+            if stats is None:
+                stats = self.stages[stage] = StageStats()
+            stats.observe(session, seconds, allocated_bytes)
+        if LOG_PATH:
+            line = json.dumps({
+                "ts": time.time(),
+                "stage": stage,
+                "session": session,
+                "seconds": seconds,
+                "allocated_bytes": allocated_bytes,
+            })
+            with self._log_lock, open(LOG_PATH, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def summary(self, session=None):
+        # Rolling latency (ms) per stage over the recent window, optionally for one session
+        rows = []
+        with self._lock:
+            items = [(stage, list(stats.recent)) for stage, stats in self.stages.items()]
+        for stage, samples in items:
+            if session is not None:
+                samples = [s for s in samples if s[0] == session]
+            if not samples:
+                continue
+            seconds = sorted(s[1] for s in samples)
+            allocated = [s[2] for s in samples if s[2] is not None]
+            rows.append({
+                "stage": stage,
+                "samples": len(seconds),
+                "p50_ms": _percentile(seconds, 0.50) * 1e3,
+                "p95_ms": _percentile(seconds, 0.95) * 1e3,
+                "max_ms": seconds[-1] * 1e3,
+                "mean_alloc_kb": sum(allocated) / len(allocated) / 1024 if allocated else None,
+            })
+        return rows
+
+    def prometheus_text(self):
+        lines = [
+            "# HELP advisor_stage_seconds Wall time of each advisor stage per Streamlit rerun.",
+            "# TYPE advisor_stage_seconds histogram",
+        ]
+        with self._lock:
+            for stage, stats in sorted(self.stages.items()):
+                cumulative = 0
+                for bound, count in zip(BUCKETS, stats.bucket_counts):
+                    cumulative += count
+                    lines.append(f'advisor_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'advisor_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {stats.count}')
+                lines.append(f'advisor_stage_seconds_sum{{stage="{stage}"}} {stats.total_seconds}')
+                lines.append(f'advisor_stage_seconds_count{{stage="{stage}"}} {stats.count}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        # Write then rename so the scraper never reads a partial file
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+
+    def reset(self):
+        with self._lock:
+            self.stages.clear()
+
+
+def _percentile(sorted_values, q):
+    return sorted_values[min(int(q * len(sorted_values)), len(sorted_values) - 1)]
+
+
+recorder = Recorder()
+
+
+def enable(trace_memory=False, prom_path=None, log_path=None):
+    # Turn telemetry on from code (the environment variables do the same at import)
+    global ENABLED, TRACE_MEMORY, PROM_PATH, LOG_PATH
+    ENABLED = True
+    TRACE_MEMORY = trace_memory
+    PROM_PATH = prom_path or PROM_PATH
+    LOG_PATH = log_path or LOG_PATH
+
+
+@contextlib.contextmanager
+def _timed(name, session):
+    if TRACE_MEMORY and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    tracing = TRACE_MEMORY and tracemalloc.is_tracing()
+    if tracing:
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        # Peak growth over the stage, which counts temporaries freed before it ended
+        allocated = tracemalloc.get_traced_memory()[1] - before if tracing else None
+        recorder.observe(name, session, seconds, allocated)
+
+
+def stage(name, session=None):
+    # with telemetry.stage("simulate", session_id): ...
+    if not ENABLED:
+        return _NOOP
+    return _timed(name, session)
+
+
+def flush():
+    # Called once at the end of each rerun to refresh the Prometheus textfile
+    if ENABLED and PROM_PATH:
+        try:
+            recorder.write_prometheus(PROM_PATH)
+        except OSError as e:
+            logger.warning("Could not write telemetry to %s: %s", PROM_PATH, e)
+
+
+def summary(session=None):
+    return recorder.summary(session)
@@ -0,0 +1,48 @@
+from cache import TTLCache
+from jobs import JobRunner
+
+# Run this code using "python -m pytest tests"
+
+
+def failing_job(job):
+    raise ValueError("no prices for Gold ETF")
+
+
+def finishing_job(job, value):
+    job.update(0.5)
+    return value
+
+
+def test_failed_job_stays_retrievable():
+    runner = JobRunner(max_workers=1, results=TTLCache("test_jobs"))
+    job = runner.submit("key", failing_job)
+    assert job.wait(5)
+
+    failed = runner.get("key")
+    assert failed is job
+    assert failed.status == "failed"
+    assert isinstance(failed.error, ValueError)
+    assert "no prices for Gold ETF" in failed.message
+    assert runner.stats()["failed"] == 1
+
+
+def test_resubmitting_a_failed_job_runs_it_again():
+    runner = JobRunner(max_workers=1, results=TTLCache("test_jobs"))
+    runner.submit("key", failing_job).wait(5)
+
+    retry = runner.submit("key", finishing_job, 42)
+    assert retry.wait(5)
+    assert retry.status == "done"
+    assert retry.result == 42
+    assert runner.get("key") is retry
+    assert runner.stats()["submitted"] == 2
+
+
+def test_failed_job_expires_sooner_than_finished_ones(monkeypatch):
+    monkeypatch.setattr("jobs.FAILED_JOB_SECONDS", 0)
+    runner = JobRunner(max_workers=1, results=TTLCache("test_jobs"))
+    runner.submit("failed", failing_job).wait(5)
+    runner.submit("done", finishing_job, 1).wait(5)
+
+    assert runner.get("failed") is None
+    assert runner.get("done").result == 1
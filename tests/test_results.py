@@ -0,0 +1,34 @@
+import numpy as np
+
+from results import ResultStore
+
+# Run this code using "python -m pytest tests"
+
+
+def test_value_over_the_session_budget_is_not_kept():
+    store = ResultStore(session_bytes=1000, total_bytes=10000)
+    store.put("a", "simulation", np.zeros(100, dtype=np.float32))
+
+    assert not store.put("a", "simulation", np.zeros(1024 * 1024, dtype=np.float64))
+    assert store.get("a", "simulation") is None
+    assert store.stats()["bytes"] == 0
+    assert store.stats()["rejected"] == 1
+
+
+def test_session_over_budget_evicts_its_oldest_entry():
+    store = ResultStore(session_bytes=1000, total_bytes=10000)
+    assert store.put("a", "simulation", np.zeros(150, dtype=np.float32))
+    assert store.put("a", "sweep", np.zeros(150, dtype=np.float32))
+
+    assert store.get("a", "simulation") is None
+    assert store.get("a", "sweep") is not None
+    assert store.stats()["evictions"] == 1
+
+
+def test_total_budget_evicts_the_least_recently_used_session():
+    store = ResultStore(session_bytes=1000, total_bytes=1500)
+    store.put("a", "simulation", np.zeros(200, dtype=np.float32))
+    store.put("b", "simulation", np.zeros(200, dtype=np.float32))
+
+    assert store.get("a", "simulation") is None
+    assert store.get("b", "simulation") is not None
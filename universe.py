@@ -0,0 +1,204 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+
+# Columnar asset universe shared read-only by every session.
+# Each field is one NumPy array and lookups go through name/type indexes instead of scanning
+# a list of dicts. A catalog (CSV or Parquet) is parsed once and its columns saved as .npy files
+# that later processes memory-map, so batch workers share the same pages.
+# Run this code using "python universe.py catalog.csv" to build the cache ahead of time.
+
+CACHE_DIR = os.environ.get("ADVISOR_CACHE_DIR", ".advisor_cache")
+COLUMNS = ("names", "types", "returns", "risks", "prices")
+
+
+def records_version(records):
+    # Content hash of a list of asset dicts; changes whenever any asset is added, removed or edited
+    payload = json.dumps(list(records), sort_keys=True).encode()
+    return hashlib.sha1(payload).hexdigest()[:16]
+
+
+def file_version(path):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+class AssetUniverse:
+    # Read-only asset table: parallel arrays plus name -> position and type -> positions indexes.
+    # Iterating still yields {"name", "type", "return", "risk", "price"} dicts for older callers.
+
+    def __init__(self, names, types, returns, risks, prices, version=None, records=None):
+        self.names = np.asarray(names)
+        self.types = np.asarray(types)
+        self.returns = np.asarray(returns, dtype=float)
+        self.risks = np.asarray(risks, dtype=float)
+        self.prices = np.asarray(prices, dtype=float)
+        for column in (self.names, self.types, self.returns, self.risks, self.prices):
+            if column.flags.writeable:
+                column.setflags(write=False)
+
+        self.name_index = {name: i for i, name in enumerate(self.names.tolist())}
+        self.type_index = {}
+        for asset_type in dict.fromkeys(self.types.tolist()):
+            positions = np.flatnonzero(self.types == asset_type)
+            positions.setflags(write=False)
+            self.type_index[asset_type] = positions
+
+        self._version = version
+        self._records = records
+
+    @property
+    def version(self):
+        if self._version is None:
+            self._version = records_version(self._records if self._records is not None else list(self))
+            self._records = None
+        return self._version
+
+    @classmethod
+    def from_records(cls, records, version=None):
+        records = list(records)
+        return cls(
+            [r["name"] for r in records],
+            [r["type"] for r in records],
+            [r["return"] for r in records],
+            [r["risk"] for r in records],
+            [r.get("price", np.nan) for r in records],
+            version=version,
+            records=records,
+        )
+
+    @classmethod
+    def from_catalog(cls, path, cache_dir=CACHE_DIR):
+        # Load a CSV/Parquet catalog with name, type, return, risk and (optional) price columns.
+        # Parsed columns are cached per file content and memory-mapped on later loads.
+        version = file_version(path)
+        directory = os.path.join(cache_dir, f"universe-{version}") if cache_dir else None
+        if directory and os.path.isdir(directory):
+            try:
+                return cls.load(directory, version)
+            except (OSError, ValueError):
+                pass
+
+        if path.lower().endswith((".parquet", ".pq")):
+            columns = _read_parquet(path)
+        else:
+            columns = _read_csv(path)
+        universe = cls(*columns, version=version)
+        if directory:
+            universe.save(directory)
+            return cls.load(directory, version)
+        return universe
+
+    def save(self, directory):
+        # Write to a temporary directory and rename it so readers never see a partial cache
+        tmp_dir = f"{directory}.{os.getpid()}.tmp"
+        os.makedirs(tmp_dir, exist_ok=True)
+        for column in COLUMNS:
+            np.save(os.path.join(tmp_dir, f"{column}.npy"), getattr(self, column))
+        try:
+            os.rename(tmp_dir, directory)
+        except OSError:
+            # Another process finished the same cache first
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    @classmethod
+    def load(cls, directory, version=None):
+        arrays = [np.load(os.path.join(directory, f"{column}.npy"), mmap_mode="r") for column in COLUMNS]
+        return cls(*arrays, version=version)
+
+    def __len__(self):
+        return len(self.names)
+
+    def record(self, position):
+        return {
+            "name": str(self.names[position]),
+            "type": str(self.types[position]),
+            "return": float(self.returns[position]),
+            "risk": float(self.risks[position]),
+            "price": float(self.prices[position]),
+        }
+
+    def __getitem__(self, position):
+        return self.record(position)
+
+    def __iter__(self):
+        for name, asset_type, ret, risk, price in zip(
+            self.names.tolist(), self.types.tolist(), self.returns.tolist(), self.risks.tolist(), self.prices.tolist()
+        ):
+            yield {"name": name, "type": asset_type, "return": ret, "risk": risk, "price": price}
+
+    def __contains__(self, name):
+        return name in self.name_index
+
+    def get(self, name, default=None):
+        # Asset dict by name in O(1)
+        position = self.name_index.get(name)
+        return default if position is None else self.record(position)
+
+    def weights(self, allocation):
+        # Dense weight vector in universe order (0 for assets outside the allocation)
+        weights = np.zeros(len(self))
+        for name, weight in allocation.items():
+            position = self.name_index.get(name)
+            if position is not None:
+                weights[position] = weight
+        return weights
+
+
+def as_universe(assets):
+    # Accept either an AssetUniverse or a plain list of asset dicts
+    if isinstance(assets, AssetUniverse):
+        return assets
+    return AssetUniverse.from_records(assets)
+
+
+def _read_csv(path):
+    names, types, returns, risks, prices = [], [], [], [], []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            names.append(row["name"])
+            types.append(row["type"])
+            returns.append(float(row["return"]))
+            risks.append(float(row["risk"]))
+            prices.append(float(row["price"]) if row.get("price") else np.nan)
+    return names, types, returns, risks, prices
+
+
+def _read_parquet(path):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet catalogs require pyarrow (pip install pyarrow)")
+    table = pq.read_table(path)
+    prices = table.column("price").to_numpy() if "price" in table.column_names else np.full(table.num_rows, np.nan)
+    return (
+        np.array(table.column("name").to_pylist()),
+        np.array(table.column("type").to_pylist()),
+        table.column("return").to_numpy(),
+        table.column("risk").to_numpy(),
+        prices,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load an asset catalog and build its memory-mapped cache.")
+    parser.add_argument("catalog", help="CSV or Parquet file with name, type, return, risk, price columns")
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    args = parser.parse_args(argv)
+
+    universe = AssetUniverse.from_catalog(args.catalog, args.cache_dir)
+    print(f"{len(universe)} assets, version {universe.version}")
+    for asset_type, positions in universe.type_index.items():
+        print(f"  {asset_type}: {len(positions)}")
+
+
+if __name__ == "__main__":
+    main()
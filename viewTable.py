@@ -1,29 +1,12 @@
-import sqlite3
-conn = sqlite3.connect('investment_advisor.db')
-cursor = conn.cursor()
-try:
-    cursor.execute(f"SELECT * FROM portfolios;")
-    rows = cursor.fetchall()
-    if rows:
-        col_names = [data[0] for data in cursor.description]
-        print(" | ".join(col_names))
-        print("-" * (len(" | ".join(col_names)) + 10))
-        for row in rows:
-            print(" | ".join(str(item) for item in row))
-    else:
-        print(f"No data found in table.")
-
+import sys
+from export import export_table
+# Streams each table to the terminal in batches; see export.py for filters and CSV/JSON Lines/Parquet output
+for table in ("portfolios", "users"):
+    try:
+        count = export_table('investment_advisor.db', table, sys.stdout, fmt="csv", delimiter="|")
+        if not count:
+            print(f"No data found in table.")
+    except Exception as e:
+        print(f"An error occurred: {e}")
     print("----------------------------------------------------------------------------------------------------------------------------")
-    cursor.execute(f"SELECT * FROM users;")
-    rows = cursor.fetchall()
-    if rows:
-        col_names = [data[0] for data in cursor.description]
-        print(" | ".join(col_names))
-        print("-" * (len(" | ".join(col_names)) + 10))
-        for row in rows:
-            print(" | ".join(str(item) for item in row))
-    else:
-        print(f"No data found in table.")
-except sqlite3.Error as e:
-    print(f"An error occurred: {e}")
 # Run this code directy in VS CODE 
\ No newline at end of file